@@ -3,7 +3,6 @@
 
 from alert import Alert
 
-from requests import post
 from logging import getLogger
 from dateutil import parser
 from json import dumps
@@ -19,6 +18,9 @@ class Alerta(Alert):
     """
 
     def send_alert(self):
+        # requests is only imported when an alert is sent
+        from requests import post
+
         message = self.alert_message
         date_begin = parser.parse(self.date_begin).strftime("%d/%m/%y")
         date_end = parser.parse(self.date_end).strftime("%d/%m/%y")
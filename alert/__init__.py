@@ -9,11 +9,10 @@ from pathlib import Path
 from os import listdir, environ
 from datetime import datetime, timedelta
 from dateutil import parser
-from typing import Any, Union
+from typing import Any, Callable, Union
 
 from config import (
     LINKS_INFO_FILE,
-    REPORT_OUTPUT_PATH,
     PERCENTILE,
     MAX_PERCENTILE_REPORTS,
     DEFAULT_MAX_TRAFFIC_PERCENTAGE,
@@ -23,6 +22,9 @@ from config import (
 )
 
 from tsdb.TsdbExtractor import TsdbExtractor
+from percentile.percentile import PercentileSketch
+from reportStore.reportStore import ReportStore
+from metrics.metrics import run_metrics
 from utils import json_reader
 
 
@@ -38,6 +40,7 @@ class Alert(ABC):
         reports_dir: str,
         LINKS_INFO_FILE: str,
         db_client: Any,
+        heal: Callable = None,
     ):
         self.date_begin = date_begin
         """
@@ -53,14 +56,27 @@ class Alert(ABC):
         self.time_threshold = time_threshold
         self.db_client = db_client
         self.hosts_info = self.__get_hosts_info()
+        self.report_store = ReportStore(reports_dir)
         self.files_to_alert = self.__get_files_by_date(
             date_begin, date_end, reports_dir
         )
+        missing_days = self.__find_missing_days(date_begin, date_end)
+        # heal(missing_days, hosts_info) creates the missing reports in `reports_dir`
+        if heal is not None and missing_days:
+            with run_metrics.stage("heal"):
+                heal(missing_days, self.hosts_info)
+            self.files_to_alert = self.__get_files_by_date(
+                date_begin, date_end, reports_dir
+            )
+            missing_days = self.__find_missing_days(date_begin, date_end)
         self.missing_reports_message = self.__check_for_missing_reports(
-            date_begin, date_end
+            missing_days
         )
-        self.time_exceeded_report = self.__check_reports()
-        self.percentile_report = self.__get_percentile_report()
+        with run_metrics.stage("check_reports"):
+            self.time_exceeded_report = self.__check_reports()
+        with run_metrics.stage("percentile_report"):
+            self.percentile_report = self.__get_percentile_report()
+        self.report_store.close()
         self.alert_message = self.__generate_alert_message()
 
     def __generate_alert_message(self) -> str:
@@ -153,9 +169,13 @@ O tráfego coletado é entre às {}h e {}h de cada dia\n".format(
 
         Where XTH_PERCENTILE is the PERCENTILE present in the `PERCENTILE` environment variable
         and N is the number of links to be shown in the report(this can be changed in the variable `MAX_PERCENTILE_REPORTS` inside the `.env` file)
+
+        The percentiles are calculated from the sketches stored in the reports (with a relative error of at most `PERCENTILE_SKETCH_ACCURACY`),
+        the TSDB is only queried for the links that don't have a sketch in every report
         """
         tsdb_extractor = TsdbExtractor()
         percentile_report = {}
+        percentile_sketches = self.__merge_percentile_sketches()
         all_links = list(self.hosts_info.keys())
         for link_name in all_links:
             # gets the link speed from the hosts_info dict and converts it to Mbps/Gbps
@@ -166,39 +186,52 @@ O tráfego coletado é entre às {}h e {}h de cada dia\n".format(
             else:
                 link_speed = f"{link_speed} Mbps"
 
-            # set the time format to the tsdb time format
-            date_begin = parser.parse(self.date_begin).replace(
-                hour=0, minute=0, second=0
-            )
-            date_begin = date_begin.strftime("%Y-%m-%d %H:%M:%S")
-            date_end = parser.parse(self.date_end).replace(
-                hour=23, minute=59, second=59
-            )
-            date_end = date_end.strftime("%Y-%m-%d %H:%M:%S")
-
-            # gets the PERCENTILE for the current link (rx interface)
-            rx_xth_percentile = tsdb_extractor.query_iface_percentile(
-                PERCENTILE,
-                date_begin,
-                date_end,
-                link_name,
-                "rx",
-                self.db_client,
-            )
-            # converts from bits to Mbps
-            rx_xth_percentile = rx_xth_percentile / 1000000
-
-            # gets the PERCENTILE for the current link (rx interface)
-            tx_xth_percentile = tsdb_extractor.query_iface_percentile(
-                PERCENTILE,
-                date_begin,
-                date_end,
-                link_name,
-                "tx",
-                self.db_client,
-            )
-            # converts from bits to Mbps
-            tx_xth_percentile = tx_xth_percentile / 1000000
+            # merges the sketches stored in the reports by the watcher mode
+            if link_name in percentile_sketches:
+                run_metrics.count("links_from_sketches")
+                rx_xth_percentile = (
+                    percentile_sketches[link_name]["rx"].percentile(PERCENTILE) or 0.0
+                ) / 1000000
+                tx_xth_percentile = (
+                    percentile_sketches[link_name]["tx"].percentile(PERCENTILE) or 0.0
+                ) / 1000000
+            # reports without sketches: queries the TSDB
+            else:
+                # set the time format to the tsdb time format
+                date_begin = parser.parse(self.date_begin).replace(
+                    hour=0, minute=0, second=0
+                )
+                date_begin = date_begin.strftime("%Y-%m-%d %H:%M:%S")
+                date_end = parser.parse(self.date_end).replace(
+                    hour=23, minute=59, second=59
+                )
+                date_end = date_end.strftime("%Y-%m-%d %H:%M:%S")
+
+                # gets the PERCENTILE for the current link (rx interface)
+                with run_metrics.query("percentile"):
+                    rx_xth_percentile = tsdb_extractor.query_iface_percentile(
+                        PERCENTILE,
+                        date_begin,
+                        date_end,
+                        link_name,
+                        "rx",
+                        self.db_client,
+                    )
+                # converts from bits to Mbps
+                rx_xth_percentile = rx_xth_percentile / 1000000
+
+                # gets the PERCENTILE for the current link (rx interface)
+                with run_metrics.query("percentile"):
+                    tx_xth_percentile = tsdb_extractor.query_iface_percentile(
+                        PERCENTILE,
+                        date_begin,
+                        date_end,
+                        link_name,
+                        "tx",
+                        self.db_client,
+                    )
+                # converts from bits to Mbps
+                tx_xth_percentile = tx_xth_percentile / 1000000
 
             # gets the highest PERCENTILE between rx and tx
             xth_percentile = max(rx_xth_percentile, tx_xth_percentile)
@@ -245,9 +278,59 @@ O tráfego coletado é entre às {}h e {}h de cada dia\n".format(
 
         return percentile_report
 
+    def __merge_percentile_sketches(self) -> dict:
+        """
+        Merges the percentile sketches of each link in the reports of the date range (read from the report store)
+
+        Returns a dict with the following format:
+        {
+            LINK_NAME: {
+                "rx": PercentileSketch,
+                "tx": PercentileSketch,
+            }
+        }
+
+        Links without a sketch in any of the reports (reports created before the sketches or without data)
+        aren't returned, so no link is returned if there are no reports
+        """
+        if not self.files_to_alert:
+            return {}
+        date_begin, date_end = self.__extract_separate_dates(
+            self.date_begin, self.date_end
+        )
+        stored_sketches = self.report_store.get_percentile_sketches(
+            date_begin, date_end
+        )
+
+        percentile_sketches = {}
+        for link_name in self.hosts_info:
+            link_sketches = stored_sketches.get(link_name, {"rx": [], "tx": []})
+            if any(
+                len(link_sketches[iface]) != len(self.files_to_alert)
+                or None in link_sketches[iface]
+                for iface in ("rx", "tx")
+            ):
+                continue
+            try:
+                percentile_sketches[link_name] = {
+                    iface: PercentileSketch.from_dict(link_sketches[iface][0])
+                    for iface in ("rx", "tx")
+                }
+                for iface in ("rx", "tx"):
+                    for percentile_sketch in link_sketches[iface][1:]:
+                        percentile_sketches[link_name][iface].merge(
+                            PercentileSketch.from_dict(percentile_sketch)
+                        )
+            # sketches with different accuracies
+            except ValueError:
+                percentile_sketches.pop(link_name)
+
+        logger.info("percentile sketches found for %d links", len(percentile_sketches))
+        return percentile_sketches
+
     def __check_reports(self) -> dict:
         """
-        Checks each report file in the `files_to_alert` list
+        Checks the exceeded times of each report in the `files_to_alert` list (read from the report store)
 
         Returns a dict with the following format:
         {
@@ -258,42 +341,28 @@ O tráfego coletado é entre às {}h e {}h de cada dia\n".format(
             }
         }
         """
-        hosts_info = json_reader(self.LINKS_INFO_FILE)
+        date_begin, date_end = self.__extract_separate_dates(
+            self.date_begin, self.date_end
+        )
+        exceeded_times = self.report_store.get_exceeded_times(date_begin, date_end)
 
-        # iterates over each file in the files_to_alert list
+        # iterates over each report in the files_to_alert list
         time_exceeded_report = {}
-        for file in self.files_to_alert:
-            # reads the file
-            current_report = json_reader(file)
-
-            # removes the "Data" key from the report
-            current_report.pop("Data", None)
+        for day, file_name in self.report_store.get_days(date_begin, date_end):
+            current_report = exceeded_times.get(day, {})
 
             # for each key in hosts_info dict
-            for link_name in hosts_info:
+            for link_name in self.hosts_info:
                 # if the link_name is not present in the current_report, updates the "no_data" dict
-                if (
-                    link_name not in current_report
-                    or current_report[link_name] == "No data"
-                ):
-                    self.no_data_report[file.name] = {
-                        "date": file.name.split("_")[1].split(".")[0],
-                        link_name: hosts_info[link_name],
+                if link_name not in current_report:
+                    self.no_data_report[file_name] = {
+                        "date": file_name.split("_")[1].split(".")[0],
+                        link_name: self.hosts_info[link_name],
                     }
                     continue
 
                 # if the link_name is present in the current_report, updates/creates the "time_exceeded" key
-                rx_time_exceeded = (
-                    current_report.get(link_name, {})
-                    .get("rx", {})
-                    .get("total_exceeded", 0)
-                )
-                tx_time_exceeded = (
-                    current_report.get(link_name, {})
-                    .get("tx", {})
-                    .get("total_exceeded", 0)
-                )
-                total_exceeded_time = rx_time_exceeded + tx_time_exceeded
+                total_exceeded_time = current_report[link_name]
                 if total_exceeded_time >= self.time_threshold:
                     # if the current link is not present in the time_exceeded_report dict, creates it
                     if link_name not in time_exceeded_report:
@@ -321,49 +390,35 @@ O tráfego coletado é entre às {}h e {}h de cada dia\n".format(
 
     def __get_hosts_info(self) -> dict:
         """
-        It reads the hosts information file from the `LINKS_INFO_FILE` environment variable
+        It reads the hosts information file given to the alert (`LINKS_INFO_FILE` environment variable by default)
         and updates the `hosts_info` dict with the following format:
 
         {
             LINK_NAME: LINK_SPEED
         }
         """
-        hosts_file = json_reader(LINKS_INFO_FILE)
-        logger.info("hosts info read successfully from %s", LINKS_INFO_FILE)
+        hosts_file = json_reader(self.LINKS_INFO_FILE)
+        logger.info("hosts info read successfully from %s", self.LINKS_INFO_FILE)
         return hosts_file
 
     def __get_files_by_date(
         self, date_begin: str, date_end: str, reports_dir: str
     ) -> list[Path]:
         """
-        Returns a list of files with the given date
+        Returns a list of the report files of the given dates (ordered by date), read from the report store
+
+        The report files saved before the report store existed are indexed first
         """
-        logger.info("getting files from %s", reports_dir)
+        logger.info("getting reports from the store at %s", reports_dir)
 
         reports_dir = Path(reports_dir)
         date_begin, date_end = self.__extract_separate_dates(date_begin, date_end)
+        self.report_store.index_missing_days(date_begin, date_end)
 
-        files = []
-        # iterates over the files only
-        for file in reports_dir.iterdir():
-            if not file.is_file() or not "reports_" in file.name:
-                continue
-
-            file_date = file.name.split("_")[1].split(".")[0]
-            # date may come as 2021-01-01 or 2021-01-01 00:00:00
-            file_date = file_date.split(" ")[0]
-            file_date = datetime.strptime(file_date, "%d-%m-%y")
-            is_between_dates = date_begin <= file_date <= date_end
-            if is_between_dates:
-                files.append(file)
-
-        ordered_files = sorted(
-            files,
-            key=lambda file: datetime.strptime(
-                file.name.split("_")[1].split(".")[0], "%d-%m-%y"
-            ),
-        )
-        return ordered_files
+        return [
+            reports_dir / file_name
+            for _, file_name in self.report_store.get_days(date_begin, date_end)
+        ]
 
     def __extract_separate_dates(self, date_begin: str, date_end: str) -> tuple:
         """
@@ -393,44 +448,37 @@ O tráfego coletado é entre às {}h e {}h de cada dia\n".format(
 
         return date_begin, date_end
 
-    def __check_for_missing_reports(self, date_begin: str, date_end: str) -> str:
+    def __find_missing_days(self, date_begin: str, date_end: str) -> list[datetime]:
         """
-        Checks if there are any missing reports in the files_to_alert list
-
-        Returns a string with a message about the missing reports, or an empty string
+        Returns the days of the given dates (format: YYYY-MM-DD) without a report in the files_to_alert list,
+        ordered by date
         """
-
-        # if theres the same amount of files as days between the dates, there are no missing reports
         date_begin = datetime.strptime(date_begin, "%Y-%m-%d")
         date_end = datetime.strptime(date_end, "%Y-%m-%d")
-        days_between_dates = (date_end - date_begin).days
-        if days_between_dates == len(self.files_to_alert):
-            return ""
-
-        # checks for holes in the files_to_alert list
-        missing_reports = []
-        # iterates over the files only
-        dates_to_check = [
-            date_begin + timedelta(days=i) for i in range(days_between_dates + 1)
-        ]
+        report_files = {file.name for file in self.files_to_alert}
 
-        for date in dates_to_check:
-            date = date.strftime("%d-%m-%y")
-            current_file = f"{REPORT_OUTPUT_PATH}reports_{date}.json"
-            current_file = Path(current_file)
-            if current_file not in self.files_to_alert:
-                missing_reports.append(date)
+        missing_days = []
+        for i in range((date_end - date_begin).days + 1):
+            date = date_begin + timedelta(days=i)
+            if "reports_{}.json".format(date.strftime("%d-%m-%y")) not in report_files:
+                missing_days.append(date)
+        return missing_days
 
-        # if there are no missing reports, return an empty string
-        if not missing_reports:
+    def __check_for_missing_reports(self, missing_days: list[datetime]) -> str:
+        """
+        Returns a string with a message about the missing reports (see `__find_missing_days`),
+        or an empty string if there are none
+        """
+        if not missing_days:
             return ""
+        missing_reports = [date.strftime("%d-%m-%y") for date in missing_days]
 
         # if there are missing reports, return a string with the missing reports
         message = f"\nATENÇÃO: Os relatórios das seguintes datas estão faltando:\n"
         for report in missing_reports:
             logger.info("report %s is missing", report)
             message += f"\t- {report}\n"
-        message += f"\nVerifique se o script está rodando corretamente ou gere os relatórios manualmente\n"
+        message += f"\nVerifique se o script está rodando corretamente ou gere os relatórios com a flag --heal\n"
         message += f"Tenha em mente que este relatório\n\
 não está considerando os possíveis tempos excedidos presentes nesses relatórios que faltam\n"
 
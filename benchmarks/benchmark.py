@@ -0,0 +1,365 @@
+#!/usr/bin/env python
+# coding=utf-8
+
+"""
+synthetic-load benchmark of the watcher and alert modes, using an in-process fake InfluxDB client
+(benchmarks/fakeTsdb.py) instead of a live TSDB
+
+usage (from the repository root):
+    python -m benchmarks.benchmark --links 500 --days 7 --step 300 --output results.json
+"""
+
+import argparse
+import json
+import logging
+import platform
+import shutil
+import sys
+import tempfile
+
+from datetime import datetime, timedelta
+from functools import partial
+from importlib.machinery import SourceFileLoader
+from importlib.util import module_from_spec, spec_from_loader
+from os import environ, makedirs
+from os.path import dirname, join
+from time import perf_counter
+
+from dotenv import load_dotenv
+
+from benchmarks.fakeTsdb import FakeInfluxDBClient, make_links_config
+
+ROOT_PATH = dirname(dirname(__file__))
+
+# settings needed to import config.py when there is no .env file
+DEFAULT_ENV = {
+    "WORK_HOUR_BEGIN": "8",
+    "WORK_HOUR_END": "18",
+    "DEFAULT_MAX_TRAFFIC_PERCENTAGE": "0.8",
+    "DEFAULT_LINK_HISTERESYS": "0.05",
+    "TIME_THRESHOLD": "60",
+    "IGNORE_LIST": "",
+    "OUTPUT_IDENT_LEVEL": "6",
+    "OUTPUT_TIMEZONE": "America/Sao_Paulo",
+    "PERCENTILE": "95",
+    "TSDB_TIME_FORMAT": "%Y-%m-%d %H:%M:%S",
+    "TSDB_TIMEZONE": "UTC",
+    "API_HOST": "http://localhost/",
+    "EMAILS_TO_ALERT": "",
+    "TELEGRAM_CHAT_IDS": "",
+    "MAX_PERCENTILE_REPORTS": "10",
+    "LOGGING_LEVEL": "ERROR",
+    "MAX_LOG_SIZE": "1",
+    "BACKUP_COUNT": "1",
+    "LOGGER_NAME": "watcher",
+}
+
+
+def process_args():
+    parser = argparse.ArgumentParser(
+        description="Benchmarks the watcher and alert modes with a fake TSDB"
+    )
+    parser.add_argument(
+        "--links", type=int, default=200, help="number of fake links (default: 200)"
+    )
+    parser.add_argument(
+        "--days", type=int, default=7, help="number of days to check (default: 7)"
+    )
+    parser.add_argument(
+        "--step",
+        type=int,
+        default=300,
+        choices=[60, 300],
+        help="seconds between the points of the fake series (default: 300)",
+    )
+    parser.add_argument(
+        "--date-begin",
+        type=str,
+        default="2026-03-02",
+        help="first day to check, format: YYYY-MM-DD (default: 2026-03-02)",
+    )
+    parser.add_argument(
+        "--workers", type=int, default=8, help="watcher worker threads (default: 8)"
+    )
+    parser.add_argument(
+        "--processes",
+        type=int,
+        default=0,
+        help="also runs the watcher with this number of detection processes (default: 0, not run)",
+    )
+    parser.add_argument(
+        "--repeat",
+        type=int,
+        default=3,
+        help="times each stage is run, the best time is kept (default: 3)",
+    )
+    parser.add_argument(
+        "--output",
+        type=str,
+        default="benchmark_results.json",
+        help="json file where the results are saved (default: benchmark_results.json)",
+    )
+    return parser.parse_args()
+
+
+def best_time(function, repeat: int) -> float:
+    """
+    runs `function` `repeat` times and returns the best time (in seconds)
+    """
+    times = []
+    for _ in range(repeat):
+        start = perf_counter()
+        function()
+        times.append(perf_counter() - start)
+    return min(times)
+
+
+def load_influx_extractor(step: int):
+    """
+    loads the influx TsdbExtractor (tsdb/TsdbExtractor.influx.sample)
+    with its InfluxDBClient replaced by the fake client
+
+    returns the TsdbExtractor class
+    """
+    import influxdb
+
+    loader = SourceFileLoader(
+        "influxTsdbExtractor", join(ROOT_PATH, "tsdb", "TsdbExtractor.influx.sample")
+    )
+    module = module_from_spec(spec_from_loader(loader.name, loader))
+    loader.exec_module(module)
+    # the client is only imported (from the influxdb module) by `connect`
+    influxdb.InfluxDBClient = partial(FakeInfluxDBClient, step=step)
+    return module.TsdbExtractor
+
+
+def run_stages(args, links_config: dict, tsdb_extractor, output_path: str) -> tuple:
+    """
+    times each stage of the watcher over all the links of the first day
+
+    returns a tuple with:
+    - a dict with the seconds spent in each stage
+    - a dict with the number of points and exceeded intervals checked in the stages
+    """
+    from watcher import check_link_data, create_link_report
+    from dateManipulator.dateManipulator import DateManipulator
+    from percentile.percentile import calculate_percentile, PercentileSketch
+    from series.series import Series
+    from utils import save_json
+    from config import PERCENTILE, TSDB_AUTH
+
+    date_manipulator = DateManipulator()
+    date_manipulator.set_tsdb_date_interval(args.date_begin, args.date_begin)
+    db_client = tsdb_extractor().connect(**TSDB_AUTH)
+    link_names = list(links_config)
+    begin = date_manipulator.convert_to_epoch(environ["QUERY_DATE_BEGIN"])
+    end = date_manipulator.convert_to_epoch(environ["QUERY_DATE_END"])
+
+    # the raw responses and the parsed series are kept for the next stages
+    responses = {}
+    traffic = {}
+
+    def generate():
+        for link_name in link_names:
+            for iface in ("rx", "tx"):
+                responses[(link_name, iface)] = db_client.query(
+                    'SELECT "value" FROM "check_iface_traffic" WHERE "time" >= {}s AND "time" <= {}s AND \
+                    "hostname" = \'{}\' AND "metric" = \'iface-traffic{}\''.format(
+                        begin, end, link_name, iface
+                    ),
+                    epoch="s",
+                )
+
+    def parse():
+        for (link_name, iface), response in responses.items():
+            traffic.setdefault(link_name, {})[iface] = Series.from_influx(
+                response.raw["series"][0]
+            )
+
+    def fetch():
+        for link_name in link_names:
+            for iface in ("rx", "tx"):
+                tsdb_extractor().query_iface_traffic(link_name, iface, db_client)
+
+    def fetch_bulk():
+        tsdb_extractor().query_links_traffic(link_names, db_client)
+
+    reports = {}
+
+    def detect():
+        reports.clear()
+        for link_name in link_names:
+            reports[link_name] = create_link_report()
+            for iface in ("rx", "tx"):
+                check_link_data(
+                    traffic[link_name][iface],
+                    reports,
+                    link_name,
+                    links_config[link_name],
+                    iface,
+                )
+
+    def percentile():
+        for link_name in link_names:
+            for iface in ("rx", "tx"):
+                calculate_percentile(traffic[link_name][iface], PERCENTILE)
+
+    def sketch():
+        for link_name in link_names:
+            for iface in ("rx", "tx"):
+                reports[link_name][iface]["percentile_sketch"] = (
+                    PercentileSketch.from_values(
+                        traffic[link_name][iface].values * 8
+                    ).to_dict()
+                )
+
+    def save():
+        save_json(reports, join(output_path, "stage_report.json"))
+
+    stages = {}
+    for name, function in (
+        ("generate", generate),
+        ("parse", parse),
+        ("fetch", fetch),
+        ("fetch_bulk", fetch_bulk),
+        ("detect", detect),
+        ("percentile", percentile),
+        ("sketch", sketch),
+        ("save", save),
+    ):
+        stages[name] = best_time(function, args.repeat)
+
+    load = {
+        "points": sum(
+            len(traffic[link_name][iface])
+            for link_name in link_names
+            for iface in ("rx", "tx")
+        ),
+        "intervals": sum(
+            len(reports[link_name][iface]["intervals"])
+            for link_name in link_names
+            for iface in ("rx", "tx")
+        ),
+    }
+    return stages, load
+
+
+def run_watcher(args, links_file: str, reports_path: str, flags: list) -> float:
+    """
+    runs the watcher mode (watcher.main) over all the days
+
+    returns the time spent (in seconds)
+    """
+    import watcher
+
+    date_end = datetime.strptime(args.date_begin, "%Y-%m-%d") + timedelta(
+        days=args.days - 1
+    )
+    sys.argv = [
+        "watcher.py",
+        "watcher",
+        "-f",
+        links_file,
+        "-o",
+        reports_path,
+        "-w",
+        str(args.workers),
+        "--no-cache",
+        "--date-begin",
+        args.date_begin,
+        "--date-end",
+        date_end.strftime("%Y-%m-%d"),
+    ] + flags
+    makedirs(reports_path, exist_ok=True)
+
+    start = perf_counter()
+    try:
+        watcher.main()
+    except SystemExit:
+        pass
+    return perf_counter() - start
+
+
+def run_alert(args, links_file: str, reports_path: str) -> float:
+    """
+    builds the alert of all the days (reading the reports saved by the watcher mode)
+
+    returns the time spent (in seconds)
+    """
+    from alert.Alerta import Alerta
+
+    date_end = datetime.strptime(args.date_begin, "%Y-%m-%d") + timedelta(
+        days=args.days - 1
+    )
+    start = perf_counter()
+    Alerta(
+        args.date_begin,
+        date_end.strftime("%Y-%m-%d"),
+        60,
+        reports_path,
+        links_file,
+        FakeInfluxDBClient(step=args.step),
+    )
+    return perf_counter() - start
+
+
+def main():
+    args = process_args()
+
+    work_path = tempfile.mkdtemp(prefix="watcher_benchmark_")
+    links_file = join(work_path, "links.json")
+    load_dotenv()
+    for key, value in DEFAULT_ENV.items():
+        environ.setdefault(key, value)
+    environ.setdefault("LINKS_INFO_FILE", links_file)
+    environ.setdefault("REPORT_OUTPUT_PATH", work_path)
+    environ.setdefault("LOG_FILE", join(work_path, "watcher.log"))
+    environ["API_SPOOL_PATH"] = join(work_path, "spool")
+    sys.path.insert(0, ROOT_PATH)
+    logging.getLogger("watcher").setLevel(logging.ERROR)
+
+    import numpy
+    import watcher
+    import alert
+
+    links_config = make_links_config(args.links)
+    with open(links_file, "w") as f:
+        json.dump(links_config, f)
+
+    tsdb_extractor = load_influx_extractor(args.step)
+    watcher.TsdbExtractor = tsdb_extractor
+    alert.TsdbExtractor = tsdb_extractor
+
+    stages, load = run_stages(args, links_config, tsdb_extractor, work_path)
+    results = {
+        "params": vars(args),
+        "python": platform.python_version(),
+        "numpy": numpy.__version__,
+        "date": datetime.now().isoformat(timespec="seconds"),
+        "load": load,
+        "stages": stages,
+        "end_to_end": {
+            "watcher": run_watcher(args, links_file, join(work_path, "reports"), []),
+            "watcher_bulk": run_watcher(
+                args, links_file, join(work_path, "reports_bulk"), ["--bulk"]
+            ),
+            "alert": run_alert(args, links_file, join(work_path, "reports")),
+        },
+    }
+    if args.processes:
+        results["end_to_end"]["watcher_processes"] = run_watcher(
+            args,
+            links_file,
+            join(work_path, "reports_processes"),
+            ["-p", str(args.processes)],
+        )
+
+    shutil.rmtree(work_path)
+
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=4)
+    print(json.dumps(results, indent=4))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,210 @@
+#!/usr/bin/env python
+# coding=utf-8
+
+import re
+import numpy as np
+
+from zlib import crc32
+from influxdb.resultset import ResultSet
+
+# link speed (in bits) of every fake link
+LINK_SPEED = 1000000000
+
+
+def make_links_config(links: int) -> dict:
+    """
+    Returns the config of `links` fake links (in the links.json format)
+    """
+    return {
+        "LINK-{:05d}".format(i): {
+            "LINK_SPEED": LINK_SPEED,
+            "LINK_MAX_TRAFFIC_PERCENTAGE": 0.8,
+            "LINK_HISTERESYS": 0.05,
+        }
+        for i in range(links)
+    }
+
+
+def generate_values(hostname: str, metric: str, times: np.ndarray) -> np.ndarray:
+    """
+    Generates the traffic (in bytes) of a fake link interface at the given epoch timestamps
+
+    The values only depend on the hostname, the metric and the timestamp, so any time range
+    returns the same points. Besides a daily wave and noise, the traffic has:
+    - congestion: one of every 4 links stays near its speed for 1 of every 7 hours
+    - spikes: about 1 point in 500 is 10 times the link speed (link going down and up)
+    """
+    seed = crc32("{}{}".format(hostname, metric).encode())
+    noise = ((times * 2654435761 + seed) % 4294967296) / 4294967296
+    hour = (times // 3600) % 24
+    wave = 0.3 + 0.25 * np.sin((hour - 6) / 24 * 2 * np.pi)
+    values = LINK_SPEED / 8 * (wave + 0.2 * noise)
+
+    if seed % 4 == 0:
+        congested = (times // 3600 + seed) % 7 == 0
+        values[congested] = LINK_SPEED / 8 * (0.9 + 0.1 * noise[congested])
+    values[noise < 0.002] = LINK_SPEED / 8 * 10
+    return values
+
+
+def aggregate(
+    times: np.ndarray, values: np.ndarray, bucket: int, function: str
+) -> tuple:
+    """
+    Aggregates the points in buckets of `bucket` seconds, like GROUP BY time(bucket) fill(none)
+
+    Returns a tuple with the start of each bucket and its max or mean value
+    """
+    buckets, starts = np.unique(times // bucket * bucket, return_index=True)
+    if function == "max":
+        return buckets, np.maximum.reduceat(values, starts)
+    counts = np.diff(starts, append=len(values))
+    return buckets, np.add.reduceat(values, starts) / counts
+
+
+class FakeInfluxDBClient:
+    """
+    In-process replacement of the InfluxDBClient, answering the queries of tsdb/TsdbExtractor.influx.sample
+    with generated series of points every `step` seconds (aggregated with GROUP BY time)
+
+    Every hostname reports its traffic on the interface "ge-0/0/0.0" of the switch "RT-<hostname>",
+    and on the other (ifdesc, switch) interfaces given in `interfaces` ({hostname: [(ifdesc, switch)]}).
+    Like InfluxDB, the points of every interface matched by a query are merged in a single series
+    """
+
+    def __init__(self, *args, step: int = 300, interfaces: dict = None, **kwargs):
+        self.step = step
+        self.interfaces = interfaces or {}
+        self.queries = 0
+
+    def query(
+        self,
+        query: str,
+        epoch: str = None,
+        chunked: bool = False,
+        chunk_size: int = 0,
+    ):
+        """
+        Returns a ResultSet with the points of the query,
+        or a generator of ResultSets with up to `chunk_size` points of each series if `chunked`
+        (the points of a chunk are only generated when it's read, like a streamed response)
+        """
+        if not chunked:
+            return self.__query(query)
+        return self.__query_chunks(query, chunk_size or 10000)
+
+    def __query_chunks(self, query: str, chunk_size: int):
+        begin, end = [int(t) for t in re.findall(r"time\"? [<>]= (\d+)s", query)]
+        bucket = re.search(r"time\((\d+)([smh])\)", query)
+        chunk_seconds = chunk_size * self.step
+        if bucket is not None:
+            chunk_seconds = chunk_size * (
+                int(bucket.group(1)) * {"s": 1, "m": 60, "h": 3600}[bucket.group(2)]
+            )
+        # the chunks are aligned to the epoch (like the points and the buckets),
+        # so no bucket is split between two chunks
+        chunk_begins = [begin] + list(
+            range((begin // chunk_seconds + 1) * chunk_seconds, end + 1, chunk_seconds)
+        )
+        for chunk_begin, next_begin in zip(chunk_begins, chunk_begins[1:] + [end + 1]):
+            chunk_end = next_begin - 1
+            yield self.__query(
+                query.replace(
+                    "{}s".format(begin), "{}s".format(chunk_begin), 1
+                ).replace("{}s".format(end), "{}s".format(chunk_end), 1)
+            )
+
+    def __query(self, query: str) -> ResultSet:
+        self.queries += 1
+        begin, end = [int(t) for t in re.findall(r"time\"? [<>]= (\d+)s", query)]
+        where = re.search(r"WHERE (.*?)(?: GROUP BY |$)", query, re.S).group(1)
+        hostnames = list(dict.fromkeys(re.findall(r"\"hostname\" = '([^']+)'", query)))
+        metrics = re.findall(r"'(iface-traffic(?:rx|tx))'", query)
+        percentile = re.search(r"percentile\(\"value\",([\d.]+)\)", query)
+        function = re.search(r"(max|mean)\(\"value\"\)", query)
+        bucket = re.search(r"time\((\d+)([smh])\)", query)
+
+        times = np.arange(-(-begin // self.step) * self.step, end + 1, self.step)
+        series = []
+        for hostname in hostnames:
+            for metric in metrics:
+                series_times, values = self.__interfaces_values(
+                    where, hostname, metric, times
+                )
+                if len(series_times) == 0:
+                    continue
+                if bucket is not None:
+                    series_times, values = aggregate(
+                        series_times,
+                        values,
+                        int(bucket.group(1))
+                        * {"s": 1, "m": 60, "h": 3600}[bucket.group(2)],
+                        function.group(1),
+                    )
+                if percentile is not None:
+                    rank = int(len(values) * float(percentile.group(1)) / 100 + 0.5)
+                    columns = ["time", "percentile"]
+                    rows = [[int(begin), float(np.sort(values)[max(rank, 1) - 1])]]
+                else:
+                    columns = ["time", "value"]
+                    rows = np.column_stack((series_times, values)).tolist()
+                    for row in rows:
+                        row[0] = int(row[0])
+                series.append(
+                    {
+                        "name": "check_iface_traffic",
+                        "tags": {"hostname": hostname, "metric": metric},
+                        "columns": columns,
+                        "values": rows,
+                    }
+                )
+        if '"hostname", "metric"' not in query:
+            for s in series:
+                s.pop("tags")
+        return ResultSet({"series": series})
+
+    def __interfaces_values(
+        self, where: str, hostname: str, metric: str, times: np.ndarray
+    ) -> tuple:
+        """
+        Returns the times and values of the interfaces of the hostname matched by the WHERE clause,
+        merged in time order
+        """
+        interfaces = [("ge-0/0/0.0", "RT-{}".format(hostname))]
+        interfaces += self.interfaces.get(hostname, [])
+        merged_times, merged_values = [], []
+        for i, (ifdesc, switch) in enumerate(interfaces):
+            tags = {
+                "hostname": hostname,
+                "metric": metric,
+                "ifdesc": ifdesc,
+                "switch": switch,
+            }
+            if not matches(where, tags):
+                continue
+            merged_times.append(times)
+            # the other interfaces have their own traffic
+            source = hostname if i == 0 else "{}{}{}".format(hostname, ifdesc, switch)
+            merged_values.append(generate_values(source, metric, times))
+        if not merged_times:
+            return times[:0], times[:0].astype(np.float64)
+        if len(merged_times) == 1:
+            return merged_times[0], merged_values[0]
+        merged_times = np.concatenate(merged_times)
+        order = np.argsort(merged_times, kind="stable")
+        return merged_times[order], np.concatenate(merged_values)[order]
+
+
+def matches(where: str, tags: dict) -> bool:
+    """
+    Checks if a series with the given tags is matched by the WHERE clause of a query
+    (tag comparisons and time ranges joined by AND and OR, and parentheses)
+    """
+    expression = re.sub(r"\"?time\"? [<>]= \d+s", "True", where)
+    expression = re.sub(
+        r"\"(\w+)\" = '([^']*)'",
+        lambda match: str(tags.get(match.group(1)) == match.group(2)),
+        expression,
+    )
+    expression = re.sub(r"\bAND\b", "and", re.sub(r"\bOR\b", "or", expression))
+    return eval(expression)
@@ -0,0 +1,220 @@
+#!/usr/bin/env python
+# coding=utf-8
+
+"""
+start-up benchmark: measures the import time of each mode with `python -X importtime`
+(on fresh interpreters) and fails when it regresses
+
+the run fails (exit code 1) if:
+- a backend module (influxdb, pynetbox, requests) is imported at start-up,
+  they must only be imported by the code that uses them
+- the median import time of a mode is above --max-import-ms
+- the median import time of a mode is more than --tolerance above the one in the --baseline results
+
+usage (from the repository root):
+    python -m benchmarks.startup --repeat 10 --output startup.json
+    python -m benchmarks.startup --baseline startup.json
+"""
+
+import argparse
+import json
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+
+from datetime import datetime
+from os import environ
+from os.path import join
+from statistics import median
+
+from benchmarks.benchmark import DEFAULT_ENV, ROOT_PATH
+
+# modules imported by each mode before it starts working
+MODES = {
+    "watcher": ["watcher"],
+    "alert": ["watcher", "alert.Alerta"],
+}
+
+# modules that must only be imported when they are used (connecting, syncing the IRM, sending)
+BACKENDS = ["influxdb", "pynetbox", "requests"]
+
+
+def process_args():
+    parser = argparse.ArgumentParser(
+        description="Benchmarks the start-up (import time) of the watcher modes"
+    )
+    parser.add_argument(
+        "--repeat",
+        type=int,
+        default=5,
+        help="fresh interpreters started for each mode, the median is kept (default: 5)",
+    )
+    parser.add_argument(
+        "--max-import-ms",
+        type=float,
+        default=300,
+        help="max median import time (in milliseconds) of each mode (default: 300)",
+    )
+    parser.add_argument(
+        "--baseline",
+        type=str,
+        help="json results of a previous run to compare with",
+    )
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.2,
+        help="max increase of the import time over the baseline (default: 0.2, 20%%)",
+    )
+    parser.add_argument(
+        "--output",
+        type=str,
+        default="startup_results.json",
+        help="json file where the results are saved (default: startup_results.json)",
+    )
+    return parser.parse_args()
+
+
+def parse_importtime(stderr: str, modules: list) -> tuple:
+    """
+    parses the `-X importtime` output of the import of the given modules
+
+    returns a tuple with:
+    - the time spent importing the modules (in milliseconds)
+    - a dict with the cumulative time (in milliseconds) of each module imported by them directly
+    """
+    total = 0
+    imports = {}
+    # the modules imported by the next top level import (printed before it)
+    children = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|")
+        if not cumulative.strip().isdigit():
+            # header line
+            continue
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        name = name.strip()
+        if depth == 1:
+            children[name] = int(cumulative) / 1000
+        elif depth == 0:
+            # the packages of "alert.Alerta" are top level imports too
+            if any(
+                module == name or module.startswith(name + ".") for module in modules
+            ):
+                total += int(cumulative)
+                for child, child_ms in children.items():
+                    imports[child] = imports.get(child, 0) + child_ms
+            children = {}
+    return total / 1000, imports
+
+
+def measure_mode(modules: list, env: dict) -> dict:
+    """
+    imports the given modules on a fresh interpreter
+
+    returns a dict with the import time (in milliseconds), the slowest imports
+    and the backend modules that were imported
+    """
+    code = "{}; import sys, json; print(json.dumps({}))".format(
+        "; ".join("import {}".format(module) for module in modules),
+        "[m for m in {!r} if m in sys.modules]".format(BACKENDS),
+    )
+    process = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=ROOT_PATH,
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    import_ms, imports = parse_importtime(process.stderr, modules)
+    return {
+        "import_ms": import_ms,
+        "slowest_imports": dict(
+            sorted(imports.items(), key=lambda item: item[1], reverse=True)[:10]
+        ),
+        "backends": json.loads(process.stdout.splitlines()[-1]),
+    }
+
+
+def check_results(args, results: dict) -> list:
+    """
+    returns the list of failures of the results
+    """
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+
+    failures = []
+    for mode, result in results["modes"].items():
+        if result["backends"]:
+            failures.append(
+                "{}: backends imported at start-up: {}".format(
+                    mode, ", ".join(result["backends"])
+                )
+            )
+        if result["import_ms"] > args.max_import_ms:
+            failures.append(
+                "{}: import time {:.1f}ms is above {:.1f}ms".format(
+                    mode, result["import_ms"], args.max_import_ms
+                )
+            )
+        if baseline is not None and mode in baseline["modes"]:
+            limit = baseline["modes"][mode]["import_ms"] * (1 + args.tolerance)
+            if result["import_ms"] > limit:
+                failures.append(
+                    "{}: import time {:.1f}ms is above the baseline limit {:.1f}ms".format(
+                        mode, result["import_ms"], limit
+                    )
+                )
+    return failures
+
+
+def main():
+    args = process_args()
+
+    work_path = tempfile.mkdtemp(prefix="watcher_startup_")
+    env = dict(environ)
+    for key, value in DEFAULT_ENV.items():
+        env.setdefault(key, value)
+    env.setdefault("LINKS_INFO_FILE", join(work_path, "links.json"))
+    env.setdefault("REPORT_OUTPUT_PATH", work_path)
+    env.setdefault("LOG_FILE", join(work_path, "watcher.log"))
+
+    results = {
+        "params": vars(args),
+        "python": platform.python_version(),
+        "date": datetime.now().isoformat(timespec="seconds"),
+        "modes": {},
+    }
+    for mode, modules in MODES.items():
+        runs = [measure_mode(modules, env) for _ in range(args.repeat)]
+        results["modes"][mode] = {
+            "import_ms": median(run["import_ms"] for run in runs),
+            "runs_ms": [run["import_ms"] for run in runs],
+            # of the fastest run
+            "slowest_imports": min(runs, key=lambda run: run["import_ms"])[
+                "slowest_imports"
+            ],
+            "backends": sorted(set().union(*(run["backends"] for run in runs))),
+        }
+
+    shutil.rmtree(work_path)
+
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=4)
+    print(json.dumps(results, indent=4))
+
+    failures = check_results(args, results)
+    for failure in failures:
+        print("FAIL", failure, file=sys.stderr)
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,168 @@
+#!/usr/bin/env python
+# coding=utf-8
+
+import os
+import struct
+import numpy as np
+
+from datetime import datetime
+from logging import getLogger
+from pathlib import Path
+from threading import Lock
+from pytz import timezone as tz
+
+from series.series import Series
+from dateManipulator.dateManipulator import DateManipulator
+from config import TSDB_TIME_FORMAT, OUTPUT_TIMEZONE
+
+logger = getLogger("watcher")
+
+# file header: magic, format version, number of points, window begin, window end
+HEADER = struct.Struct("<8sIQqq4x")
+MAGIC = b"LWSERIES"
+VERSION = 1
+
+
+class SeriesCache:
+    """
+    On-disk cache of the traffic fetched from the TSDB, with one file per (link, iface, day window)
+
+    Each file holds a header followed by the timestamps (int64) and the values (float64) of the series,
+    so cached series are memory-mapped instead of read.
+    Only windows that are fully in the past are cached, and the least recently used files
+    are removed when the cache gets bigger than `max_size` bytes
+    """
+
+    def __init__(self, path: str, max_size: int):
+        self.path = Path(path)
+        self.max_size = max_size
+        self.lock = Lock()
+        self.path.mkdir(parents=True, exist_ok=True)
+        self.size = sum(file.stat().st_size for file in self.__files())
+        # everything before today (in the OUTPUT_TIMEZONE of the windows) is fully in the past
+        today = datetime.now(tz(OUTPUT_TIMEZONE)).replace(hour=0, minute=0, second=0)
+        self.today_begin = DateManipulator().convert_to_epoch(
+            today.strftime(TSDB_TIME_FORMAT)
+        )
+
+    def __files(self) -> list[Path]:
+        return [file for file in self.path.glob("*/*.series") if file.is_file()]
+
+    def __file_path(self, link_name: str, iface: str, begin: int, end: int) -> Path:
+        link_name = link_name.replace(os.sep, "_")
+        return self.path / link_name / "{}_{}_{}.series".format(iface, begin, end)
+
+    def is_closed(self, end: int) -> bool:
+        """
+        Checks if a window ending at `end` (epoch timestamp) is fully in the past
+        """
+        return end < self.today_begin
+
+    def get(self, link_name: str, iface: str, begin: int, end: int) -> Series | None:
+        """
+        Returns the cached series of the given link interface and window, or None if it isn't cached
+        """
+        file_path = self.__file_path(link_name, iface, begin, end)
+        try:
+            with open(file_path, "rb") as f:
+                magic, version, points, _, _ = HEADER.unpack(f.read(HEADER.size))
+        except (OSError, struct.error):
+            return None
+        if magic != MAGIC or version != VERSION:
+            logger.warning("ignoring invalid cache file %s", file_path)
+            return None
+
+        # marking the file as recently used
+        os.utime(file_path)
+        if points == 0:
+            return Series()
+        times = np.memmap(
+            file_path, dtype=np.int64, mode="r", offset=HEADER.size, shape=(points,)
+        )
+        values = np.memmap(
+            file_path,
+            dtype=np.float64,
+            mode="r",
+            offset=HEADER.size + points * 8,
+            shape=(points,),
+        )
+        return Series(times, values)
+
+    def put(
+        self, link_name: str, iface: str, begin: int, end: int, data: Series | None
+    ):
+        """
+        Stores the series of the given link interface and window, if the window is fully in the past
+
+        The series of a failed query (None) is never stored, so it's queried again on the next run
+        """
+        if data is None or not self.is_closed(end):
+            return
+
+        file_path = self.__file_path(link_name, iface, begin, end)
+        file_path.parent.mkdir(exist_ok=True)
+        temp_path = file_path.with_suffix(".tmp{}".format(os.getpid()))
+        with open(temp_path, "wb") as f:
+            f.write(HEADER.pack(MAGIC, VERSION, len(data), begin, end))
+            f.write(np.ascontiguousarray(data.times, dtype=np.int64).tobytes())
+            f.write(np.ascontiguousarray(data.values, dtype=np.float64).tobytes())
+        with self.lock:
+            # a replaced file doesn't count twice
+            if file_path.exists():
+                self.size -= file_path.stat().st_size
+            os.replace(temp_path, file_path)
+            self.size += file_path.stat().st_size
+            if self.size > self.max_size:
+                self.__evict()
+
+    def get_links(self, link_names: list, begin: int, end: int) -> tuple[dict, list]:
+        """
+        Looks up the rx and tx series of the given links in a window
+
+        Returns a tuple with:
+        - the cached traffic: {LINK_NAME: {"rx": Series, "tx": Series}}
+        - the names of the links that aren't cached
+        """
+        cached = {}
+        missing = []
+        for link_name in link_names:
+            traffic = {
+                iface: self.get(link_name, iface, begin, end) for iface in ("rx", "tx")
+            }
+            if None in traffic.values():
+                missing.append(link_name)
+            else:
+                cached[link_name] = traffic
+        return cached, missing
+
+    def put_links(self, traffic: dict, begin: int, end: int):
+        """
+        Stores the rx and tx series of the given links ({LINK_NAME: {"rx": Series, "tx": Series}}) in a window,
+        except the ones of failed queries (None)
+        """
+        if not self.is_closed(end):
+            return
+        for link_name, link_traffic in traffic.items():
+            for iface in ("rx", "tx"):
+                self.put(link_name, iface, begin, end, link_traffic[iface])
+
+    def __evict(self):
+        """
+        Removes the least recently used files until the cache fits in `max_size`
+        """
+        files = []
+        for file in self.__files():
+            try:
+                stat = file.stat()
+            except OSError:
+                continue
+            files.append((stat.st_mtime, stat.st_size, file))
+        files.sort(key=lambda file: file[0])
+
+        self.size = sum(size for _, size, _ in files)
+        for _, size, file in files:
+            if self.size <= self.max_size:
+                break
+            file.unlink(missing_ok=True)
+            self.size -= size
+        logger.info("series cache evicted to %d bytes", self.size)
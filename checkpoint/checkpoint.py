@@ -0,0 +1,54 @@
+#!/usr/bin/env python
+# coding=utf-8
+
+from logging import getLogger
+from pathlib import Path
+
+from utils import json_reader
+from codec import codec
+
+logger = getLogger("watcher")
+
+
+class CheckpointStore:
+    """
+    Stores the checkpoints of the incremental watcher runs, one json file per report date:
+    {
+        LINK_NAME: {
+            "rx": {
+                "last_time": epoch timestamp of the last checked point,
+                "open_run": {"times": [...], "values": [...]},
+                "open_interval": number of the interval still open in the report (or null),
+                "intervals": number of intervals in the report,
+                "percentile_sketch": PercentileSketch of the points checked (see PercentileSketch.to_dict),
+            },
+            "tx": {...},
+        },
+    }
+    """
+
+    def __init__(self, path: str):
+        self.path = Path(path) / "checkpoints"
+
+    def __file_path(self, report_date: str) -> Path:
+        return self.path / "checkpoint_{}.json".format(report_date)
+
+    def load(self, report_date: str) -> dict:
+        """
+        Returns the checkpoints of the given report date, or an empty dict if there are none
+        """
+        file_path = self.__file_path(report_date)
+        if not file_path.is_file():
+            logger.info("no checkpoint found for %s", report_date)
+            return {}
+        return json_reader(file_path)
+
+    def save(self, report_date: str, checkpoints: dict):
+        """
+        Saves the checkpoints of the given report date
+        (written to a temp file first, so a failed run never leaves a partial checkpoint)
+        """
+        self.path.mkdir(parents=True, exist_ok=True)
+        file_path = self.__file_path(report_date)
+        logger.info("saving checkpoint to %s", file_path)
+        codec.dump(checkpoints, file_path, "compact")
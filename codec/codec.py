@@ -0,0 +1,151 @@
+#!/usr/bin/env python
+# coding=utf-8
+
+import gzip
+import json
+import os
+
+from logging import getLogger
+
+from config import OUTPUT_INDENT_LEVEL, REPORT_FORMAT
+
+# optional faster encoder/decoder for the compact formats
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+logger = getLogger("watcher")
+
+# formats:
+# - json: indented json (OUTPUT_INDENT_LEVEL)
+# - compact: json without whitespace
+# - gzip: compact json compressed with gzip
+REPORT_FORMATS = ("json", "compact", "gzip")
+GZIP_MAGIC = b"\x1f\x8b"
+
+
+def check_format(report_format: str):
+    if report_format not in REPORT_FORMATS:
+        raise ValueError(
+            "invalid report format {}, expected one of: {}".format(
+                report_format, ", ".join(REPORT_FORMATS)
+            )
+        )
+
+
+def encode(data, report_format: str = REPORT_FORMAT) -> str:
+    """
+    Encodes the given data as json text in the given format
+    (the gzip format is encoded as compact json, it's compressed when written)
+    """
+    check_format(report_format)
+    if report_format == "json":
+        return json.dumps(data, indent=OUTPUT_INDENT_LEVEL)
+    if orjson is not None:
+        return orjson.dumps(data, option=orjson.OPT_NON_STR_KEYS).decode()
+    # without indentation the stdlib uses its C encoder
+    return json.dumps(data, separators=(",", ":"))
+
+
+def dump(data, file_path: str, report_format: str = REPORT_FORMAT):
+    """
+    Writes the given data to `file_path` in the given format
+    (written to a temp file first and renamed, so the file is never left half written)
+    """
+    with StreamWriter(file_path, report_format) as writer:
+        writer.write_all(data)
+
+
+def load(file_path: str):
+    """
+    Reads a file written in any of the formats (the format is detected from the file content)
+    """
+    with open(file_path, "rb") as f:
+        content = f.read()
+    if content[:2] == GZIP_MAGIC:
+        content = gzip.decompress(content)
+    if orjson is not None:
+        return orjson.loads(content)
+    return json.loads(content)
+
+
+class StreamWriter:
+    """
+    Writes a json object entry by entry to a temp file, renamed to `file_path` when it's closed,
+    so the entries are written as soon as they are produced (and readers never see a half written file)
+
+    The output is the same as encoding the whole object at once
+    """
+
+    def __init__(self, file_path: str, report_format: str = REPORT_FORMAT):
+        check_format(report_format)
+        self.file_path = file_path
+        self.temp_path = "{}.tmp{}".format(file_path, os.getpid())
+        self.report_format = report_format
+        if report_format == "gzip":
+            self.file = gzip.open(self.temp_path, "wt", compresslevel=6)
+        else:
+            self.file = open(self.temp_path, "w")
+        self.entries = 0
+
+    def __enter__(self) -> "StreamWriter":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        # already aborted
+        if self.file.closed:
+            return
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+    def write(self, key: str, value):
+        """
+        Writes an entry of the object
+        """
+        if self.report_format == "json":
+            # same layout as the whole object indented at once
+            indent = " " * OUTPUT_INDENT_LEVEL
+            entry = "{}{}{}: {}".format(
+                "{\n" if self.entries == 0 else ",\n",
+                indent,
+                json.dumps(key),
+                encode(value, "json").replace("\n", "\n" + indent),
+            )
+        else:
+            entry = "{}{}:{}".format(
+                "{" if self.entries == 0 else ",",
+                json.dumps(key),
+                encode(value, "compact"),
+            )
+        self.file.write(entry)
+        self.entries += 1
+
+    def write_all(self, data):
+        """
+        Writes the whole data at once (it doesn't need to be a dict)
+        """
+        if self.entries:
+            raise ValueError("the data must be written at once or entry by entry")
+        self.file.write(encode(data, self.report_format))
+        self.entries = None
+
+    def close(self):
+        """
+        Finishes the object and renames the temp file to `file_path`
+        """
+        if self.entries == 0:
+            self.file.write("{}")
+        elif self.entries is not None:
+            self.file.write("\n}" if self.report_format == "json" else "}")
+        self.file.close()
+        os.replace(self.temp_path, self.file_path)
+
+    def abort(self):
+        """
+        Removes the temp file, `file_path` is left untouched
+        """
+        self.file.close()
+        os.remove(self.temp_path)
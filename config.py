@@ -3,6 +3,7 @@
 
 from dotenv import load_dotenv
 from os import getenv
+from os.path import join
 
 load_dotenv()
 
@@ -22,9 +23,32 @@ TIME_THRESHOLD = int(getenv("TIME_THRESHOLD"))  # in minutes
 IGNORE_LIST = getenv("IGNORE_LIST").split(",")
 
 OUTPUT_INDENT_LEVEL = int(getenv("OUTPUT_IDENT_LEVEL"))
+REPORT_FORMAT = getenv("REPORT_FORMAT", "json")  # [json, compact, gzip]
 REPORT_OUTPUT_PATH = getenv("REPORT_OUTPUT_PATH")
 OUTPUT_TIMEZONE = getenv("OUTPUT_TIMEZONE")
 PERCENTILE = getenv("PERCENTILE")
+PERCENTILE_SKETCH_ACCURACY = float(
+    getenv("PERCENTILE_SKETCH_ACCURACY", 0.01)
+)  # relative error of the percentiles calculated from the reports
+WATCHER_WORKERS = int(getenv("WATCHER_WORKERS", 8))  # threads querying the TSDB
+WATCHER_PROCESSES = int(getenv("WATCHER_PROCESSES", 0))  # processes checking the links
+WATCHER_PARALLEL_DAYS = int(
+    getenv("WATCHER_PARALLEL_DAYS", 1)
+)  # days checked at the same time
+HEAL_PARALLEL_DAYS = int(
+    getenv("HEAL_PARALLEL_DAYS", 7)
+)  # missing days created at the same time by alert --heal
+SERIES_CACHE_PATH = getenv(
+    "SERIES_CACHE_PATH", join(REPORT_OUTPUT_PATH or "/tmp/watcher/", "cache")
+)
+SERIES_CACHE_MAX_SIZE = int(getenv("SERIES_CACHE_MAX_SIZE", 512))  # in MB
+DAEMON_TICK = int(getenv("DAEMON_TICK", 300))  # in seconds
+METRICS_PATH = getenv(
+    "METRICS_PATH", join(REPORT_OUTPUT_PATH or "/tmp/watcher/", "metrics")
+)
+METRICS_SLOWEST_LINKS = int(
+    getenv("METRICS_SLOWEST_LINKS", 10)
+)  # links in the run summary
 # WATCHER
 
 # TSDB
@@ -37,17 +61,40 @@ TSDB_AUTH = {
 }
 TSDB_TIME_FORMAT = str(getenv("TSDB_TIME_FORMAT"))
 TSDB_TIMEZONE = getenv("TSDB_TIMEZONE")
+TSDB_BULK_CHUNK_SIZE = int(getenv("TSDB_BULK_CHUNK_SIZE", 200))  # links per bulk query
+TSDB_CHUNK_SIZE = int(getenv("TSDB_CHUNK_SIZE", 10000))  # points per chunk (--stream)
+TSDB_POOL_SIZE = int(
+    getenv("TSDB_POOL_SIZE", WATCHER_WORKERS)
+)  # keep-alive connections
+TSDB_RETRIES = int(getenv("TSDB_RETRIES", 3))  # retries of the failed requests
+TSDB_RETRY_BACKOFF = float(getenv("TSDB_RETRY_BACKOFF", 0.5))  # in seconds
+TSDB_GZIP = (
+    getenv("TSDB_GZIP", "true").lower() == "true"
+)  # compressed requests/responses
 # TSDB
 
 # IRM
 IRM_HOST = getenv("IRM_HOST")
 IRM_TOKEN = getenv("IRM_TOKEN")
+IRM_CACHE_PATH = getenv(
+    "IRM_CACHE_PATH", join(REPORT_OUTPUT_PATH or "/tmp/watcher/", "irm_inventory.json")
+)  # inventory synced from the IRM
+IRM_CACHE_TTL = int(getenv("IRM_CACHE_TTL", 3600))  # in seconds
+IRM_FULL_SYNC_INTERVAL = int(getenv("IRM_FULL_SYNC_INTERVAL", 86400))  # in seconds
 # IRM
 
 # REST API
 API_HOST = getenv("API_HOST")
 API_USER = getenv("API_USER")
 API_PASS = getenv("API_PASS")
+API_SENDERS = int(getenv("API_SENDERS", 4))  # threads sending to the api
+API_BATCH_SIZE = int(
+    getenv("API_BATCH_SIZE", 1)
+)  # intervals per request (a json list if greater than 1)
+API_TIMEOUT = int(getenv("API_TIMEOUT", 10))  # in seconds
+API_SPOOL_PATH = getenv(
+    "API_SPOOL_PATH", join(REPORT_OUTPUT_PATH or "/tmp/watcher/", "spool")
+)  # intervals that failed to be sent
 # REST API
 
 # ALERT
@@ -6,12 +6,64 @@ import argparse
 from os import environ
 from datetime import datetime, timedelta
 from logging import getLogger
+from typing import NamedTuple
 from dateutil import parser
+from pytz import timezone as tz
 
-from config import WORK_HOUR_BEGIN, WORK_HOUR_END, TSDB_TIME_FORMAT
+from config import WORK_HOUR_BEGIN, WORK_HOUR_END, TSDB_TIME_FORMAT, OUTPUT_TIMEZONE
 
 logger = getLogger("watcher")
 
+EPOCH = datetime(1970, 1, 1)
+
+
+class TimeWindow(NamedTuple):
+    """
+    Time range of a query: `begin` and `end` dates in the TSDB_TIME_FORMAT (and OUTPUT_TIMEZONE)
+    and, with the --downsample flag, the `downsampling` of its traffic: a (bucket, function) tuple
+
+    The windows are passed through the calls that query the TSDB,
+    so many days can be checked at the same time
+    """
+
+    begin: str
+    end: str
+    downsampling: tuple | None = None
+
+    @classmethod
+    def from_environ(cls) -> "TimeWindow":
+        """
+        Returns the window set in the QUERY_DATE_BEGIN and QUERY_DATE_END environment variables
+        (the date range given to the watcher, see DateManipulator.set_tsdb_date_interval)
+        """
+        return cls(environ["QUERY_DATE_BEGIN"], environ["QUERY_DATE_END"])
+
+    def epoch(self) -> tuple:
+        """
+        @return: tuple with the begin and end epoch timestamps in seconds
+        """
+        date_manipulator = DateManipulator()
+        return (
+            date_manipulator.convert_to_epoch(self.begin),
+            date_manipulator.convert_to_epoch(self.end),
+        )
+
+    def report_date(self) -> str:
+        """
+        @return: date of the report of the window, in the format %d-%m-%y
+        """
+        report_date = datetime.strptime(self.begin.split(" ")[0], "%Y-%m-%d")
+        return report_date.strftime("%d-%m-%y")
+
+    def is_past(self) -> bool:
+        """
+        Checks if the window ends before today in the OUTPUT_TIMEZONE (its traffic isn't changing anymore)
+        @return: bool
+        """
+        today = datetime.now(tz(OUTPUT_TIMEZONE)).date()
+        return datetime.strptime(self.end, TSDB_TIME_FORMAT).date() < today
+
+
 class DateManipulator():
     def check_work_hour_interval(self) -> None | ValueError:
         """
@@ -69,6 +121,70 @@ class DateManipulator():
         return current_report_query_date_interval
 
 
+    def get_days_intervals(self, qntd_days_to_check: int) -> list:
+        """
+        Calculates the time interval of every day to be checked, starting at QUERY_DATE_BEGIN
+        @return: list with one dict per day in the format returned by change_tsdb_time_interval
+        """
+        date_begin = datetime.strptime(environ["QUERY_DATE_BEGIN"], TSDB_TIME_FORMAT)
+
+        days_intervals = []
+        for day in range(qntd_days_to_check + 1):
+            current_day = date_begin + timedelta(days=day)
+            days_intervals.append(
+                {
+                    "begin": current_day.replace(hour=WORK_HOUR_BEGIN).strftime(
+                        TSDB_TIME_FORMAT
+                    ),
+                    "end": current_day.replace(hour=WORK_HOUR_END).strftime(
+                        TSDB_TIME_FORMAT
+                    ),
+                }
+            )
+        return days_intervals
+
+
+    def get_days_windows(self, qntd_days_to_check: int) -> list:
+        """
+        Calculates the window of every day to be checked, starting at QUERY_DATE_BEGIN
+        @return: list with the TimeWindow of each day
+        """
+        return [
+            TimeWindow(day_interval["begin"], day_interval["end"])
+            for day_interval in self.get_days_intervals(qntd_days_to_check)
+        ]
+
+
+    def get_day_window(self, date: str) -> TimeWindow:
+        """
+        Calculates the window of the work hours of the given day
+        @return: TimeWindow of the day
+        """
+        day = parser.parse(date).replace(minute=0, second=0, microsecond=0)
+        return TimeWindow(
+            day.replace(hour=WORK_HOUR_BEGIN).strftime(TSDB_TIME_FORMAT),
+            day.replace(hour=WORK_HOUR_END).strftime(TSDB_TIME_FORMAT),
+        )
+
+
+    def convert_to_epoch(self, date: str) -> int:
+        """
+        Converts a date in the TSDB_TIME_FORMAT (and OUTPUT_TIMEZONE) to an epoch timestamp in seconds.
+        The timezone offset used is the one of the given date, so DST changes are respected
+        @return: epoch timestamp in seconds
+        """
+        date = tz(OUTPUT_TIMEZONE).localize(datetime.strptime(date, TSDB_TIME_FORMAT))
+        return int(date.timestamp())
+
+
+    def convert_from_epoch(self, timestamp: int) -> str:
+        """
+        Converts an epoch timestamp in seconds to a date in the TSDB_TIME_FORMAT (and OUTPUT_TIMEZONE)
+        @return: date string
+        """
+        return datetime.fromtimestamp(int(timestamp), tz(OUTPUT_TIMEZONE)).strftime(TSDB_TIME_FORMAT)
+
+
     def set_tsdb_date_interval(self, date_begin, date_end):
         """
         Set the environment variables QUERY_DATE_BEGIN and QUERY_DATE_END to be used in the query
@@ -83,11 +199,8 @@ class DateManipulator():
 
 
     def set_report_date(self) -> str:
-        report_date = environ["QUERY_DATE_BEGIN"].split(" ")[0]
-        report_date = datetime.strptime(report_date, "%Y-%m-%d")
         # set the report date to %d-%m-%y
-        report_date = report_date.strftime("%d-%m-%y")
-        return report_date
+        return TimeWindow.from_environ().report_date()
 
 
     def extract_qntd_days_to_check(self) -> int:
@@ -142,3 +255,30 @@ class DateManipulator():
 
         return
 
+
+class ReportTimeFormatter():
+    """
+    Formats epoch timestamps of a time window as report dates in the OUTPUT_TIMEZONE
+
+    The timezone offset is calculated once for the window,
+    it's only calculated for each timestamp if the window crosses a DST change
+    """
+    def __init__(self, window_begin: int, window_end: int):
+        self.timezone = tz(OUTPUT_TIMEZONE)
+        begin_offset = self.__get_offset(window_begin)
+        end_offset = self.__get_offset(window_end)
+        self.offset = begin_offset if begin_offset == end_offset else None
+
+
+    def __get_offset(self, timestamp: int) -> int:
+        return int(datetime.fromtimestamp(int(timestamp), self.timezone).utcoffset().total_seconds())
+
+
+    def format(self, timestamp: int, time_format: str = "%d/%m/%y-%H:%M:%S") -> str:
+        """
+        Formats the given epoch timestamp (in seconds) in the report format
+        """
+        timestamp = int(timestamp)
+        if self.offset is None:
+            return datetime.fromtimestamp(timestamp, self.timezone).strftime(time_format)
+        return (EPOCH + timedelta(seconds=timestamp + self.offset)).strftime(time_format)
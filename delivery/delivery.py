@@ -0,0 +1,185 @@
+#!/usr/bin/env python
+# coding=utf-8
+
+from logging import getLogger
+from pathlib import Path
+from queue import Queue, Empty, Full
+from threading import Thread, Lock
+from time import monotonic, time_ns
+
+from codec import codec
+from utils import json_reader
+from config import (
+    API_HOST,
+    API_USER,
+    API_PASS,
+    API_SENDERS,
+    API_BATCH_SIZE,
+    API_TIMEOUT,
+    API_SPOOL_PATH,
+)
+
+logger = getLogger("watcher")
+
+# max time (in seconds) a sender waits to fill a batch
+BATCH_WAIT = 1
+
+
+class ApiDelivery:
+    """
+    Sends the exceeded intervals to the watcher REST API without blocking the detection
+
+    The intervals are queued by `send` and posted by `senders` threads sharing one keep-alive session:
+    one interval (a json object) per request, or with a `batch_size` greater than 1, batches of up to
+    `batch_size` intervals (a json list per request, the api must accept lists).
+    Batches that may be sent later (connection errors, timeouts and 5xx responses) are saved in the spool directory
+    and sent again on the next run, the ones rejected by the api (4xx responses) are saved as rejected_*.json files
+    in the same directory, that are never sent again
+    """
+
+    def __init__(
+        self,
+        url: str = API_HOST + "watcher/interval/",
+        senders: int = API_SENDERS,
+        batch_size: int = API_BATCH_SIZE,
+        spool_path: str = API_SPOOL_PATH,
+    ):
+        self.url = url
+        self.batch_size = batch_size
+        self.spool_path = Path(spool_path)
+        self.spool_path.mkdir(parents=True, exist_ok=True)
+        self.spool_lock = Lock()
+        # intervals that don't fit in the queue are spooled, so `send` never waits
+        self.queue = Queue(maxsize=senders * batch_size * 4)
+
+        # requests is only imported when the intervals are sent
+        from requests import Session
+        from requests.adapters import HTTPAdapter
+        from requests.auth import HTTPBasicAuth
+
+        self.session = Session()
+        self.session.auth = HTTPBasicAuth(API_USER, API_PASS)
+        self.session.headers.update({"Content-Type": "application/json"})
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=senders)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+        self.senders = [
+            Thread(target=self.__sender, name="api-sender-{}".format(i), daemon=True)
+            for i in range(senders)
+        ]
+        for sender in self.senders:
+            sender.start()
+        self.__resend_spool()
+
+    def send(self, interval: dict):
+        """
+        Queues an interval to be sent
+        """
+        try:
+            self.queue.put_nowait(interval)
+        except Full:
+            self.__spool([interval])
+
+    def close(self):
+        """
+        Waits for the queued intervals to be sent (or spooled) and closes the session
+        """
+        for _ in self.senders:
+            self.queue.put(None)
+        for sender in self.senders:
+            sender.join()
+        self.session.close()
+
+    def __sender(self):
+        """
+        Posts the queued intervals in batches until it gets a None
+        """
+        running = True
+        while running:
+            batch = [self.queue.get()]
+            if batch[0] is None:
+                return
+            deadline = monotonic() + BATCH_WAIT
+            while len(batch) < self.batch_size:
+                try:
+                    interval = self.queue.get(timeout=max(0, deadline - monotonic()))
+                except Empty:
+                    break
+                if interval is None:
+                    running = False
+                    break
+                batch.append(interval)
+
+            self.__post(batch)
+
+    def __post(self, batch: list):
+        """
+        Posts a batch of intervals (the interval itself if the batch size is 1),
+        spooling it if it may be sent later or saving it as rejected
+        """
+        from requests.exceptions import ConnectionError, RequestException, Timeout
+
+        payload = batch if self.batch_size > 1 else batch[0]
+        try:
+            response = self.session.post(self.url, json=payload, timeout=API_TIMEOUT)
+        except (ConnectionError, Timeout) as e:
+            logger.error("error sending %d intervals to api: %s", len(batch), e)
+            self.__spool(batch)
+            return
+        except RequestException as e:
+            logger.error("error sending %d intervals to api: %s", len(batch), e)
+            self.__spool(batch, "rejected")
+            return
+
+        if response.status_code >= 500:
+            logger.error(
+                "error sending %d intervals to api: %s", len(batch), response.status_code
+            )
+            self.__spool(batch)
+        elif response.status_code >= 400:
+            # sending it again would get the same response
+            logger.error(
+                "%d intervals rejected by the api: %s %s",
+                len(batch),
+                response.status_code,
+                response.text,
+            )
+            self.__spool(batch, "rejected")
+        else:
+            logger.info("%d intervals sent to api", len(batch))
+
+    def __spool(self, batch: list, prefix: str = "intervals"):
+        """
+        Saves a batch that couldn't be sent in the spool directory,
+        as a `prefix`_*.json file (only the "intervals" ones are sent again)
+        """
+        with self.spool_lock:
+            file_path = self.spool_path / "{}_{}.json".format(prefix, time_ns())
+            codec.dump(batch, file_path, "compact")
+        logger.warning("%d intervals saved at %s", len(batch), file_path)
+
+    def __resend_spool(self):
+        """
+        Queues the intervals spooled by the previous runs
+        """
+        for file_path in sorted(self.spool_path.glob("intervals_*.json")):
+            try:
+                batch = json_reader(file_path)
+            except ValueError:
+                logger.error("ignoring invalid spool file %s", file_path)
+                continue
+            logger.info("resending %d spooled intervals", len(batch))
+            for interval in batch:
+                self.send(interval)
+            file_path.unlink()
+
+
+class IntervalBuffer(list):
+    """
+    Keeps the intervals given to `send`, to be delivered later by an ApiDelivery
+    (used where the ApiDelivery isn't available, like the processes of the ProcessDetector)
+    """
+
+    def send(self, interval: dict):
+        self.append(interval)
@@ -0,0 +1,238 @@
+#!/usr/bin/env python
+# coding=utf-8
+
+import numpy as np
+
+
+def detect_exceeded_intervals(
+    values, limit_speed: float, limit_speed_accounting_for_histeresys: float
+) -> list[dict]:
+    """
+    Finds the intervals where the traffic exceeded the limit speed
+
+    An interval starts at a point above `limit_speed` and lasts while the next points stay above
+    `limit_speed_accounting_for_histeresys`. It ends at the first point below it (or at the last point).
+    The histeresys limit must not be greater than the limit speed
+
+    Params:
+    - values: traffic values in bytes, ordered by time
+    - limit_speed: limit in bits
+    - limit_speed_accounting_for_histeresys: limit in bits to end an interval
+
+    Returns a list of dicts with the following format:
+    [
+        {
+            "begin": index of the point that exceeded the limit,
+            "end": index of the point that ended the interval,
+            "exceeded_points": number of points after "begin" above the histeresys limit,
+            "min_value": min value of those points (in bits),
+            "max_value": max value of those points (in bits),
+        },
+    ]
+
+    Intervals with no points after "begin" above the histeresys limit are not returned
+    """
+    values_in_bits = np.asarray(values, dtype=np.float64) * 8
+    if len(values_in_bits) == 0:
+        return []
+
+    above_limit = values_in_bits >= limit_speed
+    above_histeresys = values_in_bits >= limit_speed_accounting_for_histeresys
+
+    # run-length encoding of the points above the histeresys limit:
+    # each run [start, end) can hold only one interval, starting at its first point above the limit
+    edges = np.diff(above_histeresys.astype(np.int8), prepend=0, append=0)
+    runs_start = np.flatnonzero(edges == 1)
+    runs_end = np.flatnonzero(edges == -1)
+
+    above_limit_points = np.flatnonzero(above_limit)
+    if len(above_limit_points) == 0:
+        return []
+
+    # first point above the limit in each run
+    first_above_limit = np.searchsorted(above_limit_points, runs_start)
+    has_interval = first_above_limit < len(above_limit_points)
+    intervals_begin = above_limit_points[
+        np.minimum(first_above_limit, len(above_limit_points) - 1)
+    ]
+    has_interval &= intervals_begin < runs_end
+    intervals_begin = intervals_begin[has_interval]
+    intervals_end = runs_end[has_interval]
+
+    # the point that exceeded the limit isn't counted
+    exceeded_points = intervals_end - intervals_begin - 1
+    has_points = exceeded_points > 0
+    intervals_begin = intervals_begin[has_points]
+    intervals_end = intervals_end[has_points]
+    exceeded_points = exceeded_points[has_points]
+    if len(intervals_begin) == 0:
+        return []
+
+    # min and max values of the points in (begin, end)
+    # (a sentinel is appended so an interval can end at the end of the series)
+    segments = np.empty(len(intervals_begin) * 2, dtype=np.int64)
+    segments[0::2] = intervals_begin + 1
+    segments[1::2] = intervals_end
+    padded_values = np.append(values_in_bits, 0.0)
+    max_values = np.maximum.reduceat(padded_values, segments)[0::2]
+    min_values = np.minimum.reduceat(padded_values, segments)[0::2]
+
+    # a series that ends above the histeresys limit ends the interval at its last point
+    intervals_end = np.minimum(intervals_end, len(values_in_bits) - 1)
+
+    return [
+        {
+            "begin": int(begin),
+            "end": int(end),
+            "exceeded_points": int(points),
+            "min_value": float(min_value),
+            "max_value": float(max_value),
+        }
+        for begin, end, points, min_value, max_value in zip(
+            intervals_begin, intervals_end, exceeded_points, min_values, max_values
+        )
+    ]
+
+
+def find_open_run(values, limit_speed_accounting_for_histeresys: float) -> int | None:
+    """
+    Finds the run of points above the histeresys limit at the end of the traffic,
+    an interval in it may still be going on when the next points arrive
+
+    Params:
+    - values: traffic values in bytes, ordered by time
+    - limit_speed_accounting_for_histeresys: limit in bits to end an interval
+
+    Returns the index of the first point of the run, or None if the last point is below the limit
+    """
+    values_in_bits = np.asarray(values, dtype=np.float64) * 8
+    if len(values_in_bits) == 0 or (
+        values_in_bits[-1] < limit_speed_accounting_for_histeresys
+    ):
+        return None
+
+    below_histeresys = np.flatnonzero(
+        values_in_bits < limit_speed_accounting_for_histeresys
+    )
+    if len(below_histeresys) == 0:
+        return 0
+    return int(below_histeresys[-1]) + 1
+
+
+class StreamingDetector:
+    """
+    Finds the intervals where the traffic exceeded the limit speed (like `detect_exceeded_intervals`)
+    in a series given in chunks, so the whole series never has to be in memory
+
+    Only a summary of the run above the histeresys limit still going on at the end of the last chunk is kept
+    (its interval begin, number of points, min and max values), so the memory doesn't depend on the series length.
+    The chunks are checked with vectorized operations, only the runs are walked one by one
+
+    The intervals are returned with the timestamps of their begin and end points instead of indexes:
+    [
+        {
+            "begin_time": timestamp of the point that exceeded the limit,
+            "end_time": timestamp of the point that ended the interval,
+            "exceeded_points": number of points after "begin_time" above the histeresys limit,
+            "min_value": min value of those points (in bits),
+            "max_value": max value of those points (in bits),
+        },
+    ]
+    """
+
+    def __init__(
+        self, limit_speed: float, limit_speed_accounting_for_histeresys: float
+    ):
+        self.limit_speed = limit_speed
+        self.limit_speed_accounting_for_histeresys = (
+            limit_speed_accounting_for_histeresys
+        )
+        # the last point of the last chunk is above the histeresys limit
+        self.in_run = False
+        # interval of the run still going on (None if no point of the run exceeded the limit yet)
+        self.interval = None
+        self.last_time = None
+
+    def feed(self, times, values) -> list[dict]:
+        """
+        Checks the next chunk of the series (epoch timestamps and traffic values in bytes, ordered by time)
+
+        Returns the intervals that ended in this chunk
+        """
+        times = np.asarray(times, dtype=np.int64)
+        values_in_bits = np.asarray(values, dtype=np.float64) * 8
+        if len(values_in_bits) == 0:
+            return []
+
+        above_histeresys = (
+            values_in_bits >= self.limit_speed_accounting_for_histeresys
+        )
+        above_limit_points = np.flatnonzero(values_in_bits >= self.limit_speed)
+
+        # runs of points above the histeresys limit [start, end), a run that continues
+        # from the last chunk starts at -1 and a run that goes on after this chunk ends at len(times)
+        edges = np.diff(
+            above_histeresys.astype(np.int8),
+            prepend=np.int8(self.in_run),
+            append=np.int8(0),
+        )
+        runs_start = np.flatnonzero(edges == 1)
+        runs_end = np.flatnonzero(edges == -1)
+        if self.in_run:
+            runs_start = np.insert(runs_start, 0, -1)
+
+        finished = []
+        for start, end in zip(runs_start.tolist(), runs_end.tolist()):
+            first = max(start, 0)
+            if self.interval is None:
+                # first point above the limit in the run
+                index = np.searchsorted(above_limit_points, first)
+                if index < len(above_limit_points) and above_limit_points[index] < end:
+                    begin = int(above_limit_points[index])
+                    self.interval = {
+                        "begin_time": int(times[begin]),
+                        "exceeded_points": 0,
+                        "min_value": np.inf,
+                        "max_value": -np.inf,
+                    }
+                    first = begin + 1
+                else:
+                    first = end
+
+            # the points after the begin of the interval
+            if self.interval is not None and first < end:
+                self.interval["exceeded_points"] += end - first
+                self.interval["min_value"] = min(
+                    self.interval["min_value"], float(values_in_bits[first:end].min())
+                )
+                self.interval["max_value"] = max(
+                    self.interval["max_value"], float(values_in_bits[first:end].max())
+                )
+
+            # the run ended at the first point below the histeresys limit
+            if end < len(times):
+                if self.interval is not None:
+                    self.__finish_interval(int(times[end]), finished)
+                self.interval = None
+
+        self.in_run = bool(above_histeresys[-1])
+        self.last_time = int(times[-1])
+        return finished
+
+    def close(self) -> list[dict]:
+        """
+        Ends the series: the interval still going on ends at the last point
+
+        Returns the intervals that ended
+        """
+        finished = []
+        if self.interval is not None:
+            self.__finish_interval(self.last_time, finished)
+        self.in_run = False
+        self.interval = None
+        return finished
+
+    def __finish_interval(self, end_time: int, finished: list):
+        # intervals with no points after the begin are not returned
+        if self.interval["exceeded_points"] > 0:
+            finished.append({**self.interval, "end_time": end_time})
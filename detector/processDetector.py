@@ -0,0 +1,169 @@
+#!/usr/bin/env python
+# coding=utf-8
+
+import os
+import shutil
+import tempfile
+import numpy as np
+
+from concurrent.futures import Future, ProcessPoolExecutor
+from itertools import count
+from logging import getLogger
+from multiprocessing import get_context
+from pathlib import Path
+from time import perf_counter
+from typing import Any, Callable, NamedTuple
+
+from series.series import Series
+from metrics.metrics import run_metrics
+
+logger = getLogger("watcher")
+
+# memory backed file system, so the buffers never touch the disk
+SHARED_MEMORY_PATH = "/dev/shm"
+
+
+class SharedSeries(NamedTuple):
+    """
+    Position of a Series in a buffer file: `points` timestamps (int64) at `offset`,
+    followed by `points` values (float64)
+    """
+
+    offset: int
+    points: int
+
+
+class ProcessDetector:
+    """
+    Runs the detect stage of the links on a pool of processes, so the detection of large ranges
+    uses every core instead of a single one
+
+    The Series given to a detection are written to a buffer file (in /dev/shm when available)
+    and memory-mapped by the process running it, instead of being pickled.
+    The processes are spawned (not forked), since the watcher already runs threads
+    """
+
+    def __init__(self, processes: int):
+        if processes < 1:
+            raise ValueError("the number of processes must be at least 1")
+        self.processes = processes
+        self.executor = ProcessPoolExecutor(
+            max_workers=processes, mp_context=get_context("spawn")
+        )
+        self.buffers_path = Path(
+            tempfile.mkdtemp(
+                prefix="watcher_detect_",
+                dir=SHARED_MEMORY_PATH if os.path.isdir(SHARED_MEMORY_PATH) else None,
+            )
+        )
+        self.buffer_ids = count()
+        logger.info("detecting on %d processes", processes)
+
+    def __enter__(self) -> "ProcessDetector":
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def submit(
+        self,
+        link_name: str,
+        function: Callable,
+        *args,
+        then: Callable[[Any], Any] = None,
+    ) -> Future:
+        """
+        Runs `function(*args)` on the pool (`function` must be a module level function),
+        every Series in `args` (also inside dicts, lists and tuples) is passed through a buffer file
+
+        If `then` is given, it's called on this process with the result of `function`
+        and its return is the result of the returned Future
+
+        Returns a Future with the result
+        """
+        buffer_path = self.buffers_path / "{}.buffer".format(next(self.buffer_ids))
+        with open(buffer_path, "wb") as buffer:
+            args = share_series(args, buffer)
+
+        result = Future()
+
+        def done(future: Future):
+            buffer_path.unlink(missing_ok=True)
+            try:
+                function_result, seconds = future.result()
+                run_metrics.observe_link(link_name, seconds)
+                result.set_result(
+                    function_result if then is None else then(function_result)
+                )
+            except BaseException as e:
+                result.set_exception(e)
+
+        self.executor.submit(
+            run_shared, function, str(buffer_path), args
+        ).add_done_callback(done)
+        return result
+
+    def close(self):
+        """
+        Waits for the submitted detections and stops the processes
+        """
+        self.executor.shutdown(wait=True)
+        shutil.rmtree(self.buffers_path, ignore_errors=True)
+
+
+def share_series(value, buffer) -> Any:
+    """
+    Writes every Series in `value` to the `buffer` file
+
+    Returns `value` with each Series replaced by its SharedSeries
+    """
+    if isinstance(value, Series):
+        shared = SharedSeries(buffer.tell(), len(value))
+        buffer.write(np.ascontiguousarray(value.times, dtype=np.int64).tobytes())
+        buffer.write(np.ascontiguousarray(value.values, dtype=np.float64).tobytes())
+        return shared
+    if isinstance(value, dict):
+        return {key: share_series(item, buffer) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return type(value)(share_series(item, buffer) for item in value)
+    return value
+
+
+def map_series(value, buffer_path: str) -> Any:
+    """
+    Returns `value` with each SharedSeries replaced by a Series memory-mapped from the buffer file
+    """
+    if isinstance(value, SharedSeries):
+        if value.points == 0:
+            return Series()
+        times = np.memmap(
+            buffer_path,
+            dtype=np.int64,
+            mode="r",
+            offset=value.offset,
+            shape=(value.points,),
+        )
+        values = np.memmap(
+            buffer_path,
+            dtype=np.float64,
+            mode="r",
+            offset=value.offset + value.points * 8,
+            shape=(value.points,),
+        )
+        return Series(times, values)
+    if isinstance(value, dict):
+        return {key: map_series(item, buffer_path) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return type(value)(map_series(item, buffer_path) for item in value)
+    return value
+
+
+def run_shared(function: Callable, buffer_path: str, args: tuple) -> tuple:
+    """
+    Runs `function` on a process of the pool, with the Series of `args` read from the buffer file
+
+    Returns a tuple with the result of `function` and the seconds it took
+    """
+    begin = perf_counter()
+    result = function(*map_series(args, buffer_path))
+    return result, perf_counter() - begin
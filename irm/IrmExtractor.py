@@ -4,6 +4,7 @@ from irm import Irm
 
 import pynetbox
 
+from datetime import datetime
 from pprint import pprint
 from logging import getLogger
 from config import LOGGER_NAME, IGNORE_LIST
@@ -11,6 +12,9 @@ from config import LOGGER_NAME, IGNORE_LIST
 
 logger = getLogger(__name__)
 
+# ids per request when fetching records in bulk (keeps the urls short)
+FILTER_CHUNK_SIZE = 100
+
 
 class IrmExtractor(Irm):
     def connect(self, url: str, token: str) -> pynetbox.api:
@@ -19,7 +23,8 @@ class IrmExtractor(Irm):
         Should return a pynetbox.api object
         """
         try:
-            nb = pynetbox.api(url, token=token)
+            # the pages of the listings are fetched concurrently
+            nb = pynetbox.api(url, token=token, threading=True)
             logger.info("Connected to Netbox")
         except Exception as e:
             logger.error("Error connecting to Netbox: %s", e)
@@ -48,35 +53,140 @@ class IrmExtractor(Irm):
                 },
         }
         """
+        return self.get_inventory(irm_api)["hosts"]
 
-        ignore_list = IGNORE_LIST
+    def get_inventory(
+        self, irm_api: pynetbox.api, inventory: dict = None, since: datetime = None
+    ) -> dict:
+        """
+        Get the active RNP circuits from Netbox
 
-        # extract name and speed from netbox from every circuit
-        all_sites = irm_api.dcim.sites.all()
-        all_sites = list(all_sites)
-        logger.info("Got %d sites from Netbox", len(all_sites))
+        The terminations and the sites of the circuits are fetched in bulk (filtered by id)
+        instead of being loaded one by one from each circuit
 
-        # empty dict to store the info
-        site_circuits = {}
+        If the cached `inventory` is given, only the circuits, terminations and sites
+        updated after `since` (filtered by last_updated) are fetched
 
-        # retrieve all circuits from Netbox with type RNP and status active
+        Returns a dict with the following format:
+        {
+            "hosts": hosts info (see get_hosts_speed),
+            "circuits": {circuit id: {"site_id": site id, "speed": speed in bits}},
+            "sites": {site id: site slug},
+        }
+        """
         circuit_rnp = irm_api.circuits.circuit_types.get(slug="rnp")
-        circuits = irm_api.circuits.circuits.filter(
-            type_id=circuit_rnp.id, status="active"
-        )
+
+        if inventory is None:
+            circuits = {}
+            sites = {}
+            # retrieve all circuits from Netbox with type RNP and status active
+            changed_circuits = list(
+                irm_api.circuits.circuits.filter(
+                    type_id=circuit_rnp.id, status="active"
+                )
+            )
+        else:
+            circuits = dict(inventory["circuits"])
+            sites = dict(inventory["sites"])
+            last_updated = since.isoformat()
+            # every type and status, so the circuits that stopped being active RNP ones are removed
+            changed_circuits = list(
+                irm_api.circuits.circuits.filter(last_updated__gte=last_updated)
+            )
+            # circuits whose termination changed (e.g. moved to another site)
+            moved_circuit_ids = {
+                termination.circuit.id
+                for termination in irm_api.circuits.circuit_terminations.filter(
+                    term_side="Z", last_updated__gte=last_updated
+                )
+            } - {circuit.id for circuit in changed_circuits}
+            changed_circuits += filter_by_ids(
+                irm_api.circuits.circuits, "id", moved_circuit_ids
+            )
+            # renamed sites
+            for site in irm_api.dcim.sites.filter(last_updated__gte=last_updated):
+                if str(site.id) in sites:
+                    sites[str(site.id)] = site.slug
+            logger.info("Got %d changed circuits from Netbox", len(changed_circuits))
+
+        active_circuits = [
+            circuit
+            for circuit in changed_circuits
+            if circuit.type.id == circuit_rnp.id and circuit.status.value == "active"
+        ]
+
+        # sites of the circuits, from their Z terminations
+        circuit_sites = {
+            termination.circuit.id: termination.site.id
+            for termination in filter_by_ids(
+                irm_api.circuits.circuit_terminations,
+                "circuit_id",
+                {circuit.id for circuit in active_circuits},
+                term_side="Z",
+            )
+            if termination.site is not None
+        }
+        for site in filter_by_ids(
+            irm_api.dcim.sites,
+            "id",
+            {
+                site_id
+                for site_id in circuit_sites.values()
+                if str(site_id) not in sites
+            },
+        ):
+            sites[str(site.id)] = site.slug
+
+        # the updated circuits keep their position (the order of the links config)
+        active_circuit_ids = {circuit.id for circuit in active_circuits}
+        for circuit in changed_circuits:
+            if circuit.id not in active_circuit_ids or circuit.id not in circuit_sites:
+                circuits.pop(str(circuit.id), None)
+                continue
+            circuits[str(circuit.id)] = {
+                "site_id": str(circuit_sites[circuit.id]),
+                "speed": circuit.commit_rate * 1000,
+            }
+
+        return {
+            "hosts": self.__hosts_speed(circuits, sites),
+            "circuits": circuits,
+            "sites": sites,
+        }
+
+    def __hosts_speed(self, circuits: dict, sites: dict) -> dict:
+        """
+        Returns the hosts info (see get_hosts_speed) of the given circuits
+        """
+        ignore_list = IGNORE_LIST
+
+        # empty dict to store the info
+        site_circuits = {}
 
         # for each circuit, get the site name and the speed
-        for circuit in circuits:
-            # but this change will break the alerting system
-            site_name = circuit.termination_z.site.slug
-            circuit_speed = circuit.commit_rate * 1000
+        for circuit in circuits.values():
+            site_name = sites[circuit["site_id"]]
 
             # ignore sites in the ignore list
             if site_name in ignore_list:
                 continue
 
-            site_circuits[str(site_name)] = {"LINK_SPEED": circuit_speed}
+            site_circuits[str(site_name)] = {"LINK_SPEED": circuit["speed"]}
 
         logger.info("Got %d circuits from Netbox", len(site_circuits))
 
         return site_circuits
+
+
+def filter_by_ids(endpoint, id_filter: str, ids: set, **filters) -> list:
+    """
+    Gets the records of the endpoint with the given ids (in the `id_filter` field),
+    with up to FILTER_CHUNK_SIZE ids per request
+    """
+    ids = sorted(ids)
+    records = []
+    for start in range(0, len(ids), FILTER_CHUNK_SIZE):
+        records += endpoint.filter(
+            **{id_filter: ids[start : start + FILTER_CHUNK_SIZE]}, **filters
+        )
+    return records
@@ -1,15 +1,31 @@
 #!/usr/bin/env python
 # coding=utf-8
+import os
+
 from abc import ABC, abstractmethod
+from datetime import datetime, timezone
+from hashlib import sha256
 from logging import getLogger
-from json import dump
+from json import dump, dumps, load
+from time import time
 
-from config import IRM_HOST, LINKS_INFO_FILE, IRM_TOKEN
+from config import (
+    IRM_HOST,
+    LINKS_INFO_FILE,
+    IRM_TOKEN,
+    IRM_CACHE_PATH,
+    IRM_CACHE_TTL,
+    IRM_FULL_SYNC_INTERVAL,
+)
 from utils import json_reader
 from formatters.hosts import Hosts
 
 logger = getLogger("watcher")
 
+# seconds subtracted from the last sync when asking the IRM for the changes since it,
+# so a small clock difference between the watcher and the IRM never loses a change
+SYNC_MARGIN = 60
+
 
 class Irm(ABC):
     @abstractmethod
@@ -40,6 +56,23 @@ class Irm(ABC):
         """
         pass
 
+    def get_inventory(
+        self, irm_api, inventory: dict = None, since: datetime = None
+    ) -> dict:
+        """
+        Get the inventory of the IRM, that is kept in the IRM cache (IRM_CACHE_PATH) between the runs
+
+        Should return a dict with the hosts in the format returned by `get_hosts_speed`,
+        and any other key needed to update the inventory later:
+        {
+            "hosts": hosts info,
+        }
+
+        If the cached `inventory` is given, it may be updated with only the changes made in the IRM
+        after `since` (UTC datetime). The default implementation always gets every host with `get_hosts_speed`
+        """
+        return {"hosts": self.get_hosts_speed(irm_api)}
+
     def choose_link_config_source(self, args_file: str, output_path) -> dict:
         """
         If an input file is given, use it.
@@ -51,14 +84,17 @@ class Irm(ABC):
         else:
             logger.info("retrieving info from IRM at: %s", IRM_HOST)
             hosts_config = Hosts.format_links(self.extract_hosts_info())
-            with open(LINKS_INFO_FILE, "w+") as outfile:
-                logger.info("droppping hosts.json at: %s", output_path)
-                dump(hosts_config, outfile, indent=6)
+            write_links_file(hosts_config, LINKS_INFO_FILE)
         return hosts_config
 
     def extract_hosts_info(self) -> dict:
         """
-        Extracts hosts info from IRM
+        Extracts hosts info from IRM, through the inventory cache (IRM_CACHE_PATH):
+        - if the cache was synced less than IRM_CACHE_TTL seconds ago, the IRM isn't queried
+        - else only the changes since the last sync are queried (see `get_inventory`)
+        - the whole inventory is queried if there is no cache or if the last full sync
+          was more than IRM_FULL_SYNC_INTERVAL seconds ago (so the deleted hosts are removed)
+
         Has to return a dict with the following format:
         {
             "LINKS": [
@@ -69,6 +105,94 @@ class Irm(ABC):
             ]
         }
         """
+        cache = load_inventory_cache(IRM_CACHE_PATH)
+        now = time()
+        if cache is not None and now - cache["synced_at"] < IRM_CACHE_TTL:
+            logger.info("using the IRM inventory cached at %s", IRM_CACHE_PATH)
+            return cache["inventory"]["hosts"]
+
         netbox_api = self.connect(IRM_HOST, IRM_TOKEN)
-        hosts_info = self.get_hosts_speed(netbox_api)
-        return hosts_info
+        if cache is None or now - cache["full_synced_at"] >= IRM_FULL_SYNC_INTERVAL:
+            logger.info("syncing the whole IRM inventory")
+            inventory = self.get_inventory(netbox_api)
+            full_synced_at = now
+        else:
+            since = datetime.fromtimestamp(
+                cache["synced_at"] - SYNC_MARGIN, timezone.utc
+            )
+            logger.info("syncing the IRM inventory changes since %s", since)
+            inventory = self.get_inventory(netbox_api, cache["inventory"], since)
+            full_synced_at = cache["full_synced_at"]
+
+        save_inventory_cache(
+            {
+                "synced_at": now,
+                "full_synced_at": full_synced_at,
+                "inventory": inventory,
+            },
+            IRM_CACHE_PATH,
+        )
+        return inventory["hosts"]
+
+
+def load_inventory_cache(cache_path: str) -> dict | None:
+    """
+    Reads the IRM inventory cache:
+    {
+        "synced_at": epoch timestamp of the last sync,
+        "full_synced_at": epoch timestamp of the last full sync,
+        "inventory": inventory returned by `Irm.get_inventory`,
+    }
+
+    Returns None if there is no cache or if it can't be read
+    """
+    try:
+        with open(cache_path) as f:
+            cache = load(f)
+        if not {"synced_at", "full_synced_at", "inventory"} <= cache.keys():
+            raise ValueError("missing keys")
+        return cache
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError) as e:
+        logger.warning("ignoring the IRM cache at %s: %s", cache_path, e)
+        return None
+
+
+def save_inventory_cache(cache: dict, cache_path: str):
+    """
+    Writes the IRM inventory cache (replaced atomically, errors are only logged)
+    """
+    temp_path = "{}.tmp{}".format(cache_path, os.getpid())
+    try:
+        os.makedirs(os.path.dirname(cache_path) or ".", exist_ok=True)
+        with open(temp_path, "w") as f:
+            dump(cache, f)
+        os.replace(temp_path, cache_path)
+    except OSError as e:
+        logger.error("error writing the IRM cache to %s: %s", cache_path, e)
+
+
+def write_links_file(hosts_config: dict, links_file: str) -> bool:
+    """
+    Writes the links config to the links file, only if its content changed
+    (the sha256 of the new content is compared with the one of the file)
+
+    Returns True if the file was written
+    """
+    content = dumps(hosts_config, indent=6).encode()
+    try:
+        with open(links_file, "rb") as f:
+            unchanged = sha256(f.read()).digest() == sha256(content).digest()
+    except OSError:
+        unchanged = False
+    if unchanged:
+        logger.info("links file at %s is up to date", links_file)
+        return False
+
+    logger.info("droppping hosts.json at: %s", links_file)
+    temp_path = "{}.tmp{}".format(links_file, os.getpid())
+    with open(temp_path, "wb") as f:
+        f.write(content)
+    os.replace(temp_path, links_file)
+    return True
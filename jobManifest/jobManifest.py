@@ -0,0 +1,113 @@
+#!/usr/bin/env python
+# coding=utf-8
+
+import json
+import os
+
+from hashlib import sha256
+from logging import getLogger
+from pathlib import Path
+from threading import Lock
+
+from codec import codec
+
+logger = getLogger("watcher")
+
+
+def job_hash(data) -> str:
+    """
+    Returns the sha256 (hex) of the given json data, independent of the order of its keys
+    """
+    return sha256(json.dumps(data, sort_keys=True).encode()).hexdigest()
+
+
+class JobManifest:
+    """
+    Records the links already checked on each day of a watcher run (its units),
+    so a run that died halfway is resumed from the links that weren't finished
+
+    One json lines file per report date, with a line appended as soon as each link is checked:
+    {"link": LINK_NAME, "job_hash": ..., "report_hash": ..., "report": link report}
+
+    A unit is only reused if its job hash (the link config and the options of the run)
+    is the current one and its report hash matches its content, so units of another config,
+    or written partially when the run died, are checked again
+    """
+
+    def __init__(self, path: str):
+        self.path = Path(path) / "manifests"
+        self.lock = Lock()
+
+    def __file_path(self, report_date: str) -> Path:
+        return self.path / "manifest_{}.jsonl".format(report_date)
+
+    def load(self, report_date: str, job_hashes: dict) -> dict:
+        """
+        Returns the reports of the finished units of the given report date
+        whose job hash is the one in `job_hashes` ({LINK_NAME: job hash}):
+        {
+            LINK_NAME: link report,
+        }
+        """
+        file_path = self.__file_path(report_date)
+        if not file_path.is_file():
+            return {}
+
+        finished = {}
+        with open(file_path) as f:
+            for line in f:
+                try:
+                    unit = json.loads(line)
+                except ValueError:
+                    # the line being written when the run died
+                    continue
+                if unit["job_hash"] != job_hashes.get(unit["link"]):
+                    continue
+                if (
+                    sha256(codec.encode(unit["report"], "compact").encode()).hexdigest()
+                    != unit["report_hash"]
+                ):
+                    logger.warning(
+                        "ignoring the changed report of %s in %s",
+                        unit["link"],
+                        file_path,
+                    )
+                    continue
+                finished[unit["link"]] = unit["report"]
+        logger.info("%d links of %s were already checked", len(finished), report_date)
+        return finished
+
+    def record(self, report_date: str, link_name: str, unit_hash: str, report: dict):
+        """
+        Appends the finished unit of the given link and report date
+        """
+        content = codec.encode(report, "compact")
+        line = codec.encode(
+            {
+                "link": link_name,
+                "job_hash": unit_hash,
+                "report_hash": sha256(content.encode()).hexdigest(),
+                "report": report,
+            },
+            "compact",
+        )
+        with self.lock:
+            self.path.mkdir(parents=True, exist_ok=True)
+            with open(self.__file_path(report_date), "a") as f:
+                f.write(line + "\n")
+
+    def clear(self, report_date: str):
+        """
+        Removes the units of the given report date (once its report is complete),
+        and the manifests directory if no other report date has units
+        """
+        with self.lock:
+            try:
+                os.remove(self.__file_path(report_date))
+            except FileNotFoundError:
+                pass
+            try:
+                self.path.rmdir()
+            except OSError:
+                # missing, or with the units of other report dates
+                pass
@@ -0,0 +1,320 @@
+#!/usr/bin/env python
+# coding=utf-8
+
+import json
+import os
+
+from contextlib import contextmanager
+from datetime import datetime
+from logging import getLogger
+from pathlib import Path
+from threading import Lock
+from time import perf_counter
+
+from codec import codec
+from config import METRICS_SLOWEST_LINKS
+
+logger = getLogger("watcher")
+
+# upper bounds (in seconds) of the query latency histogram buckets
+QUERY_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+
+class RunMetrics:
+    """
+    Timings and counters of a watcher, alert or daemon run:
+    - queries: latency histogram of each kind of TSDB query ("traffic", "percentile")
+    - counters: points fetched, bytes received, links checked, ...
+    - stages: seconds spent in each stage (detect, report_write, ...)
+    - links: seconds spent checking each link, to find the slowest ones
+
+    The queries and counters are updated by the worker threads, so every update holds a lock.
+    At the end of the run the metrics are written as a json run summary
+    and as a file for the textfile collector of the Prometheus node exporter
+    """
+
+    def __init__(
+        self, mode: str = "watcher", slowest_links: int = METRICS_SLOWEST_LINKS
+    ):
+        self.lock = Lock()
+        self.slowest_links = slowest_links
+        self.start(mode)
+
+    def start(self, mode: str):
+        """
+        Starts a new run of the given mode, discarding the metrics of the last one
+        """
+        with self.lock:
+            self.mode = mode
+            self.started = datetime.now()
+            self.begin = perf_counter()
+            self.queries = {}
+            self.counters = {}
+            self.stages = {}
+            self.links = {}
+
+    def observe_query(self, kind: str, seconds: float):
+        """
+        Adds a query of the given kind that took `seconds` to its latency histogram
+        """
+        with self.lock:
+            histogram = self.queries.setdefault(
+                kind,
+                {
+                    "count": 0,
+                    "sum": 0.0,
+                    "max": 0.0,
+                    "buckets": [0] * (len(QUERY_BUCKETS) + 1),
+                },
+            )
+            histogram["count"] += 1
+            histogram["sum"] += seconds
+            histogram["max"] = max(histogram["max"], seconds)
+            bucket = 0
+            while bucket < len(QUERY_BUCKETS) and seconds > QUERY_BUCKETS[bucket]:
+                bucket += 1
+            histogram["buckets"][bucket] += 1
+
+    def count(self, name: str, value: int = 1):
+        """
+        Adds `value` to the given counter
+        """
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    @contextmanager
+    def query(self, kind: str):
+        """
+        Times the TSDB query run inside the `with` block
+        """
+        begin = perf_counter()
+        try:
+            yield
+        finally:
+            self.observe_query(kind, perf_counter() - begin)
+
+    @contextmanager
+    def stage(self, name: str):
+        """
+        Adds the time spent inside the `with` block to the given stage
+        """
+        begin = perf_counter()
+        try:
+            yield
+        finally:
+            seconds = perf_counter() - begin
+            with self.lock:
+                self.stages[name] = self.stages.get(name, 0.0) + seconds
+
+    @contextmanager
+    def link(self, link_name: str):
+        """
+        Adds the time spent inside the `with` block to the detection of the given link
+        """
+        begin = perf_counter()
+        try:
+            yield
+        finally:
+            self.observe_link(link_name, perf_counter() - begin)
+
+    def observe_link(self, link_name: str, seconds: float):
+        """
+        Adds a detection of the given link that took `seconds`
+        """
+        with self.lock:
+            self.links[link_name] = self.links.get(link_name, 0.0) + seconds
+            self.stages["detect"] = self.stages.get("detect", 0.0) + seconds
+            self.counters["links_checked"] = self.counters.get("links_checked", 0) + 1
+
+    def track_client(self, db_client):
+        """
+        Counts the bytes received by the given TSDB client,
+        if it sends its requests through a `requests` session (like the InfluxDBClient)
+
+        The streamed responses (--stream) aren't counted: their body is read in chunks
+        after the response hooks, and the bytes of a chunked body aren't tracked by urllib3
+        """
+        session = getattr(db_client, "_session", None)
+        if session is None or not hasattr(session, "hooks"):
+            logger.debug(
+                "the TSDB client has no session, the bytes received aren't counted"
+            )
+            return
+
+        def count_bytes(response, *args, **kwargs):
+            if kwargs.get("stream"):
+                return
+            # reads the body, then counts the bytes read from the wire (before its decompression)
+            body = response.content
+            raw_tell = getattr(response.raw, "tell", None)
+            self.count("bytes_received", raw_tell() if raw_tell else len(body))
+
+        session.hooks["response"].append(count_bytes)
+
+    def summary(self) -> dict:
+        """
+        Returns the json run summary:
+        {
+            "mode": watcher|alert|daemon,
+            "started": start time (ISO 8601),
+            "duration": seconds,
+            "counters": {COUNTER: value},
+            "stages": {STAGE: seconds},
+            "queries": {
+                KIND: {
+                    "count": number of queries,
+                    "sum": seconds,
+                    "max": seconds,
+                    "buckets": {UPPER_BOUND: number of queries up to it (cumulative)},
+                },
+            },
+            "slowest_links": [{"link": LINK_NAME, "seconds": seconds}, ...],
+        }
+        """
+        with self.lock:
+            queries = {}
+            for kind, histogram in self.queries.items():
+                buckets = {}
+                cumulative = 0
+                for upper_bound, count in zip(
+                    QUERY_BUCKETS + ("+Inf",), histogram["buckets"]
+                ):
+                    cumulative += count
+                    buckets[str(upper_bound)] = cumulative
+                queries[kind] = {
+                    "count": histogram["count"],
+                    "sum": round(histogram["sum"], 6),
+                    "max": round(histogram["max"], 6),
+                    "buckets": buckets,
+                }
+            slowest_links = sorted(
+                self.links.items(), key=lambda link: link[1], reverse=True
+            )[: self.slowest_links]
+            return {
+                "mode": self.mode,
+                "started": self.started.isoformat(timespec="seconds"),
+                "duration": round(perf_counter() - self.begin, 6),
+                "counters": dict(self.counters),
+                "stages": {
+                    name: round(seconds, 6) for name, seconds in self.stages.items()
+                },
+                "queries": queries,
+                "slowest_links": [
+                    {"link": link_name, "seconds": round(seconds, 6)}
+                    for link_name, seconds in slowest_links
+                ],
+            }
+
+    def to_prometheus(self, summary: dict) -> str:
+        """
+        Returns the given run summary in the Prometheus text format
+        """
+        mode = 'mode="{}"'.format(summary["mode"])
+        lines = [
+            "# HELP link_watcher_run_duration_seconds Duration of the last run.",
+            "# TYPE link_watcher_run_duration_seconds gauge",
+            "link_watcher_run_duration_seconds{{{}}} {}".format(
+                mode, summary["duration"]
+            ),
+            "# HELP link_watcher_run_timestamp_seconds Start time of the last run.",
+            "# TYPE link_watcher_run_timestamp_seconds gauge",
+            "link_watcher_run_timestamp_seconds{{{}}} {}".format(
+                mode, int(self.started.timestamp())
+            ),
+            "# HELP link_watcher_run_count Counters of the last run (points fetched, bytes received, ...).",
+            "# TYPE link_watcher_run_count gauge",
+        ]
+        for name, value in sorted(summary["counters"].items()):
+            lines.append(
+                'link_watcher_run_count{{{},counter="{}"}} {}'.format(mode, name, value)
+            )
+
+        lines += [
+            "# HELP link_watcher_stage_duration_seconds Time spent in each stage of the last run.",
+            "# TYPE link_watcher_stage_duration_seconds gauge",
+        ]
+        for name, seconds in sorted(summary["stages"].items()):
+            lines.append(
+                'link_watcher_stage_duration_seconds{{{},stage="{}"}} {}'.format(
+                    mode, name, seconds
+                )
+            )
+
+        lines += [
+            "# HELP link_watcher_query_duration_seconds Latency of the TSDB queries of the last run.",
+            "# TYPE link_watcher_query_duration_seconds histogram",
+        ]
+        for kind, histogram in sorted(summary["queries"].items()):
+            labels = '{},kind="{}"'.format(mode, kind)
+            for upper_bound, count in histogram["buckets"].items():
+                lines.append(
+                    'link_watcher_query_duration_seconds_bucket{{{},le="{}"}} {}'.format(
+                        labels, upper_bound, count
+                    )
+                )
+            lines.append(
+                "link_watcher_query_duration_seconds_sum{{{}}} {}".format(
+                    labels, histogram["sum"]
+                )
+            )
+            lines.append(
+                "link_watcher_query_duration_seconds_count{{{}}} {}".format(
+                    labels, histogram["count"]
+                )
+            )
+
+        lines += [
+            "# HELP link_watcher_link_detect_seconds Time spent checking the slowest links of the last run.",
+            "# TYPE link_watcher_link_detect_seconds gauge",
+        ]
+        for slow_link in summary["slowest_links"]:
+            lines.append(
+                'link_watcher_link_detect_seconds{{{},link="{}"}} {}'.format(
+                    mode, escape_label(slow_link["link"]), slow_link["seconds"]
+                )
+            )
+        return "\n".join(lines) + "\n"
+
+    def write(self, path: str):
+        """
+        Writes the metrics of the run to the given directory:
+        - run_<mode>.json: summary of the last run
+        - runs_<mode>.jsonl: summaries of every run, one per line
+        - link_watcher_<mode>.prom: last run in the Prometheus text format (for the textfile collector)
+
+        Errors are only logged, so they never fail the run
+        """
+        summary = self.summary()
+        path = Path(path)
+        try:
+            path.mkdir(parents=True, exist_ok=True)
+            codec.dump(summary, str(path / "run_{}.json".format(self.mode)), "json")
+            with open(path / "runs_{}.jsonl".format(self.mode), "a") as f:
+                f.write(json.dumps(summary, separators=(",", ":")) + "\n")
+
+            # the collector may read the file at any time, so it's replaced atomically
+            prom_path = path / "link_watcher_{}.prom".format(self.mode)
+            temp_path = prom_path.with_suffix(".tmp{}".format(os.getpid()))
+            with open(temp_path, "w") as f:
+                f.write(self.to_prometheus(summary))
+            os.replace(temp_path, prom_path)
+        except OSError as e:
+            logger.error("error writing the run metrics to %s: %s", path, e)
+            return
+        logger.info(
+            "run metrics written to %s (%.1fs, %d queries)",
+            path,
+            summary["duration"],
+            sum(histogram["count"] for histogram in summary["queries"].values()),
+        )
+
+
+def escape_label(value: str) -> str:
+    """
+    Escapes a Prometheus label value
+    """
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+# metrics of the current run, shared by the watcher stages (like the logger)
+run_metrics = RunMetrics()
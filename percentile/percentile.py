@@ -0,0 +1,138 @@
+#!/usr/bin/env python
+# coding=utf-8
+
+import numpy as np
+
+from math import floor, log
+
+from series.series import Series
+from config import PERCENTILE_SKETCH_ACCURACY
+
+
+def calculate_percentile(data: Series, percentile) -> float | None:
+    """
+    Calculates the percentile of the given traffic the same way the TSDB does (nearest rank):
+    the value at position floor(n * percentile / 100 + 0.5) of the ordered values.
+    The value is selected with a partition instead of sorting all the values
+
+    Returns the percentile in bits, or None if it can't be calculated with the given points
+    """
+    index = nearest_rank(len(data), percentile) - 1
+    if index < 0 or index >= len(data):
+        return None
+
+    # multiplying by 8 to convert from bytes to bits
+    return float(np.partition(data.values, index)[index]) * 8
+
+
+def nearest_rank(points: int, percentile) -> int:
+    """
+    Returns the (1-based) position of the given percentile in `points` ordered values
+    """
+    return floor(points * float(percentile) / 100 + 0.5)
+
+
+class PercentileSketch:
+    """
+    Mergeable sketch of the traffic values (in bits) of a link interface, used to calculate percentiles
+    without keeping every value (logarithmic buckets, like DDSketch)
+
+    Each value v > 0 is counted in the bucket ceil(log(v) / log(gamma)), where gamma = (1 + accuracy) / (1 - accuracy),
+    and the percentiles are returned as the middle of their bucket: any percentile has a relative error of at most `accuracy`.
+    Sketches with the same accuracy are merged by adding their bucket counts, so the percentile
+    of many days is calculated from the sketches of each day (with the same error)
+    """
+
+    def __init__(
+        self,
+        accuracy: float = PERCENTILE_SKETCH_ACCURACY,
+        zero_count: int = 0,
+        buckets: dict = None,
+    ):
+        if not 0 < accuracy < 1:
+            raise ValueError("the sketch accuracy must be between 0 and 1")
+        self.accuracy = accuracy
+        self.gamma = (1 + accuracy) / (1 - accuracy)
+        self.zero_count = zero_count
+        self.buckets = buckets or {}
+
+    def __len__(self) -> int:
+        return self.zero_count + sum(self.buckets.values())
+
+    @classmethod
+    def from_values(
+        cls, values, accuracy: float = PERCENTILE_SKETCH_ACCURACY
+    ) -> "PercentileSketch":
+        """
+        Creates a sketch of the given traffic values (in bits)
+        """
+        sketch = cls(accuracy)
+        values = np.asarray(values, dtype=np.float64)
+        positive_values = values[values > 0]
+        sketch.zero_count = len(values) - len(positive_values)
+        indexes, counts = np.unique(
+            np.ceil(np.log(positive_values) / log(sketch.gamma)).astype(np.int64),
+            return_counts=True,
+        )
+        sketch.buckets = dict(zip(indexes.tolist(), counts.tolist()))
+        return sketch
+
+    def merge(self, other: "PercentileSketch") -> "PercentileSketch":
+        """
+        Adds the values of the `other` sketch to this one
+        """
+        if other.accuracy != self.accuracy:
+            raise ValueError("only sketches with the same accuracy can be merged")
+        self.zero_count += other.zero_count
+        for index, count in other.buckets.items():
+            self.buckets[index] = self.buckets.get(index, 0) + count
+        return self
+
+    def percentile(self, percentile) -> float | None:
+        """
+        Calculates the percentile of the values in the sketch (nearest rank, like `calculate_percentile`)
+
+        Returns the percentile in bits, or None if it can't be calculated with the values in the sketch
+        """
+        points = len(self)
+        rank = nearest_rank(points, percentile)
+        if rank < 1 or rank > points:
+            return None
+        if rank <= self.zero_count:
+            return 0.0
+
+        seen = self.zero_count
+        for index in sorted(self.buckets):
+            seen += self.buckets[index]
+            if seen >= rank:
+                return 2 * self.gamma**index / (self.gamma + 1)
+
+    def to_dict(self) -> dict:
+        """
+        Returns the sketch in the format stored in the reports:
+        {
+            "accuracy": relative accuracy,
+            "zero_count": number of values equal to 0,
+            "buckets": "bucket index:number of values,...",
+        }
+        (the buckets are kept in a single string, so they stay compact in indented reports)
+        """
+        return {
+            "accuracy": self.accuracy,
+            "zero_count": self.zero_count,
+            "buckets": ",".join(
+                "{}:{}".format(index, self.buckets[index])
+                for index in sorted(self.buckets)
+            ),
+        }
+
+    @classmethod
+    def from_dict(cls, sketch: dict) -> "PercentileSketch":
+        """
+        Creates a sketch from the format returned by `to_dict`
+        """
+        buckets = {}
+        for bucket in filter(None, sketch["buckets"].split(",")):
+            index, count = bucket.split(":")
+            buckets[int(index)] = int(count)
+        return cls(sketch["accuracy"], sketch["zero_count"], buckets)
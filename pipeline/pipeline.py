@@ -0,0 +1,110 @@
+#!/usr/bin/env python
+# coding=utf-8
+
+from concurrent.futures import Future, ThreadPoolExecutor, wait, FIRST_COMPLETED
+from logging import getLogger
+from typing import Any, Callable
+
+logger = getLogger("watcher")
+
+
+class LinkPipeline:
+    """
+    Runs the watcher stages over a list of links:
+    - fetch: queries the TSDB for a link (runs on a bounded pool of worker threads)
+    - detect: checks the fetched data and builds the link report (runs on the calling thread)
+
+    While a link is being checked, the next ones are already being fetched,
+    so the TSDB latency overlaps with the detection
+    """
+
+    def __init__(self, workers: int, max_pending: int = None):
+        if workers < 1:
+            raise ValueError("the number of workers must be at least 1")
+        self.workers = workers
+        # fetches allowed in flight, so a worker never waits for the next job
+        # while the fetched data that wasn't checked yet stays bounded in memory
+        self.max_in_flight = workers * 2
+        # detections allowed in flight, when `detect` returns futures (see `run`)
+        self.max_pending = max_pending or self.max_in_flight
+
+    def run(
+        self,
+        links: list,
+        fetch: Callable[[list], dict],
+        detect: Callable[[Any, Any], Any],
+        batch_size: int = 1,
+        emit: Callable[[Any, Any], None] = None,
+    ) -> list:
+        """
+        Fetches and checks every link in `links`
+
+        The links are fetched in batches of `batch_size` links: `fetch(batch)` is called on a worker thread
+        and must return a dict with the fetched data of each link in the batch ({link: fetched}).
+        Each fetched link is given to `detect(link, fetched)`, that is called on the current thread
+        as soon as its batch is done. `detect` may also return a Future (e.g. of a process pool),
+        the result of the link is then the result of the Future
+
+        If `emit` is given, `emit(link, result)` is called with the results in the same order as `links`,
+        as soon as a result and all the ones before it are ready
+
+        Returns a list with the results of `detect` in the same order as `links`
+        """
+        if batch_size < 1:
+            raise ValueError("the batch size must be at least 1")
+
+        results = [None] * len(links)
+        done_links = [False] * len(links)
+        next_emit = 0
+        batch_starts = list(range(0, len(links), batch_size))
+        next_batch = 0
+        in_flight = {}
+        pending = {}
+
+        logger.info(
+            "processing %d links in %d batches with %d workers",
+            len(links),
+            len(batch_starts),
+            self.workers,
+        )
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            while next_batch < len(batch_starts) or in_flight or pending:
+                # filling the pool
+                while (
+                    next_batch < len(batch_starts)
+                    and len(in_flight) < self.max_in_flight
+                    and len(pending) < self.max_pending
+                ):
+                    start = batch_starts[next_batch]
+                    batch = links[start : start + batch_size]
+                    in_flight[executor.submit(fetch, batch)] = start
+                    next_batch += 1
+
+                done, _ = wait(
+                    list(in_flight) + list(pending), return_when=FIRST_COMPLETED
+                )
+                for future in done:
+                    # a detection returned as a Future
+                    if future in pending:
+                        index = pending.pop(future)
+                        results[index] = future.result()
+                        done_links[index] = True
+                        continue
+
+                    start = in_flight.pop(future)
+                    fetched = future.result()
+                    for index in range(start, min(start + batch_size, len(links))):
+                        result = detect(links[index], fetched[links[index]])
+                        if isinstance(result, Future):
+                            pending[result] = index
+                        else:
+                            results[index] = result
+                            done_links[index] = True
+
+                # emitting the results that are ready, in order
+                while next_emit < len(links) and done_links[next_emit]:
+                    if emit is not None:
+                        emit(links[next_emit], results[next_emit])
+                    next_emit += 1
+
+        return results
@@ -1,11 +1,14 @@
 #!/usr/bin/env python
 # coding=utf-8
 
-from os.path import join
+from os.path import join, dirname, basename
 from logging import getLogger
 
 from pprint import pprint
 
+from utils import save_json
+from reportStore.reportStore import ReportStore
+
 logger = getLogger("watcher")
 
 class ReportManipulator():
@@ -20,12 +23,28 @@ class ReportManipulator():
         logger.info("creating report file at: %s", file_path)
         return file_path
     
+    def save_report(self, report: dict, file_path: str):
+        """
+        Saves the report json file and indexes it in the report store of its directory
+        """
+        save_json(report, file_path)
+        self.index_report(report, file_path)
+
+    def index_report(self, report: dict, file_path: str, job_hash: str = None):
+        """
+        Indexes a saved report in the report store of its directory
+        (with the job hash of the watcher run that completed it, if given)
+        """
+        report_store = ReportStore(dirname(file_path))
+        report_store.put_report(report, basename(file_path), job_hash)
+        report_store.close()
+
     def add_interval_to_report(self,
     link_iface_report: dict,
     time_begin: str,
     time_end: str,
     interval_counter: int,
-    exceeded_time: int
+    exceeded_time: int | float
     ):
         """
         adds an interval to the report dict in the format:
@@ -54,5 +73,25 @@ class ReportManipulator():
             {"exceeded_time": str(exceeded_time) + "min"}
         )
 
-        # total exceeded time
-        link_iface_report["total_exceeded"] += exceeded_time
+        # total exceeded time (rounded, since points more often than a minute give fractions of minutes)
+        link_iface_report["total_exceeded"] = round(
+            link_iface_report["total_exceeded"] + exceeded_time, 2
+        )
+
+    def remove_interval_from_report(self, link_iface_report: dict, interval_counter: int):
+        """
+        removes an interval from the report dict (and its exceeded time from the total)
+        the interval numbers are strings once the report is read back from its json file
+        updates the interval report dict
+        """
+        for key in (interval_counter, str(interval_counter)):
+            interval = link_iface_report["intervals"].pop(key, None)
+            if interval is not None:
+                exceeded_time = interval["exceeded_time"].removesuffix("min")
+                exceeded_time = (
+                    float(exceeded_time) if "." in exceeded_time else int(exceeded_time)
+                )
+                link_iface_report["total_exceeded"] = round(
+                    link_iface_report["total_exceeded"] - exceeded_time, 2
+                )
+                return
@@ -0,0 +1,213 @@
+#!/usr/bin/env python
+# coding=utf-8
+
+import json
+import sqlite3
+
+from datetime import datetime, timedelta
+from logging import getLogger
+from pathlib import Path
+
+from utils import json_reader
+
+logger = getLogger("watcher")
+
+REPORT_DATE_FORMAT = "%d-%m-%y"
+STORE_DATE_FORMAT = "%Y-%m-%d"
+
+
+class ReportStore:
+    """
+    SQLite index of the reports saved in a directory (stored in the same directory, in `reports.db`)
+
+    It holds the totals, percentiles and number of intervals of each (day, link, iface),
+    so a date range is read with one indexed query instead of parsing every report file
+    """
+
+    FILE_NAME = "reports.db"
+
+    def __init__(self, reports_dir: str):
+        self.reports_dir = Path(reports_dir)
+        self.connection = sqlite3.connect(self.reports_dir / self.FILE_NAME)
+        with self.connection:
+            self.connection.execute(
+                """
+                CREATE TABLE IF NOT EXISTS days (
+                    day TEXT PRIMARY KEY,
+                    file_name TEXT NOT NULL
+                )
+                """
+            )
+            self.connection.execute(
+                """
+                CREATE TABLE IF NOT EXISTS links (
+                    day TEXT NOT NULL,
+                    link TEXT NOT NULL,
+                    iface TEXT NOT NULL,
+                    total_exceeded INTEGER NOT NULL,
+                    intervals INTEGER NOT NULL,
+                    percentile REAL,
+                    percentile_sketch TEXT,
+                    PRIMARY KEY (day, link, iface)
+                )
+                """
+            )
+            # the watcher run (links and options) that created the report of each day
+            self.connection.execute(
+                """
+                CREATE TABLE IF NOT EXISTS jobs (
+                    day TEXT PRIMARY KEY,
+                    job_hash TEXT NOT NULL
+                )
+                """
+            )
+
+    def close(self):
+        self.connection.close()
+
+    def put_report(self, report: dict, file_name: str, job_hash: str = None):
+        """
+        Indexes a report saved in `file_name` (replacing the report of the same day, if it was already indexed)
+        The day of the report is the one in its file name, like reports_dd-mm-yy.json
+
+        `job_hash` identifies the watcher run that created the complete report (see `get_job_days`),
+        the reports indexed without it are never skipped by the watcher
+        """
+        day = datetime.strptime(
+            file_name.split("_")[1].split(".")[0], REPORT_DATE_FORMAT
+        ).strftime(STORE_DATE_FORMAT)
+        rows = []
+        for link_name, link_report in report.items():
+            # links without data aren't indexed
+            if link_name == "Data" or not isinstance(link_report, dict):
+                continue
+            for iface in ("rx", "tx"):
+                iface_report = link_report[iface]
+                percentile_sketch = iface_report.get("percentile_sketch")
+                if percentile_sketch is not None:
+                    percentile_sketch = json.dumps(percentile_sketch)
+                rows.append(
+                    (
+                        day,
+                        link_name,
+                        iface,
+                        iface_report["total_exceeded"],
+                        len(iface_report["intervals"]),
+                        iface_report.get("percentile"),
+                        percentile_sketch,
+                    )
+                )
+
+        logger.info("indexing report of %s", day)
+        with self.connection:
+            self.connection.execute("DELETE FROM links WHERE day = ?", (day,))
+            self.connection.execute(
+                "INSERT OR REPLACE INTO days (day, file_name) VALUES (?, ?)",
+                (day, file_name),
+            )
+            self.connection.executemany(
+                "INSERT INTO links VALUES (?, ?, ?, ?, ?, ?, ?)", rows
+            )
+            self.connection.execute("DELETE FROM jobs WHERE day = ?", (day,))
+            if job_hash is not None:
+                self.connection.execute(
+                    "INSERT INTO jobs (day, job_hash) VALUES (?, ?)", (day, job_hash)
+                )
+
+    def index_missing_days(self, date_begin: datetime, date_end: datetime):
+        """
+        Indexes the report files of the given date range that aren't in the store yet
+        (reports saved before the store existed), only the expected file names are checked
+        """
+        indexed_days = {day for day, _ in self.get_days(date_begin, date_end)}
+        day = date_begin
+        while day <= date_end:
+            file_path = self.reports_dir / "reports_{}.json".format(
+                day.strftime(REPORT_DATE_FORMAT)
+            )
+            if day.strftime(STORE_DATE_FORMAT) not in indexed_days and file_path.is_file():
+                self.put_report(json_reader(file_path), file_path.name)
+            day += timedelta(days=1)
+
+    def get_days(self, date_begin: datetime, date_end: datetime) -> list[tuple]:
+        """
+        Returns the indexed days of the given date range, ordered by date:
+        [(day in the YYYY-MM-DD format, report file name), ...]
+        """
+        return self.connection.execute(
+            "SELECT day, file_name FROM days WHERE day BETWEEN ? AND ? ORDER BY day",
+            (
+                date_begin.strftime(STORE_DATE_FORMAT),
+                date_end.strftime(STORE_DATE_FORMAT),
+            ),
+        ).fetchall()
+
+    def get_job_days(
+        self, date_begin: datetime, date_end: datetime, job_hash: str
+    ) -> list[tuple]:
+        """
+        Returns the days of the given date range whose report was completed by a run with the given job hash,
+        ordered by date: [(day in the YYYY-MM-DD format, report file name), ...]
+        """
+        return self.connection.execute(
+            """
+            SELECT days.day, days.file_name FROM days
+            JOIN jobs ON jobs.day = days.day
+            WHERE days.day BETWEEN ? AND ? AND jobs.job_hash = ?
+            ORDER BY days.day
+            """,
+            (
+                date_begin.strftime(STORE_DATE_FORMAT),
+                date_end.strftime(STORE_DATE_FORMAT),
+                job_hash,
+            ),
+        ).fetchall()
+
+    def get_exceeded_times(self, date_begin: datetime, date_end: datetime) -> dict:
+        """
+        Returns the exceeded time (rx and tx summed up) of each link on each day of the given date range:
+        {
+            DAY: {LINK_NAME: total exceeded time in minutes},
+        }
+        """
+        exceeded_times = {}
+        for day, link_name, total_exceeded in self.connection.execute(
+            """
+            SELECT day, link, SUM(total_exceeded) FROM links
+            WHERE day BETWEEN ? AND ?
+            GROUP BY day, link
+            """,
+            (
+                date_begin.strftime(STORE_DATE_FORMAT),
+                date_end.strftime(STORE_DATE_FORMAT),
+            ),
+        ):
+            exceeded_times.setdefault(day, {})[link_name] = total_exceeded
+        return exceeded_times
+
+    def get_percentile_sketches(self, date_begin: datetime, date_end: datetime) -> dict:
+        """
+        Returns the percentile sketches of each link interface on the days of the given date range:
+        {
+            LINK_NAME: {
+                "rx": [sketch of each day (or None if the report has no sketch), ...],
+                "tx": [...],
+            },
+        }
+        """
+        percentile_sketches = {}
+        for link_name, iface, percentile_sketch in self.connection.execute(
+            """
+            SELECT link, iface, percentile_sketch FROM links
+            WHERE day BETWEEN ? AND ?
+            ORDER BY day
+            """,
+            (
+                date_begin.strftime(STORE_DATE_FORMAT),
+                date_end.strftime(STORE_DATE_FORMAT),
+            ),
+        ):
+            percentile_sketches.setdefault(link_name, {"rx": [], "tx": []})[
+                iface
+            ].append(None if percentile_sketch is None else json.loads(percentile_sketch))
+        return percentile_sketches
@@ -0,0 +1,153 @@
+#!/usr/bin/env python
+# coding=utf-8
+
+import numpy as np
+
+
+class Series:
+    """
+    Traffic of a link interface, stored as two typed arrays ordered by time:
+    - times: epoch timestamps in seconds (int64)
+    - values: traffic values in bytes (float64)
+    """
+
+    __slots__ = ("times", "values")
+
+    def __init__(self, times=(), values=()):
+        self.times = np.asarray(times, dtype=np.int64)
+        self.values = np.asarray(values, dtype=np.float64)
+
+    def __len__(self) -> int:
+        return len(self.times)
+
+    def __repr__(self) -> str:
+        return "Series({} points)".format(len(self))
+
+    @classmethod
+    def from_points(cls, points: list[dict]) -> "Series":
+        """
+        Creates a Series from a list of dicts with (at least) "time" and "value" keys,
+        points without value are dropped
+        """
+        points = [point for point in points if point["value"] is not None]
+        return cls(
+            [point["time"] for point in points], [point["value"] for point in points]
+        )
+
+    @classmethod
+    def from_influx(cls, series: dict) -> "Series":
+        """
+        Creates a Series from one of the "series" of an InfluxDB JSON response (queried with epoch="s"):
+        {
+            "columns": ["time", "value", ...],
+            "values": [[time, value, ...], ...],
+        }
+        points without value are dropped
+        """
+        rows = series.get("values") or []
+        time_column = series["columns"].index("time")
+        value_column = series["columns"].index("value")
+
+        times = np.array([row[time_column] for row in rows], dtype=np.int64)
+        # null values are converted to nan
+        values = np.array([row[value_column] for row in rows], dtype=np.float64)
+        has_value = ~np.isnan(values)
+        if has_value.all():
+            return cls(times, values)
+        return cls(times[has_value], values[has_value])
+
+    @classmethod
+    def concat(cls, first: "Series", second: "Series") -> "Series":
+        """
+        Returns the points of `first` followed by the points of `second`
+        """
+        if len(first) == 0:
+            return second
+        return cls(
+            np.concatenate((first.times, second.times)),
+            np.concatenate((first.values, second.values)),
+        )
+
+    @classmethod
+    def of(cls, data) -> "Series":
+        """
+        Returns the given traffic as a Series,
+        TSDB extractors that still return a list of points are converted
+        """
+        if isinstance(data, cls):
+            return data
+        return cls.from_points(data)
+
+    def slice(self, begin: int, end: int) -> "Series":
+        """
+        Returns the points between the `begin` and `end` timestamps (both included)
+        without copying them (the arrays of the returned Series are views of this one)
+        """
+        first = np.searchsorted(self.times, begin, side="left")
+        last = np.searchsorted(self.times, end, side="right")
+        return Series(self.times[first:last], self.values[first:last])
+
+    def after(self, timestamp: int) -> "Series":
+        """
+        Returns the points after the `timestamp` (not included), without copying them
+        """
+        first = np.searchsorted(self.times, timestamp, side="right")
+        return Series(self.times[first:], self.values[first:])
+
+    def step(self) -> int | None:
+        """
+        Returns the spacing between the points (in seconds): the median of the differences
+        between consecutive timestamps, so a few missing points don't change it
+
+        Returns None if there are less than 2 points
+        """
+        if len(self) < 2:
+            return None
+        return int(np.median(np.diff(self.times)))
+
+
+class StreamingStep:
+    """
+    Spacing between the points of a series read in chunks (see Series.step)
+
+    Keeps the count of each difference between consecutive timestamps (including the one
+    between the last point of a chunk and the first point of the next), so the median
+    is the one of the whole series while only a chunk is in memory
+    """
+
+    def __init__(self):
+        self.differences = {}
+        self.last_time = None
+
+    def feed(self, times):
+        """
+        Adds the timestamps of the next chunk
+        """
+        times = np.asarray(times, dtype=np.int64)
+        if len(times) == 0:
+            return
+        if self.last_time is not None:
+            times = np.concatenate(([self.last_time], times))
+        differences, counts = np.unique(np.diff(times), return_counts=True)
+        for difference, count in zip(differences.tolist(), counts.tolist()):
+            self.differences[difference] = self.differences.get(difference, 0) + count
+        self.last_time = int(times[-1])
+
+    def step(self) -> int | None:
+        """
+        Returns the median of the differences fed so far, like Series.step
+
+        Returns None if less than 2 points were fed
+        """
+        total = sum(self.differences.values())
+        if total == 0:
+            return None
+        # the middle differences (the same one if the count is odd)
+        middle = ((total - 1) // 2, total // 2)
+        middle_differences = []
+        seen = 0
+        for difference in sorted(self.differences):
+            seen += self.differences[difference]
+            while len(middle_differences) < 2 and middle[len(middle_differences)] < seen:
+                middle_differences.append(difference)
+        return int(sum(middle_differences) / 2)
@@ -0,0 +1,109 @@
+#!/usr/bin/env python
+# coding=utf-8
+
+import json
+import re
+import sys
+import tempfile
+
+from importlib.machinery import SourceFileLoader
+from importlib.util import module_from_spec, spec_from_loader
+from os import environ
+from os.path import dirname, join
+
+import pytest
+
+ROOT_PATH = dirname(dirname(__file__))
+sys.path.insert(0, ROOT_PATH)
+
+from benchmarks.benchmark import DEFAULT_ENV
+from benchmarks.fakeTsdb import FakeInfluxDBClient, make_links_config
+
+# settings needed to import config.py when there is no .env file
+WORK_PATH = tempfile.mkdtemp(prefix="watcher_tests_")
+for key, value in DEFAULT_ENV.items():
+    environ.setdefault(key, value)
+environ.setdefault("LINKS_INFO_FILE", join(WORK_PATH, "links.json"))
+environ.setdefault("REPORT_OUTPUT_PATH", WORK_PATH)
+environ.setdefault("LOG_FILE", join(WORK_PATH, "watcher.log"))
+environ.setdefault("API_USER", "watcher")
+environ.setdefault("API_PASS", "watcher")
+
+
+class FlakyInfluxDBClient(FakeInfluxDBClient):
+    """
+    FakeInfluxDBClient whose queries of the hostnames in `failing_hosts` fail, like a TSDB outage
+
+    The hostnames of every query are added to `queried_hosts`
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.failing_hosts = set()
+        self.queried_hosts = set()
+
+    def query(self, query: str, *args, **kwargs):
+        hostnames = set(re.findall(r"\"hostname\" = '([^']+)'", query))
+        self.queried_hosts.update(hostnames)
+        if hostnames & self.failing_hosts:
+            raise ConnectionError("the TSDB is down")
+        return super().query(query, *args, **kwargs)
+
+
+@pytest.fixture
+def influx_extractor():
+    """
+    returns the TsdbExtractor class of tsdb/TsdbExtractor.influx.sample
+    """
+    loader = SourceFileLoader(
+        "influxTsdbExtractor", join(ROOT_PATH, "tsdb", "TsdbExtractor.influx.sample")
+    )
+    module = module_from_spec(spec_from_loader(loader.name, loader))
+    loader.exec_module(module)
+    return module.TsdbExtractor
+
+
+@pytest.fixture
+def tsdb_client(monkeypatch, tmp_path, influx_extractor) -> FlakyInfluxDBClient:
+    """
+    makes the watcher and alert modes use the influx TsdbExtractor (tsdb/TsdbExtractor.influx.sample)
+    connected to a FlakyInfluxDBClient, with its series cache in a temporary directory
+
+    returns the client
+    """
+    import alert
+    import influxdb
+    import watcher
+
+    client = FlakyInfluxDBClient()
+    monkeypatch.setattr(influxdb, "InfluxDBClient", lambda *args, **kwargs: client)
+    monkeypatch.setattr(watcher, "TsdbExtractor", influx_extractor)
+    monkeypatch.setattr(alert, "TsdbExtractor", influx_extractor)
+    monkeypatch.setattr(watcher, "SERIES_CACHE_PATH", str(tmp_path / "cache"))
+    return client
+
+
+@pytest.fixture
+def links_file(tmp_path) -> str:
+    """
+    writes the config of 4 fake links (LINK-00001 rx and LINK-00002 tx are congested) and returns its path
+    """
+    file_path = tmp_path / "links.json"
+    file_path.write_text(json.dumps(make_links_config(4)))
+    return str(file_path)
+
+
+@pytest.fixture
+def run_watcher(monkeypatch):
+    """
+    returns a function running watcher.py with the given arguments
+    """
+    import watcher
+
+    def run(*args: str):
+        monkeypatch.setattr(sys, "argv", ["watcher.py", *args])
+        with pytest.raises(SystemExit) as exit_info:
+            watcher.main()
+        assert exit_info.value.code == 0
+
+    return run
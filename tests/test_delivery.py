@@ -0,0 +1,78 @@
+#!/usr/bin/env python
+# coding=utf-8
+
+import json
+import threading
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from delivery.delivery import ApiDelivery
+
+INTERVAL = {"link_slug": "LINK-00001", "interface": "rx", "exceeded_time": 15}
+
+
+class ApiHandler(BaseHTTPRequestHandler):
+    """
+    Answers every post with the server `status`, keeping the received json bodies
+    """
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers["Content-Length"]))
+        self.server.received.append(json.loads(body))
+        self.send_response(self.server.status)
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def api_server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), ApiHandler)
+    server.received = []
+    server.status = 201
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def deliver(api_server, spool_path, intervals: list, batch_size: int = 1):
+    delivery = ApiDelivery(
+        "http://127.0.0.1:{}/watcher/interval/".format(api_server.server_address[1]),
+        senders=1,
+        batch_size=batch_size,
+        spool_path=str(spool_path),
+    )
+    for interval in intervals:
+        delivery.send(interval)
+    delivery.close()
+
+
+def test_one_interval_is_posted_per_request(api_server, tmp_path):
+    deliver(api_server, tmp_path, [INTERVAL, INTERVAL])
+    assert api_server.received == [INTERVAL, INTERVAL]
+
+    api_server.received.clear()
+    deliver(api_server, tmp_path, [INTERVAL, INTERVAL], batch_size=10)
+    assert api_server.received == [[INTERVAL, INTERVAL]]
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_only_the_intervals_that_may_be_sent_later_are_resent(api_server, tmp_path):
+    api_server.status = 503
+    deliver(api_server, tmp_path, [INTERVAL])
+    assert len(list(tmp_path.glob("intervals_*.json"))) == 1
+
+    # resent on the next run, and rejected by the api
+    api_server.status = 400
+    deliver(api_server, tmp_path, [])
+    assert list(tmp_path.glob("intervals_*.json")) == []
+    assert len(list(tmp_path.glob("rejected_*.json"))) == 1
+
+    # never sent again
+    api_server.received.clear()
+    deliver(api_server, tmp_path, [])
+    assert api_server.received == []
@@ -0,0 +1,233 @@
+#!/usr/bin/env python
+# coding=utf-8
+
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+import zulu
+
+from pytz import timezone as tz
+
+from config import OUTPUT_TIMEZONE
+from reportManipulator.reportManipulator import ReportManipulator
+from series.series import Series
+from watcher import check_link_data
+
+LINK_NAME = "LINK-00000"
+LINK_SPEED = 1000000000
+# 2026-03-02T00:00:00Z, the points are 5 minutes apart
+FIRST_POINT_TIME = 1772409600
+
+
+def baseline_check_interval_size(
+    data: list[dict],
+    current_link_name: str,
+    current_link_config: dict,
+    reports: dict,
+    iface: str,
+    i: int,
+):
+    """
+    check_interval_size of watcher.py before detect_exceeded_intervals
+    """
+    if i >= len(data):
+        return len(data)
+
+    interval_counter = len(reports[current_link_name][iface]["intervals"]) + 1
+    current_timezone_offset = (
+        datetime.now(tz(OUTPUT_TIMEZONE)).utcoffset().total_seconds() / 3600
+    )
+
+    point_dt = zulu.parse(data[i - 1]["time"])
+    time_begin = point_dt + timedelta(hours=current_timezone_offset)
+    time_begin = time_begin.format("%d/%m/%y-%H:%M:%S")
+
+    max_value = data[i]["value"] * 8
+    min_value = max_value
+    limit_speed = (
+        current_link_config["LINK_SPEED"]
+        * current_link_config["LINK_MAX_TRAFFIC_PERCENTAGE"]
+    )
+    limit_speed_histeresys = limit_speed * current_link_config["LINK_HISTERESYS"]
+    limit_speed_accounting_for_histeresys = limit_speed - limit_speed_histeresys
+
+    exceeded_points = 0
+    while (i < len(data)) and (
+        data[i]["value"] * 8 >= limit_speed_accounting_for_histeresys
+    ):
+        current_point_value = data[i]["value"] * 8
+        if current_point_value > max_value:
+            max_value = current_point_value
+        if current_point_value < min_value:
+            min_value = current_point_value
+        exceeded_points += 1
+        i += 1
+
+    exceeded_time = exceeded_points * 5
+
+    if exceeded_points == 0:
+        return i
+
+    if i >= len(data):
+        i -= 1
+
+    point_dt = zulu.parse(data[i]["time"])
+    time_end = point_dt + timedelta(hours=current_timezone_offset)
+    time_end = time_end.format("%d/%m/%y-%H:%M:%S")
+
+    mean_value = round((min_value + max_value) / 2, 1)
+    if (mean_value >= 6 * limit_speed) or ("e" in str(mean_value)):
+        return i
+
+    report_manipulator = ReportManipulator()
+    report_manipulator.add_interval_to_report(
+        reports[current_link_name][iface],
+        time_begin,
+        time_end,
+        interval_counter,
+        exceeded_time,
+    )
+    return i
+
+
+def baseline_check_link_data(
+    data: list[dict],
+    reports: dict,
+    current_link_name: str,
+    current_link_config: dict,
+    iface: str,
+):
+    """
+    check_link_data of watcher.py before detect_exceeded_intervals
+    """
+    if len(data) == 0:
+        return
+
+    i = 0
+    while i < len(data):
+        traffic_value_in_bits = data[i]["value"] * 8
+        traffic_limit_in_bits = (
+            current_link_config["LINK_SPEED"]
+            * current_link_config["LINK_MAX_TRAFFIC_PERCENTAGE"]
+        )
+        if traffic_value_in_bits >= traffic_limit_in_bits:
+            i = baseline_check_interval_size(
+                data,
+                current_link_name,
+                current_link_config,
+                reports,
+                iface,
+                i + 1,
+            )
+        i += 1
+
+
+def link_config(percentage: float, histeresys: float) -> dict:
+    return {
+        "LINK_SPEED": LINK_SPEED,
+        "LINK_MAX_TRAFFIC_PERCENTAGE": percentage,
+        "LINK_HISTERESYS": histeresys,
+    }
+
+
+def baseline_points(values: list) -> list[dict]:
+    """
+    returns the points of the given values as the TSDB used to return them (with RFC3339 times)
+    """
+    return [
+        {
+            "time": zulu.parse(FIRST_POINT_TIME + i * 300).isoformat(),
+            "value": value,
+        }
+        for i, value in enumerate(values)
+    ]
+
+
+def link_data(values: list):
+    """
+    returns the given values in the format read by check_link_data
+    """
+    return Series(FIRST_POINT_TIME + np.arange(len(values)) * 300, values)
+
+
+def assert_same_report(values: list, current_link_config: dict):
+    reports = {LINK_NAME: {"rx": {"intervals": {}, "total_exceeded": 0}}}
+    baseline_reports = {LINK_NAME: {"rx": {"intervals": {}, "total_exceeded": 0}}}
+    check_link_data(link_data(values), reports, LINK_NAME, current_link_config, "rx")
+    baseline_check_link_data(
+        baseline_points(values), baseline_reports, LINK_NAME, current_link_config, "rx"
+    )
+    assert reports == baseline_reports, values
+
+
+def random_series(
+    rng: np.random.Generator, limit_speed: float, histeresys_limit: float
+):
+    """
+    returns random traffic (in bytes) around the limits, with points exactly at them,
+    spikes and runs of a single point
+    """
+    points = int(rng.integers(0, 60))
+    edges = np.array(
+        [
+            0.0,
+            histeresys_limit / 8,
+            np.nextafter(histeresys_limit / 8, 0),
+            limit_speed / 8,
+            np.nextafter(limit_speed / 8, 0),
+            limit_speed / 8 * 10,
+            limit_speed / 8 * 12,
+            1e16,
+        ]
+    )
+    values = rng.uniform(0.5, 1.2, points) * limit_speed / 8
+    at_edges = rng.random(points) < 0.4
+    values[at_edges] = rng.choice(edges, int(at_edges.sum()))
+    if rng.random() < 0.3:
+        values = np.round(values)
+    return values.tolist()
+
+
+@pytest.mark.parametrize(
+    "values",
+    [
+        [],
+        [1.0],
+        [100000000.0],
+        [100000000.0, 100000000.0],
+        [100000000.0, 0.0, 100000000.0],
+        [0.0, 100000000.0, 95000000.0],
+        [100000000.0, 95000000.0, 0.0, 100000000.0, 95000000.0],
+        [100000000.0, 1000000000.0, 1000000000.0, 0.0],
+        # spikes: the mean of the interval is above 6 times the limit
+        [0.0, 100000000.0, 1500000000.0, 0.0],
+        [0.0, 100000000.0, 1200000000.0, 100000000.0, 0.0, 100000000.0, 100000000.0],
+        # spike whose mean is written with an exponent
+        [0.0, 100000000.0, 1e16, 1e16, 0.0],
+        [100000000.0, 1e16],
+    ],
+)
+def test_check_link_data_matches_the_loop_on_edge_cases(values):
+    assert_same_report(values, link_config(0.8, 0.05))
+
+
+@pytest.mark.parametrize(
+    "percentage, histeresys", [(0.8, 0.05), (0.8, 0.0), (0.5, 0.3), (1.0, 1.0)]
+)
+def test_check_link_data_matches_the_loop_on_random_series(percentage, histeresys):
+    current_link_config = link_config(percentage, histeresys)
+    limit_speed = LINK_SPEED * percentage
+    histeresys_limit = limit_speed - limit_speed * histeresys
+    rng = np.random.default_rng(5)
+    for _ in range(500):
+        assert_same_report(
+            random_series(rng, limit_speed, histeresys_limit), current_link_config
+        )
+
+
+def test_check_link_data_matches_the_loop_on_means_with_an_exponent():
+    # the means are below 6 times the limit, but written with an exponent
+    current_link_config = link_config(0.8, 0.05)
+    current_link_config["LINK_SPEED"] = 10**17
+    assert_same_report([0.0, 1e16, 1.1e16, 0.0, 1e16, 1e16], current_link_config)
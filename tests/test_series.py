@@ -0,0 +1,22 @@
+#!/usr/bin/env python
+# coding=utf-8
+
+import numpy as np
+
+from series.series import Series, StreamingStep
+
+
+def test_streaming_step_is_the_step_of_the_whole_series():
+    rng = np.random.default_rng(19)
+    for _ in range(500):
+        # 5 minute points with missing points and a few irregular ones
+        differences = rng.choice(
+            [60, 300, 300, 300, 600, 900], int(rng.integers(0, 40))
+        )
+        times = 1772409600 + np.cumsum(differences)
+        series = Series(times, np.zeros(len(times)))
+
+        streaming_step = StreamingStep()
+        for chunk_times in np.array_split(times, int(rng.integers(1, 10))):
+            streaming_step.feed(chunk_times)
+        assert streaming_step.step() == series.step(), times
@@ -0,0 +1,40 @@
+#!/usr/bin/env python
+# coding=utf-8
+
+from datetime import datetime, timezone
+
+from cache import seriesCache
+from cache.seriesCache import SeriesCache
+from dateManipulator.dateManipulator import DateManipulator
+
+
+class LateEveningDatetime(datetime):
+    """
+    datetime whose now() is 2026-03-02 22:00 in America/Sao_Paulo (2026-03-03 01:00 UTC)
+    """
+
+    @classmethod
+    def now(cls, tz=None):
+        now = datetime(2026, 3, 3, 1, 0, tzinfo=timezone.utc)
+        if tz is None:
+            # the local time of a container in UTC
+            return now.replace(tzinfo=None)
+        return now.astimezone(tz)
+
+
+def test_day_in_progress_is_not_closed(monkeypatch, tmp_path):
+    monkeypatch.setattr(seriesCache, "datetime", LateEveningDatetime)
+    cache = SeriesCache(str(tmp_path), 1024 * 1024)
+
+    date_manipulator = DateManipulator()
+    assert not cache.is_closed(date_manipulator.convert_to_epoch("2026-03-02 23:59:59"))
+    assert cache.is_closed(date_manipulator.convert_to_epoch("2026-03-01 23:59:59"))
+
+
+def test_window_of_a_day_in_progress_is_not_past(monkeypatch):
+    from dateManipulator import dateManipulator
+
+    monkeypatch.setattr(dateManipulator, "datetime", LateEveningDatetime)
+    date_manipulator = DateManipulator()
+    assert not date_manipulator.get_day_window("2026-03-02").is_past()
+    assert date_manipulator.get_day_window("2026-03-01").is_past()
@@ -0,0 +1,112 @@
+#!/usr/bin/env python
+# coding=utf-8
+
+import json
+import threading
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import msgpack
+import pytest
+
+from dateManipulator.dateManipulator import DateManipulator
+
+# 2026-03-02T00:00:00Z, the points are 5 minutes apart
+FIRST_POINT_TIME = 1772409600
+
+
+def influx_chunk(times: range) -> dict:
+    """
+    returns a chunk of a chunked InfluxDB response with a point at each of the given times
+    """
+    return {
+        "results": [
+            {
+                "statement_id": 0,
+                "series": [
+                    {
+                        "name": "check_iface_traffic",
+                        "columns": ["time", "value"],
+                        "values": [[time, 1000.0] for time in times],
+                    }
+                ],
+                "partial": True,
+            }
+        ]
+    }
+
+
+def json_line(chunk: dict) -> bytes:
+    """
+    returns the JSON line of a chunk, padded to the 512 bytes read at a time by the client
+    """
+    line = json.dumps(chunk).encode()
+    return line + b" " * (-(len(line) + 1) % 512) + b"\n"
+
+
+class ChunkedInfluxHandler(BaseHTTPRequestHandler):
+    """
+    Answers every query with 3 chunks of 10 points, like InfluxDB:
+    a JSON line per chunk, or the msgpack of every chunk if the client accepts msgpack.
+    The last chunks are only sent once the first one is read (or after 2 seconds)
+    """
+
+    chunks = [
+        influx_chunk(
+            range(FIRST_POINT_TIME + i * 3000, FIRST_POINT_TIME + (i + 1) * 3000, 300)
+        )
+        for i in range(3)
+    ]
+
+    def do_GET(self):
+        self.send_response(200)
+        if self.headers.get("Accept") == "application/x-msgpack":
+            self.send_header("Content-Type", "application/x-msgpack")
+            self.end_headers()
+            for chunk in self.chunks:
+                self.wfile.write(msgpack.packb(chunk))
+            return
+
+        self.send_header("Content-Type", "application/json")
+        self.end_headers()
+        self.wfile.write(json_line(self.chunks[0]))
+        self.wfile.flush()
+        self.server.streamed = self.server.first_chunk_read.wait(2)
+        for chunk in self.chunks[1:]:
+            self.wfile.write(json_line(chunk))
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def influx_server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), ChunkedInfluxHandler)
+    server.first_chunk_read = threading.Event()
+    server.streamed = False
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def test_chunked_response_is_streamed(influx_extractor, influx_server):
+    tsdb_extractor = influx_extractor()
+    # a client with the default headers, connected to the fake server
+    db_client = tsdb_extractor.connect(
+        "127.0.0.1", influx_server.server_address[1], "user", "pass", "db"
+    )
+    window = DateManipulator().get_day_window("2026-03-02")
+
+    chunks = []
+    for chunk in tsdb_extractor.iter_iface_traffic(
+        "LINK-00000", "rx", db_client, 10, window
+    ):
+        assert chunk is not None
+        chunks.append(chunk)
+        influx_server.first_chunk_read.set()
+
+    assert [len(chunk) for chunk in chunks] == [10, 10, 10]
+    assert chunks[-1].times[-1] == FIRST_POINT_TIME + 29 * 300
+    # the first chunk was read before the server sent the others
+    assert influx_server.streamed
@@ -0,0 +1,281 @@
+#!/usr/bin/env python
+# coding=utf-8
+
+import json
+
+from os import environ
+
+import numpy as np
+import pytest
+
+# a closed day, so its traffic is cached and its report is recorded as complete
+DAY = "2026-03-02"
+LINKS = ["LINK-00000", "LINK-00001", "LINK-00002", "LINK-00003"]
+
+
+def read_reports(output_path) -> dict:
+    """
+    returns the json reports written to `output_path` ({file name: report})
+    """
+    return {
+        file.name: json.loads(file.read_text())
+        for file in sorted(output_path.glob("reports_*.json"))
+    }
+
+
+def watcher_args(links_file: str, output_path, *flags: str) -> list:
+    """
+    returns the arguments of a watcher run checking DAY, creating its output directory
+    """
+    output_path.mkdir(exist_ok=True)
+    return [
+        "watcher",
+        "-f",
+        links_file,
+        "-o",
+        str(output_path),
+        "--date-begin",
+        DAY,
+        "--date-end",
+        DAY,
+        *flags,
+    ]
+
+
+def test_failed_fetch_is_not_cached(tsdb_client, links_file, run_watcher, tmp_path):
+    run_watcher(*watcher_args(links_file, tmp_path / "reference", "--no-cache"))
+    reference = read_reports(tmp_path / "reference")
+    assert reference["reports_02-03-26.json"]["LINK-00001"]["rx"]["total_exceeded"] > 0
+
+    # the TSDB is down on the first run, then the day is checked again
+    for flags in ([], ["--bulk"], ["--range-fetch"]):
+        output_path = tmp_path / "reports{}".format("".join(flags))
+        tsdb_client.failing_hosts = set(LINKS)
+        run_watcher(*watcher_args(links_file, output_path, *flags))
+        tsdb_client.failing_hosts = set()
+        run_watcher(*watcher_args(links_file, output_path, "--force", *flags))
+        assert read_reports(output_path) == reference
+
+
+def test_failed_day_is_checked_again(tsdb_client, links_file, run_watcher, tmp_path):
+    run_watcher(*watcher_args(links_file, tmp_path / "reference", "--no-cache"))
+    reference = read_reports(tmp_path / "reference")
+
+    for flags in ([], ["--bulk"], ["--stream"]):
+        output_path = tmp_path / "reports{}".format("".join(flags))
+        tsdb_client.failing_hosts = {"LINK-00001"}
+        run_watcher(*watcher_args(links_file, output_path, "--no-cache", *flags))
+        assert read_reports(output_path) != reference
+
+        # the day isn't complete, only the failed link is queried again
+        tsdb_client.failing_hosts = set()
+        tsdb_client.queried_hosts.clear()
+        run_watcher(*watcher_args(links_file, output_path, "--no-cache", *flags))
+        assert read_reports(output_path) == reference
+        if "--bulk" not in flags:
+            assert tsdb_client.queried_hosts == {"LINK-00001"}
+
+        # the day is complete
+        tsdb_client.queried_hosts.clear()
+        run_watcher(*watcher_args(links_file, output_path, "--no-cache", *flags))
+        assert read_reports(output_path) == reference
+        assert tsdb_client.queried_hosts == set()
+        assert not (output_path / "manifests").exists()
+
+
+def alert_args(links_file: str, reports_path, *flags: str) -> list:
+    """
+    returns the arguments of an alert of DAY
+    """
+    return [
+        "alert",
+        "-d",
+        str(reports_path),
+        "-f",
+        links_file,
+        "--date-begin",
+        DAY,
+        "--date-end",
+        DAY,
+        *flags,
+    ]
+
+
+def test_downsample_is_given_with_the_window(
+    tsdb_client, links_file, run_watcher, tmp_path, monkeypatch
+):
+    from alert.Alerta import Alerta
+
+    monkeypatch.setattr(Alerta, "send_alert", lambda self: None)
+    run_watcher(*watcher_args(links_file, tmp_path / "reference", "--no-cache"))
+    reference = read_reports(tmp_path / "reference")
+
+    run_watcher(
+        *watcher_args(links_file, tmp_path / "downsampled", "--downsample", "1h")
+    )
+    assert read_reports(tmp_path / "downsampled") != reference
+
+    # the next runs of the same process query the raw points
+    assert "QUERY_DOWNSAMPLE" not in environ
+    (tmp_path / "healed").mkdir()
+    run_watcher(*alert_args(links_file, tmp_path / "healed", "--heal"))
+    assert read_reports(tmp_path / "healed") == reference
+
+
+def test_heal_only_creates_queried_days(
+    tsdb_client, links_file, run_watcher, tmp_path, monkeypatch
+):
+    from alert.Alerta import Alerta
+
+    missing_reports_messages = []
+    monkeypatch.setattr(
+        Alerta,
+        "send_alert",
+        lambda self: missing_reports_messages.append(self.missing_reports_message),
+    )
+    run_watcher(*watcher_args(links_file, tmp_path / "reference", "--no-cache"))
+    reference = read_reports(tmp_path / "reference")
+
+    output_path = tmp_path / "reports"
+    output_path.mkdir()
+    # the day can't be created while the TSDB is down, so it's still missing
+    tsdb_client.failing_hosts = {"LINK-00001"}
+    run_watcher(*alert_args(links_file, output_path, "--heal"))
+    assert read_reports(output_path) == {}
+    assert "02-03-26" in missing_reports_messages[-1]
+
+    tsdb_client.failing_hosts = set()
+    run_watcher(*alert_args(links_file, output_path, "--heal"))
+    assert read_reports(output_path) == reference
+    assert missing_reports_messages[-1] == ""
+
+
+def test_stream_matches_the_default_mode_with_any_chunk_size(
+    tsdb_client, links_file, run_watcher, tmp_path, monkeypatch
+):
+    import watcher
+
+    run_watcher(*watcher_args(links_file, tmp_path / "reference", "--no-cache"))
+    reference = read_reports(tmp_path / "reference")
+
+    # chunks of a single point, and chunks that don't split the day evenly
+    for chunk_size in (1, 7):
+        monkeypatch.setattr(watcher, "TSDB_CHUNK_SIZE", chunk_size)
+        output_path = tmp_path / "stream{}".format(chunk_size)
+        run_watcher(*watcher_args(links_file, output_path, "--no-cache", "--stream"))
+        assert read_reports(output_path) == reference
+
+
+def test_other_interfaces_are_not_merged(
+    tsdb_client, links_file, run_watcher, tmp_path
+):
+    run_watcher(*watcher_args(links_file, tmp_path / "reference", "--no-cache"))
+    reference = read_reports(tmp_path / "reference")
+
+    # the congested link also reports the traffic of a second interface and of another switch
+    tsdb_client.interfaces = {
+        "LINK-00001": [("ge-0/0/1.0", "RT-LINK-00001"), ("ge-0/0/0.0", "RT-LINK-00002")]
+    }
+    for flags in (
+        [],
+        ["--bulk"],
+        ["--stream"],
+        ["--tsdb-percentile"],
+        ["--bulk", "--tsdb-percentile"],
+    ):
+        output_path = tmp_path / "reports{}".format("".join(flags))
+        run_watcher(*watcher_args(links_file, output_path, "--no-cache", *flags))
+        assert read_reports(output_path) == reference
+
+
+def test_incremental_runs_only_add_the_new_points_to_the_percentile(
+    tsdb_client, links_file, run_watcher, tmp_path, monkeypatch
+):
+    import watcher
+
+    from benchmarks.fakeTsdb import generate_values, make_links_config
+    from percentile.percentile import calculate_percentile, PercentileSketch
+    from series.series import Series
+
+    run_watcher(*watcher_args(links_file, tmp_path / "reference", "--no-cache"))
+    reference = read_reports(tmp_path / "reference")["reports_02-03-26.json"]
+
+    queries = []
+    query = tsdb_client.query
+    monkeypatch.setattr(
+        tsdb_client,
+        "query",
+        lambda *args, **kwargs: queries.append(args[0]) or query(*args, **kwargs),
+    )
+    output_path = tmp_path / "incremental"
+    for _ in range(2):
+        run_watcher(*watcher_args(links_file, output_path, "--incremental"))
+    assert queries and not any("PERCENTILE" in query for query in queries)
+    report = read_reports(output_path)["reports_02-03-26.json"]
+    for link_name in LINKS:
+        for iface in ("rx", "tx"):
+            assert report[link_name][iface]["percentile"] == pytest.approx(
+                reference[link_name][iface]["percentile"], rel=0.01
+            )
+
+    # the points of the day checked in 3 runs
+    times = 1772445600 + 300 * np.arange(120)
+    data = Series(times, generate_values("LINK-00001", "rx", times))
+    link_report = {"LINK-00001": watcher.create_link_report()}
+    link_checkpoint = {}
+    for new_points in np.array_split(np.arange(len(data)), 3):
+        fetched = {
+            iface: {
+                "data": Series(data.times[new_points], data.values[new_points]),
+                "percentile": None,
+            }
+            for iface in ("rx", "tx")
+        }
+        link_checkpoint = watcher.update_link_report(
+            "LINK-00001",
+            make_links_config(2)["LINK-00001"],
+            fetched,
+            link_report,
+            link_checkpoint,
+        )
+    assert (
+        PercentileSketch.from_dict(link_checkpoint["rx"]["percentile_sketch"]).buckets
+        == PercentileSketch.from_values(data.values * 8).buckets
+    )
+    assert link_report["LINK-00001"]["rx"]["percentile"] == pytest.approx(
+        calculate_percentile(data, watcher.PERCENTILE), rel=0.01
+    )
+
+
+def test_extractors_without_the_window_parameter_still_work(
+    tsdb_client, influx_extractor, links_file, run_watcher, tmp_path, monkeypatch
+):
+    import watcher
+
+    def two_days_args(output_path, *flags: str) -> list:
+        args = watcher_args(links_file, output_path, "--no-cache", *flags)
+        args[args.index("--date-end") + 1] = "2026-03-03"
+        return args
+
+    run_watcher(*two_days_args(tmp_path / "reference", "--parallel-days", "2"))
+    reference = read_reports(tmp_path / "reference")
+    assert len(reference) == 2
+
+    # an extractor written before the window parameter, reading the date range from the environment
+    class LegacyTsdbExtractor(influx_extractor):
+        def query_iface_traffic(self, current_link_name, iface, db_client):
+            return super().query_iface_traffic(current_link_name, iface, db_client)
+
+        def query_links_traffic(self, link_names, db_client):
+            return super().query_links_traffic(link_names, db_client)
+
+        def iter_iface_traffic(self, current_link_name, iface, db_client, chunk_size):
+            return super().iter_iface_traffic(
+                current_link_name, iface, db_client, chunk_size
+            )
+
+    monkeypatch.setattr(watcher, "TsdbExtractor", LegacyTsdbExtractor)
+    for flags in ([], ["--bulk"], ["--stream"]):
+        output_path = tmp_path / "legacy{}".format("".join(flags))
+        run_watcher(*two_days_args(output_path, "--parallel-days", "2", *flags))
+        assert read_reports(output_path) == reference
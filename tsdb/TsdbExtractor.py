@@ -1,15 +1,28 @@
 #!/usr/bin/env python
 # coding=utf-8
 
+from __future__ import annotations
+
 from pprint import pprint
 from datetime import datetime, timedelta
 from pytz import timezone as tz
 from logging import getLogger
 from os import environ
+from typing import TYPE_CHECKING
 
 from tsdb import Tsdb
-from influxdb import InfluxDBClient
-from config import LOGGER_NAME, OUTPUT_TIMEZONE, TSDB_TIME_FORMAT, PERCENTILE
+from series.series import Series
+from dateManipulator.dateManipulator import TimeWindow
+from config import (
+    LOGGER_NAME,
+    OUTPUT_TIMEZONE,
+    TSDB_TIME_FORMAT,
+    PERCENTILE,
+    TSDB_GZIP,
+)
+
+if TYPE_CHECKING:
+    from influxdb import InfluxDBClient
 
 logger = getLogger("watcher")
 
@@ -26,40 +39,56 @@ class TsdbExtractor(Tsdb):
             "host": host,
             "port": port,
         }
+        # influxdb (and requests) are only imported when connecting
+        from influxdb import InfluxDBClient
+
         try:
-            client = InfluxDBClient(**auth, retries=2, timeout=10)
+            # a single try: the requests are retried (with jittered backoff)
+            # by the http adapter of the TsdbSession (tsdb/tsdbSession.py)
+            client = InfluxDBClient(**auth, retries=1, timeout=10, gzip=TSDB_GZIP)
         except Exception as e:
             logger.error("error connecting to influxdb: %s", e)
             return exit(1)
         return client
 
     def query_iface_traffic(
-        self, current_link_name: str, iface: str, db_client: InfluxDBClient
-    ) -> list:
+        self,
+        current_link_name: str,
+        iface: str,
+        db_client: InfluxDBClient,
+        window: TimeWindow = None,
+    ) -> Series:
         """
-        query TSDB for a given host interface (rx|tx) traffic with a set time range
+        query TSDB for a given host interface (rx|tx) traffic in the given time window
 
         Params:
         - current_link_name: current link name
         - iface: interface name (rx|tx)
         - db_client: tsdb client object
+        - window: TimeWindow to query (see Tsdb.get_window). Extractors without this parameter
+          still work, reading the date range from the environment (see tsdb.call_with_window)
 
         Returns:
 
-        Should return a list of dicts with AT LEAST these key:value pairs:
+        Should return a Series (series/series.py) with the points ordered by time:
+        - times: epoch timestamps (in seconds, UTC)
+        - values: traffic values
+
+        A list of dicts with AT LEAST these key:value pairs is also accepted (and converted to a Series):
 
         [
             {
-                "time": timestamp,
+                "time": epoch timestamp (in seconds, UTC),
                 "value": value in bits
             },
         ]
 
-        If no data is found, returns an empty list
+        If no data is found, returns an empty Series
+        If the query fails, returns None
 
         """
 
-        data = []
+        data = Series()
 
         return data
 
@@ -1,6 +1,38 @@
 #!/usr/bin/env python
 # coding=utf-8
 
+from inspect import signature
+from os import environ
+
+from series.series import Series
+from dateManipulator.dateManipulator import TimeWindow
+
+
+def accepts_window(method) -> bool:
+    """
+    returns whether the given query method of a TSDB extractor takes the `window` parameter
+    """
+    return any(
+        parameter.name == "window" or parameter.kind == parameter.VAR_KEYWORD
+        for parameter in signature(method).parameters.values()
+    )
+
+
+def call_with_window(method, *args, window: TimeWindow = None):
+    """
+    calls the given traffic query method of a TSDB extractor in the given time window
+
+    extractors written before the `window` parameter read the date range from the
+    QUERY_DATE_BEGIN and QUERY_DATE_END environment variables, so they're set to the window instead
+    (and the days can't be checked at the same time, see `Tsdb.accepts_windows`)
+    """
+    if accepts_window(method):
+        return method(*args, window=window)
+    if window is not None:
+        environ["QUERY_DATE_BEGIN"] = window.begin
+        environ["QUERY_DATE_END"] = window.end
+    return method(*args)
+
 
 class Tsdb:
     def connect(self):
@@ -9,9 +41,11 @@ class Tsdb:
         """
         raise (NotImplementedError)
 
-    def query_iface_traffic(link_configs: dict, iface: str, client) -> list:
+    def query_iface_traffic(
+        link_configs: dict, iface: str, client, window: TimeWindow = None
+    ) -> Series:
         """
-        query TSDB for a given host interface (rx|tx) traffic with a set time range
+        query TSDB for a given host interface (rx|tx) traffic in the given time window
 
         Params:
         - link_configs: dict with the following format:
@@ -25,19 +59,25 @@ class Tsdb:
             }
         - iface: interface name (rx|tx)
         - db_client: tsdb client object
+        - window: TimeWindow (dateManipulator/dateManipulator.py) to query, see `get_window`
 
         Returns:
 
-        Should return a list of dicts with AT LEAST these key:value pairs:
+        Should return a Series (series/series.py) with the points ordered by time:
+        - times: epoch timestamps (in seconds, UTC)
+        - values: traffic values
+
+        A list of dicts with AT LEAST these key:value pairs is also accepted (and converted to a Series):
 
         [
             {
-                "time": timestamp,
+                "time": epoch timestamp (in seconds, UTC),
                 "value": value in bits
             },
         ]
 
-        If no data is found, returns an empty list
+        If no data is found, returns an empty Series
+        If the query fails, returns None (so the failed traffic is never taken as a day without data)
 
         """
         raise (NotImplementedError)
@@ -56,3 +96,149 @@ class Tsdb:
 
         """
         raise (NotImplementedError)
+
+    def iter_iface_traffic(
+        self,
+        current_link_name: str,
+        iface: str,
+        db_client,
+        chunk_size: int,
+        window: TimeWindow = None,
+    ):
+        """
+        query TSDB for a given host interface (rx|tx) traffic in the given time window, in chunks
+        (used by the watcher --stream mode, so the whole traffic is never in memory)
+
+        Params:
+        - current_link_name: current link name
+        - iface: interface name (rx|tx)
+        - db_client: tsdb client object
+        - chunk_size: max number of points of each chunk
+        - window: TimeWindow to query, see `get_window`
+
+        Returns:
+
+        Should yield Series in the format returned by `query_iface_traffic`, with up to `chunk_size` points each
+        and ordered by time (the first point of a chunk comes after the last point of the previous one).
+        If the query fails, None is yielded and the traffic ends
+
+        The default implementation yields the whole traffic returned by `query_iface_traffic` as a single chunk,
+        override it if your TSDB can stream its responses
+        """
+        data = call_with_window(
+            self.query_iface_traffic, current_link_name, iface, db_client, window=window
+        )
+        yield None if data is None else Series.of(data)
+
+    def get_window(self, window: TimeWindow = None) -> TimeWindow:
+        """
+        returns the time window of a traffic query: the given `window`
+        or, if None, the date range given to the watcher (QUERY_DATE_BEGIN and QUERY_DATE_END environment variables)
+
+        The watcher always gives the window of the day being checked,
+        since many days may be checked at the same time (--parallel-days)
+        """
+        if window is not None:
+            return window
+        return TimeWindow.from_environ()
+
+    def accepts_windows(self) -> bool:
+        """
+        returns whether the traffic queries take the `window` parameter
+
+        Extractors written before it read the date range from the environment variables,
+        so the watcher checks their days one at a time (see `call_with_window`)
+        """
+        return all(
+            accepts_window(getattr(self, name))
+            for name in (
+                "query_iface_traffic",
+                "query_links_traffic",
+                "iter_iface_traffic",
+            )
+        )
+
+    def get_downsampling(self, window: TimeWindow = None) -> tuple | None:
+        """
+        returns the aggregation of the traffic queried in the given time window (see `get_window`),
+        requested with the --downsample flag of the watcher mode, as a tuple:
+        - bucket: duration of each bucket, like 30s, 5m or 1h
+        - function: max or mean
+
+        or None if the raw points must be returned
+
+        When downsampling, `query_iface_traffic` and `query_links_traffic` should return one point per bucket
+        (the aggregated value of its points, at the start of the bucket), e.g. `GROUP BY time(5m)` in InfluxDB
+        """
+        return self.get_window(window).downsampling
+
+    def query_links_traffic(
+        self, link_names: list, db_client, window: TimeWindow = None
+    ) -> dict:
+        """
+        query TSDB for the rx and tx traffic of many links at once in the given time window
+
+        Params:
+        - link_names: list with the names of the links
+        - db_client: tsdb client object
+        - window: TimeWindow to query, see `get_window`
+
+        Returns:
+
+        Should return a dict with the points of each link and interface,
+        in the format returned by `query_iface_traffic`:
+
+        {
+            LINK_NAME: {
+                "rx": rx Series,
+                "tx": tx Series,
+            },
+        }
+
+        The Series of the failed queries are None
+
+        The default implementation queries each link and interface with `query_iface_traffic`,
+        override it if your TSDB can return every link in a single query
+        """
+        data = {}
+        for link_name in link_names:
+            data[link_name] = {
+                iface: call_with_window(
+                    self.query_iface_traffic, link_name, iface, db_client, window=window
+                )
+                for iface in ("rx", "tx")
+            }
+        return data
+
+    def query_links_percentile(
+        self,
+        percentile: str,
+        starting_time: str,
+        ending_time: str,
+        link_names: list,
+        db_client,
+    ) -> dict:
+        """
+        query TSDB for the rx and tx percentile of many links at once
+
+        Returns:
+
+        {
+            LINK_NAME: {
+                "rx": rx percentile,
+                "tx": tx percentile,
+            },
+        }
+
+        The default implementation queries each link and interface with `query_iface_percentile`,
+        override it if your TSDB can return every link in a single query
+        """
+        data = {}
+        for link_name in link_names:
+            data[link_name] = {
+                iface: self.query_iface_percentile(
+                    percentile, starting_time, ending_time, link_name, iface, db_client
+                )
+                for iface in ("rx", "tx")
+            }
+        return data
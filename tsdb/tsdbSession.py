@@ -0,0 +1,103 @@
+#!/usr/bin/env python
+# coding=utf-8
+
+from logging import getLogger
+from random import uniform
+from threading import Lock
+from typing import Callable
+
+from config import TSDB_POOL_SIZE, TSDB_RETRIES, TSDB_RETRY_BACKOFF
+
+logger = getLogger("watcher")
+
+
+class TsdbSession:
+    """
+    TSDB client shared by every worker thread, used in place of the client returned by `connect`
+
+    The client is only created (with the `connect` of the given TsdbExtractor) on its first use,
+    so the runs that never query the TSDB never connect to it.
+    If the client sends its requests through a `requests` session (like the InfluxDBClient),
+    it's given an HTTP adapter with:
+    - a keep-alive connection pool of `pool_size` connections, so every worker reuses its connection
+    - up to `retries` retries of the failed connections and 502/503/504 responses of the GET requests
+      (the queries), with an exponential and jittered backoff (starting at `backoff` seconds)
+    """
+
+    def __init__(
+        self,
+        tsdb_extractor,
+        auth: dict,
+        pool_size: int = TSDB_POOL_SIZE,
+        retries: int = TSDB_RETRIES,
+        backoff: float = TSDB_RETRY_BACKOFF,
+        on_connect: Callable = None,
+    ):
+        self.tsdb_extractor = tsdb_extractor
+        self.auth = auth
+        self.pool_size = pool_size
+        self.retries = retries
+        self.backoff = backoff
+        self.on_connect = on_connect
+        self.lock = Lock()
+        self.db_client = None
+
+    @property
+    def client(self):
+        """
+        Returns the TSDB client, connecting on the first call
+        """
+        if self.db_client is None:
+            with self.lock:
+                if self.db_client is None:
+                    self.db_client = self.__connect()
+        return self.db_client
+
+    def __getattr__(self, name: str):
+        # the client methods (query, ...) are called on the session
+        return getattr(self.client, name)
+
+    def __connect(self):
+        logger.info("connecting to the TSDB")
+        db_client = self.tsdb_extractor.connect(**self.auth)
+        session = getattr(db_client, "_session", None)
+        if session is not None and hasattr(session, "mount"):
+            adapter = pooled_adapter(self.pool_size, self.retries, self.backoff)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+        if self.on_connect is not None:
+            self.on_connect(db_client)
+        return db_client
+
+
+def pooled_adapter(pool_size: int, retries: int, backoff: float):
+    """
+    Returns an HTTP adapter with a pool of `pool_size` keep-alive connections per host
+    and jittered retries (see JitteredRetry) of the GET requests.
+    The POST requests (writes and SELECT ... INTO) are never retried, so they're never applied twice
+    """
+    # requests is only imported when connecting
+    from requests.adapters import HTTPAdapter
+    from urllib3.util.retry import Retry
+
+    class JitteredRetry(Retry):
+        """
+        Retry whose backoff is a random time between 0 and the exponential backoff (full jitter),
+        so the workers that failed at the same time don't retry at the same time
+        """
+
+        def get_backoff_time(self) -> float:
+            return uniform(0, super().get_backoff_time())
+
+    return HTTPAdapter(
+        pool_connections=pool_size,
+        pool_maxsize=pool_size,
+        max_retries=JitteredRetry(
+            total=retries,
+            backoff_factor=backoff,
+            status_forcelist=(502, 503, 504),
+            allowed_methods=("GET",),
+            # the last response is returned, so the client raises its own error
+            raise_on_status=False,
+        ),
+    )
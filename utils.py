@@ -1,15 +1,15 @@
 #!/usr/bin/env python
 # coding=utf-8
 
-import requests
 import os
 import json
 
 from logging import getLogger
 from datetime import datetime
 
+from codec import codec
 from config import (
-    OUTPUT_INDENT_LEVEL,
+    REPORT_FORMAT,
     ALERTA_URL,
     LOGGER_NAME,
     EMAILS_TO_ALERT,
@@ -20,24 +20,22 @@ from config import (
 logger = getLogger(__name__)
 
 
-def save_json(input: dict, output_path: str):
+def save_json(input: dict, output_path: str, report_format: str = REPORT_FORMAT):
     """
-    saves a dict to a json file in the given path
+    saves a dict to a json file in the given path, in the given format (see codec/codec.py)
     """
     logger.info("saving json file to %s", output_path)
     # writing report json
-    with open(output_path, "w+") as outfile:
-        json.dump(input, outfile, indent=OUTPUT_INDENT_LEVEL)
+    codec.dump(input, output_path, report_format)
 
 
 def json_reader(json_file_path: str):
     """
-    reads a json file and returns a dict with the content
+    reads a json file (in any of the formats of codec/codec.py) and returns a dict with the content
     """
     logger.info("reading json file from %s", json_file_path)
-    with open(json_file_path, "r") as f:
-        j: dict = json.load(f)
-        return j
+    j: dict = codec.load(json_file_path)
+    return j
 
 
 def send_alert(
@@ -70,8 +68,10 @@ def send_alert(
             "teams": [],
         },
     }
+    from requests import post
+
     try:
-        r = requests.post(ALERTA_URL, headers=header, data=json.dumps(data))
+        r = post(ALERTA_URL, headers=header, data=json.dumps(data))
         logger.info("alert sent to alerta")
     except Exception as e:
         logger.error("error sending alert to alerta: %s", e)
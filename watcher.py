@@ -2,30 +2,49 @@
 # coding=utf-8
 
 import argparse
-import zulu
 import logging
-import requests
 import json
+import re
 
 
-from pprint import pprint
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
-from pytz import timezone as tz
 from dateutil import parser
 from pathlib import Path
-from requests.auth import HTTPBasicAuth
 from os.path import join
-from os import environ
+from threading import Lock
+from time import monotonic, perf_counter, sleep
+from typing import Callable
 
 
-from utils import save_json, json_reader
+from utils import json_reader, send_alert
 from logger import init_logging
+from tsdb import call_with_window
 from tsdb.TsdbExtractor import TsdbExtractor
+from tsdb.tsdbSession import TsdbSession
 from formatters.hosts import Hosts
-from irm.IrmExtractor import IrmExtractor
-from alert.Alerta import Alerta
-from dateManipulator.dateManipulator import DateManipulator
+from dateManipulator.dateManipulator import (
+    DateManipulator,
+    ReportTimeFormatter,
+    TimeWindow,
+)
 from reportManipulator.reportManipulator import ReportManipulator
+from reportStore.reportStore import ReportStore
+from pipeline.pipeline import LinkPipeline
+from percentile.percentile import calculate_percentile, PercentileSketch
+from detector.detector import (
+    detect_exceeded_intervals,
+    find_open_run,
+    StreamingDetector,
+)
+from series.series import Series, StreamingStep
+from cache.seriesCache import SeriesCache
+from checkpoint.checkpoint import CheckpointStore
+from jobManifest.jobManifest import JobManifest, job_hash
+from codec.codec import StreamWriter
+from delivery.delivery import ApiDelivery, IntervalBuffer
+from detector.processDetector import ProcessDetector
+from metrics.metrics import run_metrics
 
 from config import (
     LOGGER_NAME,
@@ -45,6 +64,17 @@ from config import (
     TIME_THRESHOLD,
     LINKS_INFO_FILE,
     PERCENTILE,
+    WATCHER_WORKERS,
+    WATCHER_PROCESSES,
+    WATCHER_PARALLEL_DAYS,
+    HEAL_PARALLEL_DAYS,
+    TSDB_BULK_CHUNK_SIZE,
+    TSDB_CHUNK_SIZE,
+    TSDB_POOL_SIZE,
+    SERIES_CACHE_PATH,
+    SERIES_CACHE_MAX_SIZE,
+    DAEMON_TICK,
+    METRICS_PATH,
 )
 
 logger = logging.getLogger("watcher")
@@ -66,8 +96,32 @@ def is_watcher():
     return "watcher"
 
 
+def is_daemon():
+    """
+    Checks if the script is running in daemon mode
+    if so, returns "daemon"
+    """
+    return "daemon"
+
+
 # arguments
+def downsample_bucket(value: str) -> str:
+    """
+    validates the bucket of the --downsample flag (an InfluxDB duration, like 30s, 5m or 1h)
+    """
+    if not re.fullmatch(r"[1-9][0-9]*[smh]", value):
+        raise argparse.ArgumentTypeError(
+            "invalid bucket '{}', use a number followed by s, m or h (e.g. 5m)".format(
+                value
+            )
+        )
+    return value
+
+
 def process_args():
+    # the default dates of the flags
+    now = datetime.now()
+
     # Root parser
     parser = argparse.ArgumentParser(
         description="A script to analyze bandwidth usage of a given list of links\n\
@@ -104,6 +158,111 @@ and alert if they exceed the configured thresholds",
         help="path where the json output will be stored",
     )
 
+    subparser_watcher.add_argument(
+        "-w",
+        "--workers",
+        type=int,
+        default=WATCHER_WORKERS,
+        action="store",
+        help="number of links queried at the same time. Default: {}".format(
+            WATCHER_WORKERS
+        ),
+    )
+
+    subparser_watcher.add_argument(
+        "-p",
+        "--processes",
+        type=int,
+        default=WATCHER_PROCESSES,
+        action="store",
+        help="number of processes checking the fetched links of each day, 0 checks them in the main process. Default: {}".format(
+            WATCHER_PROCESSES
+        ),
+    )
+
+    subparser_watcher.add_argument(
+        "--parallel-days",
+        type=int,
+        default=WATCHER_PARALLEL_DAYS,
+        action="store",
+        help="number of days of the date range checked at the same time, each one with its own workers\n\
+and writing its own report. Default: {}".format(
+            WATCHER_PARALLEL_DAYS
+        ),
+    )
+
+    subparser_watcher.add_argument(
+        "--stream",
+        action="store_true",
+        help="queries the traffic in chunks of {} points and checks each chunk as it arrives,\n\
+so the memory used doesn't depend on the date range. The percentiles are then queried from the TSDB".format(
+            TSDB_CHUNK_SIZE
+        ),
+    )
+
+    subparser_watcher.add_argument(
+        "--range-fetch",
+        action="store_true",
+        help="queries the traffic of the whole date range once and splits it into each day, instead of querying every day",
+    )
+
+    subparser_watcher.add_argument(
+        "--tsdb-percentile",
+        action="store_true",
+        help="queries the percentiles from the TSDB instead of calculating them from the fetched traffic",
+    )
+
+    subparser_watcher.add_argument(
+        "--bulk",
+        action="store_true",
+        help="queries the traffic of up to {} links in a single query instead of one query per link".format(
+            TSDB_BULK_CHUNK_SIZE
+        ),
+    )
+    subparser_watcher.add_argument(
+        "--incremental",
+        action="store_true",
+        help="only checks the points after the last run of the day and updates its report in place",
+    )
+
+    subparser_watcher.add_argument(
+        "--force",
+        action="store_true",
+        help="checks every day again, even the past days already complete in the report store\n\
+and the links already checked by a run that stopped halfway",
+    )
+
+    subparser_watcher.add_argument(
+        "--send-api",
+        action="store_true",
+        help="sends the exceeded intervals to the watcher API ({})".format(API_HOST),
+    )
+
+    subparser_watcher.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="always queries the TSDB instead of reusing the traffic cached in {}".format(
+            SERIES_CACHE_PATH
+        ),
+    )
+
+    subparser_watcher.add_argument(
+        "--downsample",
+        type=downsample_bucket,
+        metavar="BUCKET",
+        action="store",
+        help="queries the traffic aggregated in buckets of the given duration (e.g. 5m, 1h) instead of the raw points.\n\
+The percentiles are then queried from the TSDB",
+    )
+
+    subparser_watcher.add_argument(
+        "--downsample-function",
+        choices=["max", "mean"],
+        default="max",
+        action="store",
+        help="function used to aggregate the points of each bucket with --downsample. Default: max",
+    )
+
     ### watcher date range
     watcher_date_group = subparser_watcher.add_argument_group(
         "date range",
@@ -118,7 +277,7 @@ BOTH FLAGS MUST BE BETWEEN DOUBLE QUOTES".format(
         "--date-begin",
         type=str,
         action="store",
-        default=datetime.now()
+        default=now
         .replace(hour=WORK_HOUR_BEGIN, minute=0, second=0)
         .strftime(TSDB_TIME_FORMAT),
         help='starting date to be used in the query. In the format: "YYYY-MM-DD"',
@@ -128,7 +287,7 @@ BOTH FLAGS MUST BE BETWEEN DOUBLE QUOTES".format(
         "--date-end",
         type=str,
         action="store",
-        default=datetime.now()
+        default=now
         .replace(hour=WORK_HOUR_END, minute=0, second=0)
         .strftime(TSDB_TIME_FORMAT),
         help='Ending date to be used in the query. In the format: "YYYY-MM-DD"',
@@ -177,13 +336,41 @@ this link will be added to the alert".format(
         default=TIME_THRESHOLD,
     )
 
+    subparser_alert.add_argument(
+        "--heal",
+        action="store_true",
+        help="creates the missing reports of the past days (in the directory of the reports)\n\
+with the watcher mode before alerting, instead of only warning about them",
+    )
+
+    subparser_alert.add_argument(
+        "-w",
+        "--workers",
+        type=int,
+        default=WATCHER_WORKERS,
+        action="store",
+        help="number of links queried at the same time with --heal. Default: {}".format(
+            WATCHER_WORKERS
+        ),
+    )
+
+    subparser_alert.add_argument(
+        "--parallel-days",
+        type=int,
+        default=HEAL_PARALLEL_DAYS,
+        action="store",
+        help="number of missing days created at the same time with --heal. Default: {}".format(
+            HEAL_PARALLEL_DAYS
+        ),
+    )
+
     ### alert date range
     alert_date_group = subparser_alert.add_argument_group(
         "date range",
         "Used to specify the date range to be used in the alert.\n\
 If not given, the default date range will be used: {} to {}(7 days from now)".format(
-            (datetime.now() - timedelta(days=7)).strftime("%Y-%m-%d"),
-            datetime.now().strftime("%Y-%m-%d"),
+            (now - timedelta(days=7)).strftime("%Y-%m-%d"),
+            now.strftime("%Y-%m-%d"),
         ),
     )
 
@@ -192,7 +379,7 @@ If not given, the default date range will be used: {} to {}(7 days from now)".fo
         action="store",
         type=str,
         default=(
-            datetime.now().replace(hour=0, minute=0, second=0).date()
+            now.replace(hour=0, minute=0, second=0).date()
             - timedelta(days=7)
         ).strftime("%Y-%m-%d"),
         help='Starting date to be used in the alert. In the format: "YYYY-MM-DD"',
@@ -202,18 +389,80 @@ If not given, the default date range will be used: {} to {}(7 days from now)".fo
         "--date-end",
         action="store",
         type=str,
-        default=datetime.now()
+        default=now
         .replace(hour=23, minute=59, second=59)
         .date()
         .strftime("%Y-%m-%d"),
         help='Ending date to be used in the alert. In the format: "YYYY-MM-DD"',
     )
 
+    ## daemon subparser
+    subparser_daemon = subparsers.add_parser(
+        "daemon",
+        help="Keeps checking the new points of the given links on every tick and alerts as soon as a link exceeds the time threshold",
+        formatter_class=argparse.RawTextHelpFormatter,
+    )
+    subparser_daemon.set_defaults(func=is_daemon)
+
+    ### daemon general flags
+    subparser_daemon.add_argument(
+        "-f",
+        "--file",
+        type=str,
+        action="store",
+        help="json file with the configuration for each link.",
+    )
+
+    subparser_daemon.add_argument(
+        "-w",
+        "--workers",
+        type=int,
+        default=WATCHER_WORKERS,
+        action="store",
+        help="number of links queried at the same time. Default: {}".format(
+            WATCHER_WORKERS
+        ),
+    )
+
+    subparser_daemon.add_argument(
+        "--bulk",
+        action="store_true",
+        help="queries the traffic of up to {} links in a single query instead of one query per link".format(
+            TSDB_BULK_CHUNK_SIZE
+        ),
+    )
+
+    subparser_daemon.add_argument(
+        "--tick",
+        action="store",
+        type=int,
+        help="Time(in seconds) between each check of the new points. Default: {}".format(
+            DAEMON_TICK
+        ),
+        default=DAEMON_TICK,
+    )
+
+    subparser_daemon.add_argument(
+        "--time-threshold",
+        action="store",
+        type=int,
+        help="Time(in minutes) threshold for a given link to be alerted. Default: {}\n\
+Example: If a certain link summed up to {} or more minutes above the limit in the current day: \
+this link will be alerted".format(
+            TIME_THRESHOLD, TIME_THRESHOLD
+        ),
+        default=TIME_THRESHOLD,
+    )
+
     args = parser.parse_args()
     date_manipulator = DateManipulator()
+    date_manipulator.check_work_hour_interval()
+    # the daemon always checks the current day
+    if args.func() == "daemon":
+        return args
+
     # checking if the user provided a valid time range
     date_manipulator.check_time_interval(args.date_begin, args.date_end, parser)
-    date_manipulator.check_work_hour_interval()
     date_manipulator.check_date_range_dependency(args, parser)
     date_manipulator.set_tsdb_date_interval(args.date_begin, args.date_end)
 
@@ -230,13 +479,31 @@ def main():
     ## checking which mode to run
     # choices: alert, watcher
     running_mode = args.func()
-    tsdb_extractor = TsdbExtractor()
+    run_metrics.start(running_mode)
     date_manipulator = DateManipulator()
-    db_client = tsdb_extractor.connect(**TSDB_AUTH)
+    # connects on the first query, with a keep-alive connection for each worker
+    db_client = TsdbSession(
+        TsdbExtractor(),
+        TSDB_AUTH,
+        pool_size=max(
+            TSDB_POOL_SIZE,
+            getattr(args, "workers", 0) * getattr(args, "parallel_days", 1),
+        ),
+        on_connect=run_metrics.track_client,
+    )
 
     match running_mode:
         case "alert":
+            # the backends are only imported by the modes using them
+            from alert.Alerta import Alerta
+
             logger.info("Starting alert mode")
+            heal = None
+            if args.heal:
+
+                def heal(missing_days, links_config):
+                    heal_missing_days(db_client, args, links_config, missing_days)
+
             alerta = Alerta(
                 args.date_begin,
                 args.date_end,
@@ -244,6 +511,7 @@ def main():
                 args.directory,
                 args.file,
                 db_client,
+                heal,
             )
             alerta.send_alert()
             logger.info("finished alert mode")
@@ -256,155 +524,440 @@ def main():
             logger.info("number of days to check: %s", qntd_days_to_check)
 
             # getting hosts info
+            from irm.IrmExtractor import IrmExtractor
+
             extractor = IrmExtractor()
-            report_manipulator = ReportManipulator()
             links_config = extractor.choose_link_config_source(args.file, output_path)
+            # with a process pool, up to 2 links per process are waiting to be checked
+            pipeline = LinkPipeline(args.workers, max_pending=args.processes * 2)
+            batch_size = TSDB_BULK_CHUNK_SIZE if args.bulk else 1
+            api_delivery = ApiDelivery() if args.send_api else None
+
+            if args.downsample:
+                logger.info(
+                    "querying the %s of each %s bucket",
+                    args.downsample_function,
+                    args.downsample,
+                )
+                # the percentiles of the aggregated points aren't the ones of the traffic
+                args.tsdb_percentile = True
+
+            series_cache = None
+            # the cache only holds raw points
+            if not args.no_cache and not args.downsample:
+                series_cache = SeriesCache(
+                    SERIES_CACHE_PATH, SERIES_CACHE_MAX_SIZE * 1024 * 1024
+                )
 
-            # checking each day
-            for i in range(0, qntd_days_to_check + 1):
-                # changing current report time interval
-                current_report_query_date_interval = (
-                    date_manipulator.change_tsdb_time_interval(i)
+            # checking each link
+            link_names = []
+            for key in links_config:
+                if key in IGNORE_LIST:
+                    logger.info(
+                        "link %s is marked to be ignored, skipping it",
+                        key,
+                    )
+                    continue
+                link_names.append(key)
+
+            if args.stream and (
+                args.bulk or args.range_fetch or args.incremental or args.processes
+            ):
+                logger.error(
+                    "--stream can't be used with --bulk, --range-fetch, --incremental or --processes"
                 )
-                date_manipulator.set_tsdb_date_interval(
-                    current_report_query_date_interval["begin"],
-                    current_report_query_date_interval["end"],
+                exit(1)
+
+            # the work hours of each day, checked with their own window
+            # (so the days can be checked at the same time)
+            days_windows = date_manipulator.get_days_windows(qntd_days_to_check)
+
+            if args.parallel_days < 1:
+                logger.error("--parallel-days must be at least 1")
+                exit(1)
+
+            if args.incremental:
+                if (
+                    qntd_days_to_check != 0
+                    or args.range_fetch
+                    or args.downsample
+                    or args.parallel_days > 1
+                ):
+                    logger.error(
+                        "--incremental only checks a single day and can't be used with --range-fetch, --downsample or --parallel-days"
+                    )
+                    exit(1)
+                run_incremental_watcher(
+                    db_client,
+                    days_windows[0],
+                    pipeline,
+                    links_config,
+                    link_names,
+                    output_path,
+                    batch_size,
                 )
-                # creating reports dict
-                current_report = {}
-                current_report["Data"] = date_manipulator.set_report_date()
-                # checking each link
-                for key, value in links_config.items():
-                    if key in IGNORE_LIST:
-                        logger.info(
-                            "link %s is marked to be ignored, skipping it",
-                            key,
-                        )
-                        continue
-                    # send_link_to_api(link["LINK_NAME"])
-                    check_exceeded_intervals(db_client, current_report, key, value)
-                # saving json output
-                file_path = report_manipulator.create_report_file_name(
-                    current_report["Data"], output_path
+            else:
+                check_days(
+                    db_client,
+                    args,
+                    pipeline,
+                    links_config,
+                    link_names,
+                    days_windows,
+                    output_path,
+                    batch_size,
+                    series_cache,
+                    api_delivery,
                 )
-                save_json(current_report, file_path)
-                logger.info("finished watcher mode")
+            if api_delivery is not None:
+                api_delivery.close()
+            logger.info("finished watcher mode")
+        case "daemon":
+            logger.info("Starting daemon mode")
+            from irm.IrmExtractor import IrmExtractor
+
+            links_config = IrmExtractor().choose_link_config_source(
+                args.file, REPORT_OUTPUT_PATH
+            )
+            link_names = [key for key in links_config if key not in IGNORE_LIST]
+            run_daemon(
+                db_client,
+                LinkPipeline(args.workers),
+                links_config,
+                link_names,
+                TSDB_BULK_CHUNK_SIZE if args.bulk else 1,
+                args.tick,
+                args.time_threshold,
+            )
         case _:
             logger.error("invalid running mode: %s", running_mode)
             exit(1)
 
+    run_metrics.write(METRICS_PATH)
     logger.info("finished watcher.py")
     exit(0)
 
 
-def check_interval_size(
-    data: list[dict],
-    current_link_name: str,
-    current_link_config: dict,
-    reports: dict,
-    iface: str,
-    i: int,
-):
+def check_days(
+    db_client,
+    args: argparse.Namespace,
+    pipeline: LinkPipeline,
+    links_config: dict,
+    link_names: list,
+    days_windows: list,
+    output_path: Path,
+    batch_size: int,
+    series_cache: SeriesCache = None,
+    api_delivery: ApiDelivery = None,
+    keep_incomplete: bool = True,
+) -> list:
     """
-    iterates over the points array checking for exceeded values
-    and building the reports dict.
+    watcher mode: checks the given links on each day of `days_windows` (TimeWindow of each day)
+    and writes the report of each day to `output_path`, checking up to `args.parallel_days` days at the same time
+
+    `args` holds the watcher flags (see `process_args`)
+
+    if `keep_incomplete` isn't set, the report of a day whose traffic couldn't be queried for every link
+    isn't written (so the day is still missing)
 
-    returns the index of the last point checked
+    returns the windows of the days whose traffic couldn't be queried for every link
     """
+    report_manipulator = ReportManipulator()
+    # the options that change the report of a link, the past days and links
+    # already checked with the same ones are skipped (unless --force is given)
+    job_options = {
+        "work_hours": [WORK_HOUR_BEGIN, WORK_HOUR_END],
+        "downsample": [args.downsample, args.downsample_function],
+        "tsdb_percentile": args.tsdb_percentile or args.stream,
+    }
+    unit_hashes = {
+        link_name: job_hash({"config": links_config[link_name], "options": job_options})
+        for link_name in link_names
+    }
+    run_hash = job_hash([[name, unit_hashes[name]] for name in link_names])
+    manifest = JobManifest(output_path)
+    if args.downsample:
+        # the aggregation is pushed down to the TSDB by the extractor
+        days_windows = [
+            window._replace(downsampling=(args.downsample, args.downsample_function))
+            for window in days_windows
+        ]
+    if not args.force:
+        days_windows = skip_complete_days(output_path, days_windows, run_hash)
+
+    process_detector = None
+    if args.processes and days_windows:
+        process_detector = ProcessDetector(args.processes)
+
+    # fetching the traffic of the whole date range at once
+    range_traffic = None
+    if args.range_fetch and days_windows:
+        days_intervals = [window.epoch() for window in days_windows]
+        range_window = days_windows[0]._replace(end=days_windows[-1].end)
+        range_traffic = dict(
+            zip(
+                link_names,
+                pipeline.run(
+                    link_names,
+                    fetch=lambda batch: fetch_range_traffic(
+                        db_client,
+                        range_window,
+                        batch,
+                        days_intervals,
+                        series_cache,
+                    ),
+                    detect=lambda link_name, traffic: traffic,
+                    batch_size=batch_size,
+                ),
+            )
+        )
 
-    # if is already the last point of the array, return
-    if i >= len(data):
-        return len(data)
+    # the report store is written by a single day at a time
+    index_lock = Lock()
+
+    def check_day(i: int, window: TimeWindow) -> bool:
+        """
+        checks every link in the given day (the i-th day of the date range)
+        and writes its report
+
+        returns False if the traffic of any link couldn't be queried
+        """
+        logger.info("checking day %s to %s", window.begin, window.end)
+        # creating reports dict
+        current_report = {}
+        current_report["Data"] = window.report_date()
+
+        # only the links of the past days are recorded in the manifest,
+        # the traffic of the current day is still changing
+        past_day = window.is_past()
+        finished = {}
+        if past_day and not args.force:
+            finished = manifest.load(current_report["Data"], unit_hashes)
+        # the links whose traffic couldn't be queried, they're checked again on the next run
+        failed_links = set()
+
+        # send_link_to_api(link["LINK_NAME"])
+        if args.stream:
+
+            def fetch(batch):
+                return {
+                    link_name: stream_link_data(
+                        db_client,
+                        window,
+                        link_name,
+                        links_config[link_name],
+                        TSDB_CHUNK_SIZE,
+                        api_delivery,
+                        failed_links,
+                    )
+                    for link_name in batch
+                }
+
+        elif args.bulk:
+
+            def fetch(batch):
+                return fetch_links_data(
+                    db_client,
+                    window,
+                    batch,
+                    (
+                        None
+                        if range_traffic is None
+                        else {
+                            link_name: take_day_traffic(range_traffic, link_name, i)
+                            for link_name in batch
+                        }
+                    ),
+                    args.tsdb_percentile,
+                    series_cache,
+                    failed_links,
+                )
 
-    interval_counter = len(reports[current_link_name][iface]["intervals"]) + 1
-    current_timezone_offset = (
-        datetime.now(tz(OUTPUT_TIMEZONE)).utcoffset().total_seconds() / 3600
-    )
+        else:
+
+            def fetch(batch):
+                return {
+                    link_name: fetch_link_data(
+                        db_client,
+                        window,
+                        link_name,
+                        take_day_traffic(range_traffic, link_name, i),
+                        args.tsdb_percentile,
+                        series_cache,
+                        failed_links,
+                    )
+                    for link_name in batch
+                }
+
+        if args.stream:
+            # the links were already checked as their chunks arrived
+            def detect(link_name, link_report):
+                return link_report
+
+        elif process_detector is None:
+
+            def detect(link_name, fetched):
+                return detect_link_data(
+                    link_name, links_config[link_name], fetched, api_delivery
+                )
 
-    # formatting start time display
-    # it has to be the time of the previous point 'cause if the current point is above limit,
-    # it means that the previous point was the start of the interval
-    point_dt = zulu.parse(data[i - 1]["time"])
-    time_begin = point_dt + timedelta(hours=current_timezone_offset)
-    time_begin = time_begin.format("%d/%m/%y-%H:%M:%S")
+        else:
+
+            def detect(link_name, fetched):
+                return process_detector.submit(
+                    link_name,
+                    detect_link_data_in_process,
+                    link_name,
+                    links_config[link_name],
+                    fetched,
+                    api_delivery is not None,
+                    then=lambda result: deliver_intervals(result, api_delivery),
+                )
 
-    # extracting values for better readability
-    max_value = data[i]["value"] * 8  # max value of the interval in bits
-    min_value = max_value  # min value of the interval in bits
-    limit_speed = (
-        current_link_config["LINK_SPEED"]
-        * current_link_config["LINK_MAX_TRAFFIC_PERCENTAGE"]
-    )
-    limit_speed_histeresys = limit_speed * current_link_config["LINK_HISTERESYS"]
-    limit_speed_accounting_for_histeresys = limit_speed - limit_speed_histeresys
+        if finished:
+            fetch, detect = skip_finished_links(fetch, detect, finished)
+        # the json output is written as the links are checked
+        file_path = report_manipulator.create_report_file_name(
+            current_report["Data"], output_path
+        )
+        with StreamWriter(file_path) as report_writer:
+            report_writer.write("Data", current_report["Data"])
+
+            def write_link_report(link_name, link_report):
+                with run_metrics.stage("report_write"):
+                    report_writer.write(link_name, link_report)
+                if (
+                    past_day
+                    and link_name not in finished
+                    and link_name not in failed_links
+                ):
+                    manifest.record(
+                        current_report["Data"],
+                        link_name,
+                        unit_hashes[link_name],
+                        link_report,
+                    )
+
+            link_reports = pipeline.run(
+                link_names,
+                fetch=fetch,
+                detect=detect,
+                batch_size=batch_size,
+                # in the same order as the links config
+                emit=write_link_report,
+            )
+            if failed_links:
+                logger.warning(
+                    "the traffic of %d links of %s couldn't be queried, the day isn't complete",
+                    len(failed_links),
+                    current_report["Data"],
+                )
+                if not keep_incomplete:
+                    report_writer.abort()
+                    return False
+        for link_name, link_report in zip(link_names, link_reports):
+            current_report[link_name] = link_report
+        # the day is only complete if every link was queried,
+        # else its manifest is kept so the next run only checks the failed links
+        complete = past_day and not failed_links
+        with index_lock, run_metrics.stage("report_index"):
+            report_manipulator.index_report(
+                current_report,
+                file_path,
+                run_hash if complete else None,
+            )
+        if complete:
+            manifest.clear(current_report["Data"])
+        return not failed_links
+
+    # checking each day
+    parallel_days = args.parallel_days
+    if parallel_days > 1 and not TsdbExtractor().accepts_windows():
+        logger.warning(
+            "the TsdbExtractor doesn't take the window parameter, checking one day at a time"
+        )
+        parallel_days = 1
+    if parallel_days > 1:
+        logger.info("checking %d days at a time", parallel_days)
+        with ThreadPoolExecutor(max_workers=parallel_days) as executor:
+            days = [
+                executor.submit(check_day, i, window)
+                for i, window in enumerate(days_windows)
+            ]
+            queried = [day.result() for day in days]
+    else:
+        queried = [check_day(i, window) for i, window in enumerate(days_windows)]
+    if process_detector is not None:
+        process_detector.close()
+    return [window for window, ok in zip(days_windows, queried) if not ok]
+
+
+def heal_missing_days(
+    db_client, args: argparse.Namespace, links_config: dict, missing_days: list
+):
+    """
+    alert --heal: creates the reports of the given missing days (datetimes) in the directory of the alert,
+    checking the links with the default watcher flags and up to `args.parallel_days` days at the same time
 
-    # iterates checking interval size
-    exceeded_points = 0
-    while (i < len(data)) and (
-        data[i]["value"] * 8 >= limit_speed_accounting_for_histeresys
-    ):
-        current_point_value = data[i]["value"] * 8
-
-        # checking for max value
-        if current_point_value > max_value:
-            max_value = current_point_value
-        # checking for min value
-        if current_point_value < min_value:
-            min_value = current_point_value
-
-        exceeded_points += 1
-        # iterate
-        i += 1
-
-    exceeded_time = exceeded_points * 5  # in minutes
-
-    # if interval not exceeded, returns the last index checked
-    if exceeded_points == 0:
-        return i
-
-    # if got to the end of the array, returns the last index
-    if i >= len(data):
-        i -= 1
-
-    # formatting end time display
-    point_dt = zulu.parse(data[i]["time"])
-    time_end = point_dt + timedelta(hours=current_timezone_offset)
-    time_end = time_end.format("%d/%m/%y-%H:%M:%S")
-
-    # Mean value of interval (in bytes)
-    mean_value = round((min_value + max_value) / 2, 1)
-    # if mean value exceeds limit speed, removes the interval
-    # this means that this particular interval has a point
-    # where the link was down and got back up causing a spike
-    if (mean_value >= 6 * limit_speed) or ("e" in str(mean_value)):
-        logger.info(
-            "ignoring interval beetwen %s and %s (probably link was down)",
-            time_begin,
-            time_end,
+    only the past days are created, the report of the current day is left to the watcher mode.
+    The traffic is always queried from the TSDB (the series cache isn't used), and a day is only created
+    if the traffic of every link could be queried, else it's still missing (and healed by the next run)
+    """
+    date_manipulator = DateManipulator()
+    days_windows = [
+        window
+        for window in (
+            date_manipulator.get_day_window(day.strftime("%Y-%m-%d"))
+            for day in missing_days
         )
-        return i
+        if window.is_past()
+    ]
+    if not days_windows:
+        return
 
-    # adding interval to report
-    report_manipulator = ReportManipulator()
-    report_manipulator.add_interval_to_report(
-        reports[current_link_name][iface],
-        time_begin,
-        time_end,
-        interval_counter,
-        exceeded_time,
+    logger.info("creating the reports of %d missing days", len(days_windows))
+    watcher_args = argparse.Namespace(
+        parallel_days=args.parallel_days,
+        force=False,
+        processes=0,
+        range_fetch=False,
+        stream=False,
+        bulk=False,
+        tsdb_percentile=False,
+        downsample=None,
+        downsample_function="max",
     )
-    return i
+    failed_days = check_days(
+        db_client,
+        watcher_args,
+        LinkPipeline(args.workers),
+        links_config,
+        [link_name for link_name in links_config if link_name not in IGNORE_LIST],
+        days_windows,
+        Path(args.directory),
+        1,
+        keep_incomplete=False,
+    )
+    if failed_days:
+        logger.warning(
+            "%d missing days couldn't be created: %s",
+            len(failed_days),
+            ", ".join(window.report_date() for window in failed_days),
+        )
 
 
 def send_link_to_api(link_name):
     """
     sends the link to the api
     """
+    from requests import post
+    from requests.auth import HTTPBasicAuth
+
     # sending link to api
     try:
         url = API_HOST + "watcher/"
         data = {"slug": link_name, "owner": API_USER}
-        response = requests.post(
+        response = post(
             url,
             data=json.dumps(data),
             auth=HTTPBasicAuth(API_USER, API_PASS),
@@ -418,6 +971,8 @@ def send_link_to_api(link_name):
 
 
 def send_interval_to_api(
+    api_delivery: ApiDelivery,
+    current_link_name,
     current_link_configs,
     iface,
     time_begin,
@@ -428,18 +983,16 @@ def send_interval_to_api(
     min_value,
 ):
     """
-    sends the interval to the api
+    queues the interval to be sent to the api (see delivery/delivery.py)
     """
-    # sending interval to api
-    try:
-        url = API_HOST + "watcher/interval/"
-        time_begin = datetime.strptime(time_begin, "%d/%m/%y-%H:%M:%S")
-        time_begin = time_begin.strftime("%Y-%m-%dT%H:%M:%SZ")
-        time_end = datetime.strptime(time_end, "%d/%m/%y-%H:%M:%S")
-        time_end = time_end.strftime("%Y-%m-%dT%H:%M:%SZ")
-
-        data = {
-            "link_slug": current_link_configs["LINK_NAME"],
+    time_begin = datetime.strptime(time_begin, "%d/%m/%y-%H:%M:%S")
+    time_begin = time_begin.strftime("%Y-%m-%dT%H:%M:%SZ")
+    time_end = datetime.strptime(time_end, "%d/%m/%y-%H:%M:%S")
+    time_end = time_end.strftime("%Y-%m-%dT%H:%M:%SZ")
+
+    api_delivery.send(
+        {
+            "link_slug": current_link_name,
             "speed": current_link_configs["LINK_SPEED"],
             "speed_limit": current_link_configs["LINK_MAX_TRAFFIC_PERCENTAGE"],
             "limit_histeresys": current_link_configs["LINK_HISTERESYS"],
@@ -452,34 +1005,14 @@ def send_interval_to_api(
             "min_value": min_value,
             "owner": 1,  # 1 is the id of the 'root' user
         }
-        r = requests.post(
-            url,
-            json=data,
-            auth=HTTPBasicAuth(API_USER, API_PASS),
-            headers={"Content-Type": "application/json"},
-            timeout=3,
-        )
-        logger.info("api response: %s and response %s", r.reason, r.text)
-    except requests.exceptions.RequestException as e:
-        logger.error("error adding interval to api: %s", e)
+    )
 
 
-def check_exceeded_intervals(
-    db_client, reports: dict, current_link_name: str, current_link_config: dict
-):
+def create_link_report() -> dict:
     """
-    checks if the given link exceeded its traffic limits
-
-    updates the report dict
+    returns an empty report for a link
     """
-
-    # if link already in reports, exits
-    if current_link_name in reports:
-        logger.error("link %s is duplicated", current_link_name)
-        exit(1)
-
-    # initializing reports
-    reports[current_link_name] = {
+    return {
         "rx": {
             "total_exceeded": 0,
             "intervals": {},
@@ -492,51 +1025,903 @@ def check_exceeded_intervals(
         },
     }
 
-    # queries for rx and tx
+
+def query_traffic(
+    db_client,
+    window: TimeWindow,
+    link_names: list,
+    series_cache: SeriesCache = None,
+) -> dict:
+    """
+    queries the TSDB for the rx and tx traffic of the given links in the given time window
+
+    if a series cache is given, the links already cached are read from it
+    and the fetched ones are stored in it (if the time range is fully in the past)
+
+    returns a dict with the following format:
+    {
+        LINK_NAME: {"rx": Series, "tx": Series},
+    }
+    the Series that couldn't be queried are None (and aren't cached)
+    """
+    traffic = {}
+    missing_links = link_names
+    if series_cache is not None:
+        traffic, missing_links = series_cache.get_links(link_names, *window.epoch())
+        logger.debug("%d links read from the series cache", len(traffic))
+        run_metrics.count("links_cached", len(traffic))
+
+    if missing_links:
+        with run_metrics.query("traffic"):
+            fetched = call_with_window(
+                TsdbExtractor().query_links_traffic,
+                missing_links,
+                db_client,
+                window=window,
+            )
+        fetched = {
+            link_name: {
+                iface: (
+                    None
+                    if fetched[link_name][iface] is None
+                    else Series.of(fetched[link_name][iface])
+                )
+                for iface in ("rx", "tx")
+            }
+            for link_name in missing_links
+        }
+        run_metrics.count(
+            "points_fetched",
+            sum(
+                len(fetched[link_name][iface])
+                for link_name in fetched
+                for iface in ("rx", "tx")
+                if fetched[link_name][iface] is not None
+            ),
+        )
+        if series_cache is not None:
+            series_cache.put_links(fetched, *window.epoch())
+        traffic.update(fetched)
+    return traffic
+
+
+def fetch_link_data(
+    db_client,
+    window: TimeWindow,
+    current_link_name: str,
+    traffic: dict = None,
+    tsdb_percentile: bool = False,
+    series_cache: SeriesCache = None,
+    failed_links: set = None,
+) -> dict:
+    """
+    fetch stage: queries the TSDB for the rx and tx traffic of the given link in the given time window
+    and calculates their percentiles from the fetched points
+
+    if the traffic was already fetched (range fetch), it's given in `traffic` ({"rx": Series, "tx": Series}),
+    else it's read from the `series_cache` or queried
+
+    the percentiles are only queried from the TSDB if `tsdb_percentile` is set
+    or if they can't be calculated from the fetched points
+
+    if the traffic couldn't be queried, the link is added to `failed_links`
+
+    returns a dict with the following format:
+    {
+        "rx": {"data": rx Series, "percentile": rx percentile},
+        "tx": {"data": tx Series, "percentile": tx percentile},
+    }
+    """
     logger.info("checking ifaces for %s", current_link_name)
-    # querying for rx
     tsdb_extractor = TsdbExtractor()
-    data = tsdb_extractor.query_iface_traffic(current_link_name, "rx", db_client)
-    reports[current_link_name]["rx"]["percentile"] = (
-        tsdb_extractor.query_iface_percentile(
-            PERCENTILE,
-            environ["QUERY_DATE_BEGIN"],
-            environ["QUERY_DATE_END"],
-            current_link_name,
-            "rx",
-            db_client,
+    if traffic is None:
+        traffic = query_traffic(db_client, window, [current_link_name], series_cache)[
+            current_link_name
+        ]
+
+    fetched = {}
+    for iface in ("rx", "tx"):
+        data = traffic[iface]
+        if data is None:
+            # the query failed, the link is checked without points
+            data = Series()
+            if failed_links is not None:
+                failed_links.add(current_link_name)
+
+        percentile = None
+        if not tsdb_percentile:
+            percentile = calculate_percentile(data, PERCENTILE)
+        if percentile is None:
+            with run_metrics.query("percentile"):
+                percentile = tsdb_extractor.query_iface_percentile(
+                    PERCENTILE,
+                    window.begin,
+                    window.end,
+                    current_link_name,
+                    iface,
+                    db_client,
+                )
+
+        fetched[iface] = {"data": data, "percentile": percentile}
+    return fetched
+
+
+def fetch_links_data(
+    db_client,
+    window: TimeWindow,
+    link_names: list,
+    traffic: dict = None,
+    tsdb_percentile: bool = False,
+    series_cache: SeriesCache = None,
+    failed_links: set = None,
+) -> dict:
+    """
+    fetch stage (bulk mode): queries the TSDB for the rx and tx traffic of all the given links
+    in the given time window with a single query and calculates their percentiles from the fetched points
+
+    if the traffic was already fetched (range fetch), it's given in `traffic` ({LINK_NAME: {"rx": Series, "tx": Series}}),
+    else it's read from the `series_cache` or queried
+
+    the percentiles are only queried from the TSDB (with a single query for the links missing them)
+    if `tsdb_percentile` is set or if they can't be calculated from the fetched points
+
+    the links whose traffic couldn't be queried are added to `failed_links`
+
+    returns a dict with the data of each link in the format returned by `fetch_link_data`
+    """
+    logger.info("checking ifaces for %d links", len(link_names))
+    tsdb_extractor = TsdbExtractor()
+    if traffic is None:
+        traffic = query_traffic(db_client, window, link_names, series_cache)
+
+    fetched = {}
+    missing_percentiles = []
+    for link_name in link_names:
+        fetched[link_name] = {}
+        for iface in ("rx", "tx"):
+            data = traffic[link_name][iface]
+            if data is None:
+                # the query failed, the link is checked without points
+                data = Series()
+                if failed_links is not None:
+                    failed_links.add(link_name)
+            percentile = None
+            if not tsdb_percentile:
+                percentile = calculate_percentile(data, PERCENTILE)
+            if percentile is None and link_name not in missing_percentiles:
+                missing_percentiles.append(link_name)
+            fetched[link_name][iface] = {"data": data, "percentile": percentile}
+
+    # querying the percentiles that couldn't be calculated
+    if missing_percentiles:
+        with run_metrics.query("percentile"):
+            percentiles = tsdb_extractor.query_links_percentile(
+                PERCENTILE,
+                window.begin,
+                window.end,
+                missing_percentiles,
+                db_client,
+            )
+        for link_name in missing_percentiles:
+            for iface in ("rx", "tx"):
+                if fetched[link_name][iface]["percentile"] is None:
+                    fetched[link_name][iface]["percentile"] = percentiles[link_name][
+                        iface
+                    ]
+    return fetched
+
+
+def fetch_range_traffic(
+    db_client,
+    window: TimeWindow,
+    link_names: list,
+    days_intervals: list,
+    series_cache: SeriesCache = None,
+) -> dict:
+    """
+    range fetch stage: queries the TSDB for the rx and tx traffic of the given links
+    in the whole date range (`window`) and splits it
+    into the work hour window of each day
+
+    `days_intervals` is a list of (begin, end) tuples of epoch timestamps
+
+    if a series cache is given, the links cached for every day are read from it
+    and the days fully in the past of the fetched links are stored in it
+
+    returns a dict with the following format:
+    {
+        LINK_NAME: {
+            "rx": [Series of the 1st day, Series of the 2nd day, ...],
+            "tx": [Series of the 1st day, Series of the 2nd day, ...],
+        },
+    }
+    the Series of every day are None if the query failed (and aren't cached)
+    """
+    range_traffic = {}
+    missing_links = link_names
+    if series_cache is not None:
+        cached_days = []
+        missing_links = set()
+        for begin, end in days_intervals:
+            cached, missing = series_cache.get_links(link_names, begin, end)
+            cached_days.append(cached)
+            missing_links.update(missing)
+
+        for link_name in link_names:
+            if link_name in missing_links:
+                continue
+            range_traffic[link_name] = {
+                iface: [cached[link_name][iface] for cached in cached_days]
+                for iface in ("rx", "tx")
+            }
+        missing_links = [name for name in link_names if name in missing_links]
+
+    if not missing_links:
+        return range_traffic
+
+    logger.info("fetching the whole date range for %d links", len(missing_links))
+    with run_metrics.query("traffic"):
+        traffic = call_with_window(
+            TsdbExtractor().query_links_traffic, missing_links, db_client, window=window
+        )
+    for link_name in missing_links:
+        range_traffic[link_name] = {}
+        for iface in ("rx", "tx"):
+            if traffic[link_name][iface] is None:
+                range_traffic[link_name][iface] = [None] * len(days_intervals)
+                continue
+            data = Series.of(traffic[link_name][iface])
+            run_metrics.count("points_fetched", len(data))
+            range_traffic[link_name][iface] = split_series_by_day(data, days_intervals)
+
+    if series_cache is not None:
+        for day, (begin, end) in enumerate(days_intervals):
+            series_cache.put_links(
+                {
+                    link_name: {
+                        iface: range_traffic[link_name][iface][day]
+                        for iface in ("rx", "tx")
+                    }
+                    for link_name in missing_links
+                },
+                begin,
+                end,
+            )
+    return range_traffic
+
+
+def fetch_incremental_data(
+    db_client, window: TimeWindow, link_names: list, last_times: dict
+) -> dict:
+    """
+    fetch stage (incremental mode): queries the TSDB for the rx and tx traffic of the given links
+    in `window` after their last checked points
+
+    `last_times` holds the epoch timestamp of the last checked point of each link interface
+    ({LINK_NAME: {"rx": timestamp, "tx": timestamp}}), links missing from it are fully checked
+
+    returns a dict with the data of each link in the format returned by `fetch_link_data`
+    (the percentiles are None, they're calculated from the sketches of the checkpoints)
+    """
+    logger.info("checking new points of %d links", len(link_names))
+    traffic = query_traffic(db_client, window, link_names)
+
+    fetched = {}
+    for link_name in link_names:
+        fetched[link_name] = {}
+        for iface in ("rx", "tx"):
+            data = traffic[link_name][iface]
+            if data is None:
+                # the query failed, the points are checked on the next run
+                data = Series()
+            last_time = last_times.get(link_name, {}).get(iface)
+            if last_time is not None:
+                data = data.after(last_time)
+            fetched[link_name][iface] = {"data": data, "percentile": None}
+    return fetched
+
+
+def update_link_report(
+    current_link_name: str,
+    current_link_config: dict,
+    fetched: dict,
+    report: dict,
+    link_checkpoint: dict | None,
+) -> dict:
+    """
+    detect stage (incremental mode): checks the new points of the given link,
+    continuing the run above the histeresys limit that was still going on in the last run
+
+    the interval that was still open in the last run is removed from the report and detected again
+    with the new points, so it's never split. If the link has no checkpoint, its report is recreated
+
+    updates the report dict
+
+    returns the new checkpoint of the link
+    """
+    if link_checkpoint is None or current_link_name not in report:
+        report[current_link_name] = create_link_report()
+        link_checkpoint = {}
+
+    report_manipulator = ReportManipulator()
+    _, limit_speed_accounting_for_histeresys = calculate_limit_speeds(
+        current_link_config
+    )
+    new_checkpoint = {}
+    with run_metrics.link(current_link_name):
+        for iface in ("rx", "tx"):
+            iface_checkpoint = link_checkpoint.get(
+                iface,
+                {
+                    "last_time": None,
+                    "open_run": {"times": [], "values": []},
+                    "open_interval": None,
+                    "percentile_sketch": None,
+                },
+            )
+            if iface_checkpoint["open_interval"] is not None:
+                report_manipulator.remove_interval_from_report(
+                    report[current_link_name][iface], iface_checkpoint["open_interval"]
+                )
+
+            data = Series.concat(
+                Series(
+                    iface_checkpoint["open_run"]["times"],
+                    iface_checkpoint["open_run"]["values"],
+                ),
+                fetched[iface]["data"],
+            )
+            open_interval = check_link_data(
+                data, report, current_link_name, current_link_config, iface
+            )
+            # the percentile of the day is calculated from the sketch of the points already checked
+            # and the new points (the open run was already added), so they're never queried again
+            percentile_sketch = PercentileSketch()
+            if iface_checkpoint.get("percentile_sketch") is not None:
+                percentile_sketch = PercentileSketch.from_dict(
+                    iface_checkpoint["percentile_sketch"]
+                )
+            percentile_sketch.merge(
+                PercentileSketch.from_values(fetched[iface]["data"].values * 8)
+            )
+            percentile = percentile_sketch.percentile(PERCENTILE)
+            if percentile is not None:
+                report[current_link_name][iface]["percentile"] = percentile
+            report[current_link_name][iface][
+                "percentile_sketch"
+            ] = percentile_sketch.to_dict()
+
+            # keeping the points of the run still going on for the next run
+            open_run_start = find_open_run(
+                data.values, limit_speed_accounting_for_histeresys
+            )
+            if open_run_start is None:
+                open_run_start = len(data)
+            new_checkpoint[iface] = {
+                "last_time": int(data.times[-1])
+                if len(data)
+                else iface_checkpoint["last_time"],
+                "open_run": {
+                    "times": data.times[open_run_start:].tolist(),
+                    "values": data.values[open_run_start:].tolist(),
+                },
+                "open_interval": open_interval,
+                "intervals": len(report[current_link_name][iface]["intervals"]),
+                "percentile_sketch": percentile_sketch.to_dict(),
+            }
+    return new_checkpoint
+
+
+def check_new_points(
+    db_client,
+    window: TimeWindow,
+    pipeline: LinkPipeline,
+    links_config: dict,
+    link_names: list,
+    report: dict,
+    checkpoints: dict,
+    batch_size: int,
+) -> dict:
+    """
+    checks the points of the given links after their checkpoints, in the given day (`window`),
+    and updates their reports in `report`
+
+    returns the new checkpoints ({LINK_NAME: link checkpoint})
+    """
+    date_manipulator = DateManipulator()
+
+    last_times = {
+        link_name: {
+            iface: checkpoints[link_name][iface]["last_time"] for iface in ("rx", "tx")
+        }
+        for link_name in link_names
+        if link_name in checkpoints
+    }
+    # querying only the points after the oldest checkpoint
+    known_last_times = [
+        last_time
+        for link_last_times in last_times.values()
+        for last_time in link_last_times.values()
+        if last_time is not None
+    ]
+    query_window = window
+    if len(last_times) == len(link_names) and known_last_times:
+        query_window = window._replace(
+            begin=date_manipulator.convert_from_epoch(min(known_last_times) + 1)
+        )
+    logger.info(
+        "checking points from %s to %s", query_window.begin, query_window.end
+    )
+
+    new_checkpoints = pipeline.run(
+        link_names,
+        fetch=lambda batch: fetch_incremental_data(
+            db_client, query_window, batch, last_times
+        ),
+        detect=lambda link_name, fetched: update_link_report(
+            link_name,
+            links_config[link_name],
+            fetched,
+            report,
+            checkpoints.get(link_name),
+        ),
+        batch_size=batch_size,
+    )
+    return dict(zip(link_names, new_checkpoints))
+
+
+def run_incremental_watcher(
+    db_client,
+    window: TimeWindow,
+    pipeline: LinkPipeline,
+    links_config: dict,
+    link_names: list,
+    output_path: Path,
+    batch_size: int,
+):
+    """
+    incremental watcher mode: checks only the points after the checkpoint of each link
+    and updates the report of the day (`window`) in place, so frequent runs only process the new points
+
+    the checkpoint of each link interface holds the timestamp of its last checked point
+    and the points of the run above the histeresys limit still going on at the end of the data
+    """
+    report_manipulator = ReportManipulator()
+    checkpoint_store = CheckpointStore(output_path)
+
+    report_date = window.report_date()
+    file_path = report_manipulator.create_report_file_name(report_date, output_path)
+
+    checkpoints = checkpoint_store.load(report_date)
+    current_report = {"Data": report_date}
+    if Path(file_path).is_file() and checkpoints:
+        current_report = json_reader(file_path)
+    # a link can only be continued if its report is the one saved with its checkpoint
+    # (if a run failed after saving the report, the link is checked again from the beginning)
+    checkpoints = {
+        link_name: link_checkpoint
+        for link_name, link_checkpoint in checkpoints.items()
+        if link_name in current_report
+        and all(
+            len(current_report[link_name][iface]["intervals"])
+            == link_checkpoint[iface]["intervals"]
+            for iface in ("rx", "tx")
         )
+    }
+
+    # keeping the links in the same order as the links config
+    current_report = {
+        "Data": report_date,
+        **{
+            link_name: current_report.get(link_name, create_link_report())
+            for link_name in link_names
+        },
+    }
+
+    new_checkpoints = check_new_points(
+        db_client,
+        window,
+        pipeline,
+        links_config,
+        link_names,
+        current_report,
+        checkpoints,
+        batch_size,
     )
-    check_link_data(data, reports, current_link_name, current_link_config, "rx")
 
-    # querying for tx
-    data = tsdb_extractor.query_iface_traffic(current_link_name, "tx", db_client)
-    reports[current_link_name]["tx"]["percentile"] = (
-        tsdb_extractor.query_iface_percentile(
-            PERCENTILE,
-            environ["QUERY_DATE_BEGIN"],
-            environ["QUERY_DATE_END"],
+    with run_metrics.stage("report_write"):
+        report_manipulator.save_report(current_report, file_path)
+    checkpoint_store.save(report_date, new_checkpoints)
+
+
+def run_daemon(
+    db_client,
+    pipeline: LinkPipeline,
+    links_config: dict,
+    link_names: list,
+    batch_size: int,
+    tick: int,
+    time_threshold: int,
+):
+    """
+    daemon mode: checks the new points of every link on each tick (in the work hours of the current day)
+    and alerts as soon as a link exceeds the time threshold
+
+    the TSDB client, the links config and the reports and checkpoints of the day are kept in memory,
+    so each tick only queries and checks the points after the last tick
+    (the daily reports are still created by the watcher mode)
+    """
+    date_manipulator = DateManipulator()
+    report_date = None
+    while True:
+        tick_begin = monotonic()
+        window = date_manipulator.get_day_window(
+            datetime.now().strftime(TSDB_TIME_FORMAT)
+        )
+
+        # starting a new day
+        if window.report_date() != report_date:
+            report_date = window.report_date()
+            logger.info("starting the checks of %s", report_date)
+            report = {"Data": report_date}
+            checkpoints = {}
+            alerted_links = set()
+
+        if datetime.now() >= parser.parse(window.begin):
+            run_metrics.start("daemon")
+            try:
+                checkpoints = check_new_points(
+                    db_client,
+                    window,
+                    pipeline,
+                    links_config,
+                    link_names,
+                    report,
+                    checkpoints,
+                    batch_size,
+                )
+                alert_exceeded_links(report, time_threshold, alerted_links)
+            except Exception as e:
+                # the reports may be half updated, so the day is checked again from the beginning
+                logger.error("error checking the new points: %s", e)
+                report = {"Data": report_date}
+                checkpoints = {}
+            run_metrics.write(METRICS_PATH)
+
+        sleep(max(0, tick - (monotonic() - tick_begin)))
+
+
+def alert_exceeded_links(report: dict, time_threshold: int, alerted_links: set):
+    """
+    sends an alert for each link of the report that exceeded the time threshold
+    (rx and tx exceeded time summed up), each link is alerted only once
+
+    updates the alerted links set
+    """
+    for link_name, link_report in report.items():
+        if link_name == "Data" or link_name in alerted_links:
+            continue
+
+        total_exceeded_time = (
+            link_report["rx"]["total_exceeded"] + link_report["tx"]["total_exceeded"]
+        )
+        if total_exceeded_time < time_threshold:
+            continue
+
+        logger.info(
+            "link %s exceeded the limit for %s minutes, alerting",
+            link_name,
+            total_exceeded_time,
+        )
+        alerted_links.add(link_name)
+        send_alert(
+            "O link {} excedeu o limite de consumo de banda por {} minutos hoje, entre às {}h e agora\n\
+Limite de tempo excedendo o consumo de banda: {} minutos\n".format(
+                link_name, total_exceeded_time, WORK_HOUR_BEGIN, time_threshold
+            ),
+            "Link excedendo o limite ({})".format(link_name),
+            "warning",
+        )
+
+
+def split_series_by_day(data: Series, days_intervals: list) -> list:
+    """
+    splits the series into the given (begin, end) intervals, without copying its points
+
+    returns a list with the Series of each interval
+    """
+    return [data.slice(begin, end) for begin, end in days_intervals]
+
+
+def take_day_traffic(range_traffic: dict, current_link_name: str, day: int):
+    """
+    returns the traffic of the given link in the given day (index) from the range fetch
+    ({"rx": Series, "tx": Series}), or None if the range wasn't fetched
+
+    each day is checked only once, so its points are released from `range_traffic`
+    """
+    if range_traffic is None:
+        return None
+
+    traffic = {}
+    for iface in ("rx", "tx"):
+        traffic[iface] = range_traffic[current_link_name][iface][day]
+        range_traffic[current_link_name][iface][day] = None
+    return traffic
+
+
+def skip_complete_days(output_path: Path, days_windows: list, run_hash: str) -> list:
+    """
+    returns the windows of the given days that still have to be checked: the past days
+    whose report was completed by a run with the same job hash (in the report store) are skipped
+    """
+    if not days_windows or not (output_path / ReportStore.FILE_NAME).is_file():
+        return days_windows
+
+    report_store = ReportStore(output_path)
+    complete = {
+        file_name
+        for _, file_name in report_store.get_job_days(
+            datetime.strptime(days_windows[0].begin, TSDB_TIME_FORMAT),
+            datetime.strptime(days_windows[-1].end, TSDB_TIME_FORMAT),
+            run_hash,
+        )
+    }
+    report_store.close()
+
+    pending = []
+    for window in days_windows:
+        file_name = "reports_{}.json".format(window.report_date())
+        if (
+            window.is_past()
+            and file_name in complete
+            and (output_path / file_name).is_file()
+        ):
+            logger.info("the report of %s is complete, skipping it", window.report_date())
+            continue
+        pending.append(window)
+    logger.info("%d of %d days to check", len(pending), len(days_windows))
+    return pending
+
+
+def skip_finished_links(fetch: Callable, detect: Callable, finished: dict) -> tuple:
+    """
+    wraps the fetch and detect stages of a day, so the links already checked
+    (`finished`, {LINK_NAME: link report} from the job manifest) aren't fetched again
+    and their reports are reused
+
+    returns a tuple with the wrapped fetch and detect stages
+    """
+
+    def fetch_pending(batch: list) -> dict:
+        pending = [link_name for link_name in batch if link_name not in finished]
+        fetched = fetch(pending) if pending else {}
+        for link_name in batch:
+            if link_name in finished:
+                fetched[link_name] = None
+        return fetched
+
+    def detect_pending(link_name: str, fetched):
+        if link_name in finished:
+            return finished[link_name]
+        return detect(link_name, fetched)
+
+    return fetch_pending, detect_pending
+
+
+def detect_link_data(
+    current_link_name: str,
+    current_link_config: dict,
+    fetched: dict,
+    api_delivery: ApiDelivery = None,
+) -> dict:
+    """
+    detect/report stage: checks the data returned by `fetch_link_data`
+    (the exceeded intervals are also sent to the api if `api_delivery` is given)
+
+    returns the report of the given link
+    """
+    reports = {current_link_name: create_link_report()}
+    with run_metrics.link(current_link_name):
+        for iface in ("rx", "tx"):
+            reports[current_link_name][iface]["percentile"] = fetched[iface][
+                "percentile"
+            ]
+            # used by the alert mode to calculate the percentiles of many days
+            reports[current_link_name][iface][
+                "percentile_sketch"
+            ] = PercentileSketch.from_values(
+                fetched[iface]["data"].values * 8
+            ).to_dict()
+            check_link_data(
+                fetched[iface]["data"],
+                reports,
+                current_link_name,
+                current_link_config,
+                iface,
+                api_delivery,
+            )
+    return reports[current_link_name]
+
+
+def detect_link_data_in_process(
+    current_link_name: str,
+    current_link_config: dict,
+    fetched: dict,
+    send_api: bool = False,
+) -> tuple:
+    """
+    detect/report stage run on a process of the ProcessDetector (detector/processDetector.py):
+    the intervals to be sent to the api are kept and returned, since the api delivery
+    only exists in the main process (see `deliver_intervals`)
+
+    returns a tuple with the report of the given link and the intervals to be sent to the api
+    """
+    intervals = IntervalBuffer() if send_api else None
+    link_report = detect_link_data(
+        current_link_name, current_link_config, fetched, intervals
+    )
+    return link_report, intervals or []
+
+
+def deliver_intervals(result: tuple, api_delivery: ApiDelivery = None) -> dict:
+    """
+    queues the intervals returned by `detect_link_data_in_process` to be sent to the api
+
+    returns the report of the link
+    """
+    link_report, intervals = result
+    for interval in intervals:
+        api_delivery.send(interval)
+    return link_report
+
+
+def stream_link_data(
+    db_client,
+    window: TimeWindow,
+    current_link_name: str,
+    current_link_config: dict,
+    chunk_size: int,
+    api_delivery: ApiDelivery = None,
+    failed_links: set = None,
+) -> dict:
+    """
+    fetch and detect stages of the --stream mode: queries the traffic of the given link
+    in the given time window in chunks
+    of up to `chunk_size` points and checks each chunk as soon as it arrives,
+    so only a chunk of the link is in memory at a time
+
+    the percentiles are queried from the TSDB and the percentile sketches are merged chunk by chunk
+
+    if the traffic couldn't be queried, the link is added to `failed_links`
+
+    returns the report of the given link
+    """
+    logger.info("streaming ifaces for %s", current_link_name)
+    tsdb_extractor = TsdbExtractor()
+    time_formatter = ReportTimeFormatter(*window.epoch())
+    limit_speed, limit_speed_accounting_for_histeresys = calculate_limit_speeds(
+        current_link_config
+    )
+
+    reports = {current_link_name: create_link_report()}
+    detect_seconds = 0.0
+    for iface in ("rx", "tx"):
+        with run_metrics.query("percentile"):
+            reports[current_link_name][iface][
+                "percentile"
+            ] = tsdb_extractor.query_iface_percentile(
+                PERCENTILE,
+                window.begin,
+                window.end,
+                current_link_name,
+                iface,
+                db_client,
+            )
+
+        detector = StreamingDetector(limit_speed, limit_speed_accounting_for_histeresys)
+        percentile_sketch = PercentileSketch()
+        intervals = []
+        points = 0
+        # spacing between the points of every chunk, the same as the one of the whole series
+        streaming_step = StreamingStep()
+        chunks = call_with_window(
+            tsdb_extractor.iter_iface_traffic,
             current_link_name,
-            "tx",
+            iface,
             db_client,
+            chunk_size,
+            window=window,
+        )
+        while True:
+            try:
+                with run_metrics.query("traffic_chunk"):
+                    chunk = next(chunks)
+            except StopIteration:
+                break
+            if chunk is None:
+                # the query failed, only the points of the chunks before it are checked
+                logger.warning(
+                    "traffic of %s:%s is incomplete", current_link_name, iface
+                )
+                if failed_links is not None:
+                    failed_links.add(current_link_name)
+                break
+
+            begin = perf_counter()
+            chunk = Series.of(chunk)
+            points += len(chunk)
+            streaming_step.feed(chunk.times)
+            percentile_sketch.merge(PercentileSketch.from_values(chunk.values * 8))
+            intervals += detector.feed(chunk.times, chunk.values)
+            detect_seconds += perf_counter() - begin
+        intervals += detector.close()
+        run_metrics.count("points_fetched", points)
+
+        # used by the alert mode to calculate the percentiles of many days
+        reports[current_link_name][iface][
+            "percentile_sketch"
+        ] = percentile_sketch.to_dict()
+
+        logger.info("checking collected data for %s:%s", current_link_name, iface)
+        if points == 0:
+            logger.warning("no data for %s:%s", current_link_name, iface)
+            continue
+        report_exceeded_intervals(
+            intervals,
+            reports,
+            current_link_name,
+            current_link_config,
+            iface,
+            streaming_step.step(),
+            time_formatter,
+            api_delivery,
         )
+    run_metrics.observe_link(current_link_name, detect_seconds)
+    return reports[current_link_name]
+
+
+def check_exceeded_intervals(
+    db_client,
+    window: TimeWindow,
+    reports: dict,
+    current_link_name: str,
+    current_link_config: dict,
+):
+    """
+    checks if the given link exceeded its traffic limits in the given time window
+
+    updates the report dict
+    """
+
+    # if link already in reports, exits
+    if current_link_name in reports:
+        logger.error("link %s is duplicated", current_link_name)
+        exit(1)
+
+    fetched = fetch_link_data(db_client, window, current_link_name)
+    reports[current_link_name] = detect_link_data(
+        current_link_name, current_link_config, fetched
     )
-    check_link_data(data, reports, current_link_name, current_link_config, "tx")
 
     # send_api_request(current_link, reports[current_link])
 
 
 def check_link_data(
-    data: list[dict],
+    data: Series,
     reports: dict,
     current_link_name: str,
     current_link_config: dict,
     iface: str,
+    api_delivery: ApiDelivery = None,
 ):
     """
     checks if the given link exceeded its traffic limits
 
-    updates the report dict
+    updates the report dict (and sends the intervals to the api if `api_delivery` is given)
+
+    returns the number of the interval that is still open at the end of the data
+    (the last point is above the histeresys limit), or None if there is no open interval
     """
 
     logger.info("checking collected data for %s:%s", current_link_name, iface)
@@ -544,29 +1929,146 @@ def check_link_data(
     # if no data, skips
     if len(data) == 0:
         logger.warning("no data for %s:%s", current_link_name, iface)
-        return
+        return None
 
-    # iterates over all points
-    i = 0
-    while i < len(data):
-        traffic_value_in_bits = data[i]["value"] * 8
-        traffic_limit_in_bits = (
-            current_link_config["LINK_SPEED"]
-            * current_link_config["LINK_MAX_TRAFFIC_PERCENTAGE"]
-        )
+    limit_speed, limit_speed_accounting_for_histeresys = calculate_limit_speeds(
+        current_link_config
+    )
+
+    intervals = detect_exceeded_intervals(
+        data.values,
+        limit_speed,
+        limit_speed_accounting_for_histeresys,
+    )
+    if not intervals:
+        return None
+
+    # spacing between the points (5 minutes for the usual TSDB data, the bucket with --downsample)
+    step = data.step()
+    for interval in intervals:
+        interval["begin_time"] = data.times[interval["begin"]]
+        interval["end_time"] = data.times[interval["end"]]
+    interval_counters = report_exceeded_intervals(
+        intervals,
+        reports,
+        current_link_name,
+        current_link_config,
+        iface,
+        step,
+        ReportTimeFormatter(data.times[0], data.times[-1]),
+        api_delivery,
+    )
+
+    open_interval = None
+    for interval, interval_counter in zip(intervals, interval_counters):
+        if (
+            interval_counter is not None
+            and interval["end"] == len(data) - 1
+            and data.values[-1] * 8 >= limit_speed_accounting_for_histeresys
+        ):
+            open_interval = interval_counter
+
+    return open_interval
 
-        # if exceeds limit: checks how much time it exceeded
-        if traffic_value_in_bits >= traffic_limit_in_bits:
-            i = check_interval_size(
-                data,
+
+def report_exceeded_intervals(
+    intervals: list,
+    reports: dict,
+    current_link_name: str,
+    current_link_config: dict,
+    iface: str,
+    step: int,
+    time_formatter: ReportTimeFormatter,
+    api_delivery: ApiDelivery = None,
+) -> list:
+    """
+    adds the given exceeded intervals (with their "begin_time" and "end_time" timestamps)
+    of points spaced by `step` seconds to the report dict
+    (and sends them to the api if `api_delivery` is given)
+
+    returns the number of each interval in the report (None for the ignored ones)
+    """
+    limit_speed, _ = calculate_limit_speeds(current_link_config)
+    report_manipulator = ReportManipulator()
+    interval_counters = []
+    for interval in intervals:
+        # formatting start and end time display
+        time_begin = time_formatter.format(interval["begin_time"])
+        time_end = time_formatter.format(interval["end_time"])
+
+        # Mean value of interval (in bytes)
+        mean_value = round((interval["min_value"] + interval["max_value"]) / 2, 1)
+        # if mean value exceeds limit speed, removes the interval
+        # this means that this particular interval has a point
+        # where the link was down and got back up causing a spike
+        if (mean_value >= 6 * limit_speed) or ("e" in str(mean_value)):
+            logger.info(
+                "ignoring interval beetwen %s and %s (probably link was down)",
+                time_begin,
+                time_end,
+            )
+            interval_counters.append(None)
+            continue
+
+        # adding interval to report
+        exceeded_time = calculate_exceeded_time(interval["exceeded_points"], step)
+        interval_counter = len(reports[current_link_name][iface]["intervals"]) + 1
+        report_manipulator.add_interval_to_report(
+            reports[current_link_name][iface],
+            time_begin,
+            time_end,
+            interval_counter,
+            exceeded_time,
+        )
+        if api_delivery is not None:
+            send_interval_to_api(
+                api_delivery,
                 current_link_name,
                 current_link_config,
-                reports,
                 iface,
-                i + 1,
+                time_begin,
+                time_end,
+                exceeded_time,
+                mean_value,
+                interval["max_value"],
+                interval["min_value"],
             )
-        # while iterating
-        i += 1
+        interval_counters.append(interval_counter)
+
+    return interval_counters
+
+
+def calculate_exceeded_time(exceeded_points: int, step: int) -> int | float:
+    """
+    calculates the exceeded time (in minutes) of `exceeded_points` points spaced by `step` seconds
+
+    returns an int if it's a whole number of minutes (always the case for 5 minute points)
+
+    raises a ValueError if the spacing is unknown (the series has less than 2 points)
+    """
+    if step is None:
+        raise ValueError("the spacing between the points of the series is unknown")
+    exceeded_time = exceeded_points * step / 60
+    if exceeded_time.is_integer():
+        return int(exceeded_time)
+    return round(exceeded_time, 2)
+
+
+def calculate_limit_speeds(current_link_config: dict) -> tuple:
+    """
+    calculates the limit speeds (in bits) of the given link
+
+    returns a tuple with:
+    - the limit speed to start an interval
+    - the limit speed accounting for the histeresys, to end an interval
+    """
+    limit_speed = (
+        current_link_config["LINK_SPEED"]
+        * current_link_config["LINK_MAX_TRAFFIC_PERCENTAGE"]
+    )
+    limit_speed_histeresys = limit_speed * current_link_config["LINK_HISTERESYS"]
+    limit_speed_accounting_for_histeresys = limit_speed - limit_speed_histeresys
+    return limit_speed, limit_speed_accounting_for_histeresys
 
 
 def send_api_request(current_link: dict, link_report: dict):